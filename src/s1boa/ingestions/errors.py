@@ -28,3 +28,33 @@ class WrongSatellite(Error):
 
     def __init__(self, message):
         self.message = message
+
+class EventsStructureIncorrect(Error):
+    """Exception raised when the structure of the events is not correct.
+
+    Attributes:
+        message -- explanation of the error
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+class FootprintBackendNotAvailable(Error):
+    """Exception raised when the requested footprint backend is not available.
+
+    Attributes:
+        message -- explanation of the error
+    """
+
+    def __init__(self, message):
+        self.message = message
+
+class LinkReferenceAmbiguous(Error):
+    """Exception raised when a link by reference matches more than one event.
+
+    Attributes:
+        message -- explanation of the error
+    """
+
+    def __init__(self, message):
+        self.message = message
@@ -0,0 +1,174 @@
+"""
+Persistent cache of the footprints obtained during the ingestions of Sentinel-1
+
+The footprints are stored in a SQLite file indexed by satellite, swath
+definition, start, stop, number of coordinates along track, hash of the
+orbit reference file and footprint backend. The least recently used
+footprints are removed when the number of stored footprints exceeds the
+configured maximum.
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1boa
+"""
+# Import python utilities
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import functools
+import contextlib
+
+# Import logging
+from eboa.logging import Log
+
+logging_module = Log(name = __name__)
+logger = logging_module.logger
+
+@functools.lru_cache()
+def _get_file_hash(file_path, modification_time):
+    """
+    Method to obtain the hash of the content of a file
+    :param file_path: path to the file
+    :type file_path: str
+    :param modification_time: modification time of the file (to refresh the hash if the file changes)
+    :type modification_time: float
+
+    :return: SHA-256 hash of the content of the file
+    :rtype: str
+    """
+    file_hash = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+        # end for
+    # end with
+
+    return file_hash.hexdigest()
+
+def get_file_hash(file_path):
+    """
+    Method to obtain the hash of the content of a file (computed once per version of the file)
+    :param file_path: path to the file
+    :type file_path: str
+
+    :return: SHA-256 hash of the content of the file
+    :rtype: str
+    """
+    return _get_file_hash(file_path, os.path.getmtime(file_path))
+
+class FootprintCache():
+    """
+    Footprints stored in a SQLite file with LRU eviction and counters of hits and misses
+    """
+
+    def __init__(self, cache_file_path, max_entries):
+        """
+        :param cache_file_path: path to the SQLite file
+        :type cache_file_path: str
+        :param max_entries: maximum number of footprints to keep
+        :type max_entries: int
+        """
+        self.cache_file_path = cache_file_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        cache_dir_path = os.path.dirname(cache_file_path)
+        if cache_dir_path != "":
+            os.makedirs(cache_dir_path, exist_ok = True)
+        # end if
+
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS footprints (key TEXT PRIMARY KEY, response TEXT NOT NULL, last_access REAL NOT NULL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS footprints_last_access ON footprints (last_access)")
+        # end with
+
+    @contextlib.contextmanager
+    def _connect(self):
+        """
+        Method to open a connection to the SQLite file committing the changes
+        (or rolling them back on error) and closing it when finished
+        """
+        # Several ingestions could be accessing the cache at the same time
+        connection = sqlite3.connect(self.cache_file_path, timeout = 60)
+        try:
+            with connection:
+                yield connection
+            # end with
+        finally:
+            connection.close()
+        # end try
+
+    @staticmethod
+    def _serialize_key(key):
+        return json.dumps(key)
+
+    def get(self, keys):
+        """
+        Method to obtain the footprints stored for a set of keys
+        :param keys: keys of the footprints
+        :type keys: list of tuple
+
+        :return: footprint requests indexed by key (only the keys found in the cache)
+        :rtype: dict
+        """
+        serialized_keys = {self._serialize_key(key): key for key in keys}
+
+        footprints = {}
+        with self._connect() as connection:
+            # Split the keys to respect the limit of variables of SQLite
+            serialized_key_list = list(serialized_keys.keys())
+            for i in range(0, len(serialized_key_list), 500):
+                chunk = serialized_key_list[i:i + 500]
+                rows = connection.execute("SELECT key, response FROM footprints WHERE key IN ({})".format(",".join(["?"] * len(chunk))), chunk).fetchall()
+                for (serialized_key, serialized_response) in rows:
+                    footprints[serialized_keys[serialized_key]] = json.loads(serialized_response)
+                # end for
+            # end for
+
+            now = time.time()
+            connection.executemany("UPDATE footprints SET last_access = ? WHERE key = ?", [(now, self._serialize_key(key)) for key in footprints])
+        # end with
+
+        self.hits += len(footprints)
+        self.misses += len(serialized_keys) - len(footprints)
+
+        return footprints
+
+    def put(self, footprints):
+        """
+        Method to store footprints removing the least recently used ones if the maximum is exceeded
+        :param footprints: footprint requests indexed by key
+        :type footprints: dict
+        """
+        if len(footprints) == 0:
+            return
+        # end if
+
+        now = time.time()
+        with self._connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO footprints (key, response, last_access) VALUES (?, ?, ?)",
+                                   [(self._serialize_key(key), json.dumps(footprints[key]), now) for key in footprints])
+
+            (number_of_entries,) = connection.execute("SELECT COUNT(*) FROM footprints").fetchone()
+            if number_of_entries > self.max_entries:
+                connection.execute("DELETE FROM footprints WHERE key IN (SELECT key FROM footprints ORDER BY last_access ASC LIMIT ?)", (number_of_entries - self.max_entries,))
+                logger.debug("{} footprints have been removed from the cache {}".format(number_of_entries - self.max_entries, self.cache_file_path))
+            # end if
+        # end with
+
+    def get_statistics(self):
+        """
+        Method to obtain the counters of the cache
+        :return: number of hits and misses since the creation of the cache object and number of stored footprints
+        :rtype: dict
+        """
+        with self._connect() as connection:
+            (number_of_entries,) = connection.execute("SELECT COUNT(*) FROM footprints").fetchone()
+        # end with
+
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "entries": number_of_entries}
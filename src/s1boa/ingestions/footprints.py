@@ -0,0 +1,345 @@
+"""
+Native engine for obtaining the footprints of the Sentinel-1 SAR swaths
+
+The orbit is propagated from the reference orbit scenario file
+(MPL_ORBSCT) using a circular sun-synchronous orbit whose nodal period,
+ANX times and ANX longitudes are those of the reference orbit. The
+swath is defined by the line of sight of the near and far beams in the
+zero-Doppler plane (Asar_Geometry of the swath definition files) and
+their slant range extension (Narrow_Asar/Wide_Asar).
+
+The orbit is not propagated from ORBPRE state vectors, so the short
+period perturbations of the orbit and the roll steering of the attitude
+are not modelled. The footprints deviate from the ones of the
+get_footprint tool of the EOCFI mainly across track, growing with the
+incidence angle of the swath: from 7 km for the stripmap 1 to 16 km for
+the stripmap 6 (about 10 km for IW, EW and WV segments of up to 16
+minutes).
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1boa
+"""
+# Import python utilities
+import datetime
+from dateutil import parser
+import glob
+import functools
+
+# Import numpy
+import numpy as np
+
+# Import xml parser
+from lxml import etree
+
+# Import helpers
+import eboa.engine.functions as eboa_functions
+
+# Import errors
+from s1boa.ingestions.errors import WrongSatellite
+
+# Physical constants
+# WGS84 ellipsoid
+EARTH_EQUATORIAL_RADIUS = 6378137.0
+EARTH_FLATTENING = 1 / 298.257223563
+EARTH_POLAR_RADIUS = EARTH_EQUATORIAL_RADIUS * (1 - EARTH_FLATTENING)
+EARTH_GRAVITATIONAL_CONSTANT = 3.986004418e14
+EARTH_J2 = 1.08262668e-3
+EARTH_J3 = -2.53265649e-6
+EARTH_ROTATION_RATE = 7.2921158553e-5
+# Rotation rate of the ascending node of a sun-synchronous orbit
+SUN_SYNCHRONOUS_NODE_RATE = 2 * np.pi / (365.2421897 * 86400)
+SPEED_OF_LIGHT = 299792458.0
+
+REFERENCE_TIME = datetime.datetime(2000, 1, 1)
+
+cfi_namespaces = {"cfi": "http://eop-cfi.esa.int/CFI"}
+
+def to_seconds(date):
+    """
+    Method to convert a date into seconds from 2000-01-01T00:00:00
+    :param date: date in ISO 8601
+    :type date: str
+
+    :return: seconds from 2000-01-01T00:00:00
+    :rtype: float
+    """
+    return (parser.parse(date).replace(tzinfo=None) - REFERENCE_TIME).total_seconds()
+
+@functools.lru_cache()
+def read_orbit_scenario_file(orbit_scenario_file_path):
+    """
+    Method to read the orbit changes defined in an orbit scenario file
+    :param orbit_scenario_file_path: path to the orbit scenario file
+    :type orbit_scenario_file_path: str
+
+    :return: orbit changes sorted by ANX time, each one with the absolute orbit, the nodal period (s), the ANX longitude (deg), the number of orbits per cycle, the cycle duration (s) and the ANX time (s from 2000-01-01)
+    :rtype: list of dict
+    """
+    parsed_xml = etree.parse(orbit_scenario_file_path)
+    xpath_xml = etree.XPathEvaluator(parsed_xml, namespaces = cfi_namespaces)
+
+    orbit_changes = []
+    for orbit_change in xpath_xml("/cfi:Earth_Explorer_File/cfi:Data_Block/cfi:List_of_Orbit_Changes/cfi:Orbit_Change"):
+        repeat_cycle = float(orbit_change.xpath("cfi:Cycle/cfi:Repeat_Cycle", namespaces = cfi_namespaces)[0].text)
+        cycle_length = float(orbit_change.xpath("cfi:Cycle/cfi:Cycle_Length", namespaces = cfi_namespaces)[0].text)
+        orbit_changes.append({
+            "absolute_orbit": int(orbit_change.xpath("cfi:Orbit/cfi:Absolute_Orbit", namespaces = cfi_namespaces)[0].text),
+            "cycle_length": cycle_length,
+            "cycle_duration": repeat_cycle * 86400,
+            "nodal_period": repeat_cycle * 86400 / cycle_length,
+            "anx_longitude": float(orbit_change.xpath("cfi:Cycle/cfi:ANX_Longitude", namespaces = cfi_namespaces)[0].text),
+            "anx_time": to_seconds(orbit_change.xpath("cfi:Time_of_ANX/cfi:UTC", namespaces = cfi_namespaces)[0].text.split("=")[1])
+        })
+    # end for
+    orbit_changes.sort(key=lambda x:x["anx_time"])
+
+    return orbit_changes
+
+@functools.lru_cache()
+def read_swath_definition_file(swath_definition_file_path):
+    """
+    Method to read the geometry of a swath definition file
+    :param swath_definition_file_path: path to the swath definition file
+    :type swath_definition_file_path: str
+
+    :return: off-nadir angles (rad) of the near and far beams and the slant range extension (m) of the swath beyond them
+    :rtype: dict
+    """
+    parsed_xml = etree.parse(swath_definition_file_path)
+    xpath_xml = etree.XPathEvaluator(parsed_xml, namespaces = cfi_namespaces)
+
+    asar_geometry = xpath_xml("/cfi:Earth_Explorer_File/cfi:Data_Block/cfi:Swath/cfi:Asar_Geometry")[0]
+    left_elevation = float(asar_geometry.xpath("cfi:Left_Pt/cfi:Elevation", namespaces = cfi_namespaces)[0].text)
+    right_elevation = float(asar_geometry.xpath("cfi:Right_Pt/cfi:Elevation", namespaces = cfi_namespaces)[0].text)
+
+    # Slant ranges are two way times in microseconds
+    left_slant_range_time = float(asar_geometry.xpath("*/cfi:Slant_Range_Left", namespaces = cfi_namespaces)[0].text)
+    right_slant_range_time = left_slant_range_time
+    right_slant_range_time_nodes = asar_geometry.xpath("*/cfi:Slant_Range_Right", namespaces = cfi_namespaces)
+    if len(right_slant_range_time_nodes) > 0:
+        right_slant_range_time = float(right_slant_range_time_nodes[0].text)
+    # end if
+    left_slant_range = SPEED_OF_LIGHT * left_slant_range_time * 1e-6 / 2
+    right_slant_range = SPEED_OF_LIGHT * right_slant_range_time * 1e-6 / 2
+
+    # The elevation is measured from the horizontal plane of the satellite, so the greater elevation is the near beam
+    if left_elevation >= right_elevation:
+        near_elevation, near_slant_range, far_elevation, far_slant_range = left_elevation, left_slant_range, right_elevation, right_slant_range
+    else:
+        near_elevation, near_slant_range, far_elevation, far_slant_range = right_elevation, right_slant_range, left_elevation, left_slant_range
+    # end if
+
+    return {
+        "near_off_nadir_angle": np.radians(90 - near_elevation),
+        "near_slant_range_extension": near_slant_range,
+        "far_off_nadir_angle": np.radians(90 - far_elevation),
+        "far_slant_range_extension": far_slant_range
+    }
+
+@functools.lru_cache()
+def _get_orbit_geometry(nodal_period):
+    """
+    Method to obtain the semi-major axis and inclination of the circular sun-synchronous orbit with the received nodal period
+    :param nodal_period: nodal period of the orbit (s)
+    :type nodal_period: float
+
+    :return: semi-major axis (m) and inclination (rad)
+    :rtype: tuple
+    """
+    semi_major_axis = (EARTH_GRAVITATIONAL_CONSTANT * (nodal_period / (2 * np.pi))**2)**(1/3)
+    for i in range(20):
+        mean_motion = np.sqrt(EARTH_GRAVITATIONAL_CONSTANT / semi_major_axis**3)
+        # Sun-synchronous condition
+        inclination = np.arccos(-2 * SUN_SYNCHRONOUS_NODE_RATE * semi_major_axis**3.5 / (3 * EARTH_J2 * EARTH_EQUATORIAL_RADIUS**2 * np.sqrt(EARTH_GRAVITATIONAL_CONSTANT)))
+        # Rate of the argument of latitude with the secular J2 perturbations
+        j2_factor = 0.75 * EARTH_J2 * (EARTH_EQUATORIAL_RADIUS / semi_major_axis)**2
+        argument_of_latitude_rate = mean_motion * (1 + j2_factor * (2 - 3 * np.sin(inclination)**2) + j2_factor * (4 - 5 * np.sin(inclination)**2))
+        semi_major_axis = semi_major_axis * (argument_of_latitude_rate * nodal_period / (2 * np.pi))**(2/3)
+    # end for
+
+    return semi_major_axis, inclination
+
+def get_orbit_positions(times, orbit_changes):
+    """
+    Method to obtain the Earth fixed positions of the satellite
+    :param times: times to obtain the positions (s from 2000-01-01)
+    :type times: numpy.ndarray
+    :param orbit_changes: orbit changes of the reference orbit
+    :type orbit_changes: list of dict
+
+    :return: positions (m) with shape (len(times), 3)
+    :rtype: numpy.ndarray
+    """
+    anx_times = np.array([orbit_change["anx_time"] for orbit_change in orbit_changes])
+    orbit_change_indexes = np.clip(np.searchsorted(anx_times, times, side="right") - 1, 0, len(orbit_changes) - 1)
+
+    positions = np.zeros((len(times), 3))
+    for orbit_change_index in np.unique(orbit_change_indexes):
+        orbit_change = orbit_changes[orbit_change_index]
+        selected = orbit_change_indexes == orbit_change_index
+        nodal_period = orbit_change["nodal_period"]
+        semi_major_axis, inclination = _get_orbit_geometry(nodal_period)
+
+        # Orbits since the orbit change and time since the ANX
+        orbits = np.floor((times[selected] - orbit_change["anx_time"]) / nodal_period)
+        time_since_anx = times[selected] - (orbit_change["anx_time"] + orbits * nodal_period)
+
+        # The ANX longitude drifts per orbit the fraction of the repeat cycle
+        anx_longitude = np.radians(orbit_change["anx_longitude"]) - orbits * 2 * np.pi * orbit_change["cycle_duration"] / 86400 / orbit_change["cycle_length"]
+        node_longitude = anx_longitude - (EARTH_ROTATION_RATE - SUN_SYNCHRONOUS_NODE_RATE) * time_since_anx
+        # Frozen orbit (argument of perigee at 90 degrees): the
+        # eccentricity advances the argument of latitude with respect
+        # to the uniform motion from the ANX
+        eccentricity = -EARTH_J3 / (2 * EARTH_J2) * EARTH_EQUATORIAL_RADIUS / semi_major_axis * np.sin(inclination)
+        mean_anomaly = 2 * np.pi * time_since_anx / nodal_period - np.pi / 2 + 2 * eccentricity
+        argument_of_latitude = mean_anomaly + np.pi / 2 + 2 * eccentricity * np.sin(mean_anomaly)
+
+        x = semi_major_axis * np.cos(argument_of_latitude)
+        y = semi_major_axis * np.cos(inclination) * np.sin(argument_of_latitude)
+        z = semi_major_axis * np.sin(inclination) * np.sin(argument_of_latitude)
+        positions[selected, 0] = x * np.cos(node_longitude) - y * np.sin(node_longitude)
+        positions[selected, 1] = x * np.sin(node_longitude) + y * np.cos(node_longitude)
+        positions[selected, 2] = z
+    # end for
+
+    return positions
+
+def _intersect_ellipsoid(positions, directions):
+    """
+    Method to obtain the distance along the lines of sight to the Earth ellipsoid
+    :param positions: origins of the lines of sight (m) with shape (n, 3)
+    :type positions: numpy.ndarray
+    :param directions: unit vectors of the lines of sight with shape (n, 3)
+    :type directions: numpy.ndarray
+
+    :return: distances (m), NaN if the line of sight does not intersect the ellipsoid
+    :rtype: numpy.ndarray
+    """
+    scale = np.array([1 / EARTH_EQUATORIAL_RADIUS, 1 / EARTH_EQUATORIAL_RADIUS, 1 / EARTH_POLAR_RADIUS])
+    scaled_positions = positions * scale
+    scaled_directions = directions * scale
+    a = np.sum(scaled_directions**2, axis=1)
+    b = 2 * np.sum(scaled_positions * scaled_directions, axis=1)
+    c = np.sum(scaled_positions**2, axis=1) - 1
+    discriminant = b**2 - 4 * a * c
+    with np.errstate(invalid="ignore"):
+        distances = (-b - np.sqrt(discriminant)) / (2 * a)
+    # end with
+
+    return distances
+
+def _to_geodetic(points):
+    """
+    Method to convert Earth fixed points on the ellipsoid into geodetic longitude and latitude
+    :param points: points (m) with shape (n, 3)
+    :type points: numpy.ndarray
+
+    :return: longitudes and latitudes (deg)
+    :rtype: tuple
+    """
+    longitudes = np.degrees(np.arctan2(points[:, 1], points[:, 0]))
+    eccentricity_square = EARTH_FLATTENING * (2 - EARTH_FLATTENING)
+    latitudes = np.degrees(np.arctan2(points[:, 2], np.hypot(points[:, 0], points[:, 1]) * (1 - eccentricity_square)))
+
+    return longitudes, latitudes
+
+def get_swath_points(positions, velocities, off_nadir_angle, slant_range_extension):
+    """
+    Method to obtain the points on ground of the edge of the swath
+    :param positions: Earth fixed positions of the satellite (m) with shape (n, 3)
+    :type positions: numpy.ndarray
+    :param velocities: Earth fixed velocities of the satellite (m/s) with shape (n, 3)
+    :type velocities: numpy.ndarray
+    :param off_nadir_angle: off-nadir angle (rad) of the beam
+    :type off_nadir_angle: float
+    :param slant_range_extension: slant range (m) to add to the beam to reach the edge (negative for reducing it)
+    :type slant_range_extension: float
+
+    :return: points on ground (m) with shape (n, 3)
+    :rtype: numpy.ndarray
+    """
+    # Zero-Doppler frame: the lines of sight are perpendicular to the Earth fixed velocity
+    along_track = velocities / np.linalg.norm(velocities, axis=1)[:, None]
+    nadir = -positions / np.linalg.norm(positions, axis=1)[:, None]
+    nadir = nadir - np.sum(nadir * along_track, axis=1)[:, None] * along_track
+    nadir = nadir / np.linalg.norm(nadir, axis=1)[:, None]
+    # Sentinel-1 is right looking
+    cross_track = np.cross(nadir, along_track)
+
+    def slant_ranges(angles):
+        directions = np.cos(angles)[:, None] * nadir + np.sin(angles)[:, None] * cross_track
+        return _intersect_ellipsoid(positions, directions), directions
+    # end def
+
+    beam_slant_ranges, _ = slant_ranges(np.full(len(positions), off_nadir_angle))
+    target_slant_ranges = beam_slant_ranges + slant_range_extension
+
+    # Bisection on the off-nadir angle to reach the target slant range (monotonic until the horizon)
+    lower_angles = np.zeros(len(positions))
+    upper_angles = np.full(len(positions), np.radians(60))
+    for i in range(40):
+        angles = (lower_angles + upper_angles) / 2
+        ranges, _ = slant_ranges(angles)
+        too_far = np.isnan(ranges) | (ranges > target_slant_ranges)
+        upper_angles = np.where(too_far, angles, upper_angles)
+        lower_angles = np.where(too_far, lower_angles, angles)
+    # end for
+    ranges, directions = slant_ranges((lower_angles + upper_angles) / 2)
+
+    return positions + ranges[:, None] * directions
+
+def format_coordinate(value):
+    """
+    Method to format a coordinate as the get_footprint tool of the EOCFI
+    """
+    return "{:.6f}".format(value).rstrip("0").rstrip(".")
+
+def get_footprints(windows, satellite, swath_definition_file_path):
+    """
+    Method to obtain the footprints of a set of windows all at once
+    :param windows: windows to cover, each one a tuple of start, stop (ISO 8601) and number of samples along track
+    :type windows: list of tuple
+    :param satellite: satellite (S1A or S1B)
+    :type satellite: str
+    :param swath_definition_file_path: path to the swath definition file
+    :type swath_definition_file_path: str
+
+    :return: footprints as a closed polygon of longitude latitude pairs (near edge followed by the far edge reversed)
+    :rtype: list of str
+    """
+    if not satellite in ["S1A", "S1B"]:
+        raise WrongSatellite("The received satellite is not recognized. Received satellite: {}".format(satellite))
+    # end if
+
+    if len(windows) == 0:
+        return []
+    # end if
+
+    orbit_scenario_file_path = glob.glob(eboa_functions.get_resources_path() + "/{}*MPL_ORBSCT*".format(satellite))[0]
+    orbit_changes = read_orbit_scenario_file(orbit_scenario_file_path)
+    swath = read_swath_definition_file(swath_definition_file_path)
+
+    # Sample all the windows at once
+    samples_per_window = [max(iterations, 2) for (start, stop, iterations) in windows]
+    times = np.concatenate([np.linspace(to_seconds(start), to_seconds(stop), samples) for ((start, stop, iterations), samples) in zip(windows, samples_per_window)])
+
+    # Velocities by finite differences
+    time_step = 0.5
+    positions = get_orbit_positions(times, orbit_changes)
+    velocities = (get_orbit_positions(times + time_step, orbit_changes) - get_orbit_positions(times - time_step, orbit_changes)) / (2 * time_step)
+
+    near_longitudes, near_latitudes = _to_geodetic(get_swath_points(positions, velocities, swath["near_off_nadir_angle"], -swath["near_slant_range_extension"]))
+    far_longitudes, far_latitudes = _to_geodetic(get_swath_points(positions, velocities, swath["far_off_nadir_angle"], swath["far_slant_range_extension"]))
+
+    footprints = []
+    first_sample = 0
+    for samples in samples_per_window:
+        window = slice(first_sample, first_sample + samples)
+        coordinates = list(zip(near_longitudes[window], near_latitudes[window])) + list(zip(far_longitudes[window], far_latitudes[window]))[::-1]
+        coordinates.append(coordinates[0])
+        footprints.append(" ".join([format_coordinate(longitude) + " " + format_coordinate(latitude) for (longitude, latitude) in coordinates]))
+        first_sample += samples
+    # end for
+
+    return footprints
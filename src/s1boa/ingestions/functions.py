@@ -15,6 +15,11 @@ import os
 from tempfile import mkstemp
 import re
 import glob
+import json
+import functools
+import threading
+import bisect
+import concurrent.futures
 from itertools import chain
 
 # Import xml parser
@@ -28,10 +33,20 @@ import eboa.ingestion.functions as ingestion_functions
 import eboa.engine.functions as eboa_functions
 from eboa.engine.functions import get_resources_path
 import siboa.ingestions.functions as siboa_functions
+import s1boa.ingestions.footprints as footprint_engine
+from s1boa.ingestions.footprint_cache import FootprintCache, get_file_hash
 
 # Import eboa query
 from eboa.engine.query import Query
 
+# Import entities of the datamodel
+from eboa.datamodel.events import Event, EventText
+from eboa.datamodel.gauges import Gauge
+
+# Import SQLalchemy entities
+from sqlalchemy import and_
+from sqlalchemy.orm import aliased
+
 # Import debugging
 from eboa.debugging import debug
 
@@ -40,7 +55,7 @@ from eboa.logging import Log
 import logging
 
 # Import errors
-from s1boa.ingestions.errors import WrongDate, WrongSatellite
+from s1boa.ingestions.errors import WrongDate, WrongSatellite, EventsStructureIncorrect, FootprintBackendNotAvailable
 
 # Import ingestion_functions.helpers
 import eboa.ingestion.functions as eboa_ingestion_functions
@@ -138,10 +153,705 @@ def build_orbpre_file_from_reference(start, stop, satellite):
     
     return orbpre_file_path
 
+class OrbpreManager():
+    """
+    ORBPRE files generated from the orbit reference file, one per satellite,
+    shared by all the footprint requests of an ingestion or engine session.
+    The file of a satellite is regenerated only when a request falls outside
+    the covered window. The covered window is extended to include the
+    request unless the result would exceed the maximum span, in which case
+    the file is reset to cover only the request. The files are removed when
+    closing the manager
+    """
+
+    def __init__(self, max_span = None):
+        """
+        :param max_span: maximum span of the window covered by an ORBPRE file (by default ORBPRE_MAX_SPAN_HOURS, 24 hours)
+        :type max_span: datetime.timedelta
+        """
+        # ORBPRE file path, start and stop of the covered window per satellite
+        self.orbpre_files = {}
+        self.lock = threading.Lock()
+        if max_span == None:
+            max_span = datetime.timedelta(hours = float(get_configuration_value("ORBPRE_MAX_SPAN_HOURS", 24)))
+        # end if
+        self.max_span = max_span
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_orbpre_file(self, start, stop, satellite):
+        """
+        Method to obtain an ORBPRE file covering the window
+        :param start: start date in ISO 8601 of the window to cover with the ORBPRE
+        :type start: str
+        :param stop: stop date in ISO 8601 of the window to cover with the ORBPRE
+        :type stop: str
+        :param satellite: satellite (S1A or S1B)
+        :type satellite: str
+
+        :return: path to the ORBPRE file
+        :rtype: str
+        """
+        with self.lock:
+            if satellite in self.orbpre_files:
+                (orbpre_file_path, covered_start, covered_stop) = self.orbpre_files[satellite]
+                if parser.parse(start) >= parser.parse(covered_start) and parser.parse(stop) <= parser.parse(covered_stop) and os.path.isfile(orbpre_file_path):
+                    return orbpre_file_path
+                # end if
+
+                # Extend the covered window if the span remains bounded
+                extended_start = min([start, covered_start], key = parser.parse)
+                extended_stop = max([stop, covered_stop], key = parser.parse)
+                if parser.parse(extended_stop) - parser.parse(extended_start) <= self.max_span:
+                    start = extended_start
+                    stop = extended_stop
+                else:
+                    logger.debug("The ORBPRE file of the satellite {} is reset as the window from {} to {} is far from the covered one from {} to {}".format(satellite, start, stop, covered_start, covered_stop))
+                # end if
+            # end if
+
+            new_orbpre_file_path = build_orbpre_file_from_reference(start, stop, satellite)
+            logger.debug("The ORBPRE file {} covering from {} to {} has been generated for the satellite {}".format(new_orbpre_file_path, start, stop, satellite))
+
+            if satellite in self.orbpre_files and os.path.isfile(self.orbpre_files[satellite][0]):
+                os.remove(self.orbpre_files[satellite][0])
+            # end if
+            self.orbpre_files[satellite] = (new_orbpre_file_path, start, stop)
+        # end with
+
+        return new_orbpre_file_path
+
+    def close(self):
+        """
+        Method to remove the generated ORBPRE files
+        """
+        with self.lock:
+            for satellite in self.orbpre_files:
+                if os.path.isfile(self.orbpre_files[satellite][0]):
+                    os.remove(self.orbpre_files[satellite][0])
+                # end if
+            # end for
+            self.orbpre_files = {}
+        # end with
+
+def get_configuration_value(name, default = None):
+    """
+    Method to obtain a configuration value for the S1BOA ingestions.
+    The value is taken from the environment variable S1BOA_<name> if
+    defined or from the S1BOA section of the engine configuration
+    :param name: name of the configuration item
+    :type name: str
+    :param default: value to return if the configuration item is not defined
+    :type default: any
+
+    :return: value of the configuration item
+    :rtype: any
+    """
+    if "S1BOA_" + name in os.environ:
+        return os.environ["S1BOA_" + name]
+    # end if
+
+    configuration_file_path = eboa_functions.get_resources_path() + "/engine.json"
+    if os.path.isfile(configuration_file_path):
+        with open(configuration_file_path) as configuration_file:
+            configuration = json.load(configuration_file)
+        # end with
+        if "S1BOA" in configuration and name in configuration["S1BOA"]:
+            return configuration["S1BOA"][name]
+        # end if
+    # end if
+
+    return default
+
+def remove_namespaces_from_element(element):
+    """
+    Method to remove the namespaces of the tags of an element and its descendants
+    :param element: element to modify
+    :type element: lxml.etree._Element
+    """
+    for node in element.iter("{*}*"):
+        if node.tag[0] == "{":
+            node.tag = node.tag.split("}", 1)[1]
+        # end if
+    # end for
+
+def _get_footprint_iterations(start, stop):
+    """
+    Method to obtain the number of coordinates along track of the footprint covering a window
+    :param start: start date in ISO 8601 of the window
+    :type start: str
+    :param stop: stop date in ISO 8601 of the window
+    :type stop: str
+
+    :return: number of coordinates along track or None if the window is too large
+    :rtype: int
+    """
+    t0 = Time("2000-01-01T00:00:00", format='isot', scale='utc')
+    start_mjd = Time(start, format='isot', scale='utc').mjd - t0.mjd
+    stop_mjd = Time(stop, format='isot', scale='utc').mjd - t0.mjd
+
+    # The footprint is created if the segment duration is less than 100 minutes (other segments are discarded as they are not interesting)
+    if (stop_mjd - start_mjd) >= 0.0695:
+        logger.info("The event with start {} and stop {} is too large".format(start, stop))
+        return None
+    # end if
+
+    # The step between coordinates is fixed to 3.608 as for S2 (which is the duration of a scene) demonstrates a good step value
+    iterations = int(((stop_mjd - start_mjd) * 24 * 60 * 60) / 3.608) + 1
+    if iterations > 200:
+        iterations = 200
+    # end if
+
+    return iterations
+
+def _build_footprint_request(start, stop, orbpre_file_path, swath_definition_file_path):
+    """
+    Method to build the request for obtaining the footprint covering a window using the get_footprint tool of the EOCFI
+    :param start: start date in ISO 8601 of the window
+    :type start: str
+    :param stop: stop date in ISO 8601 of the window
+    :type stop: str
+    :param orbpre_file_path: path to the ORBPRE file covering the window
+    :type orbpre_file_path: str
+    :param swath_definition_file_path: path to the swath definition file to use
+    :type swath_definition_file_path: str
+
+    :return: get_footprint command to execute or None if the window is too large
+    :rtype: str
+    """
+    iterations = _get_footprint_iterations(start, stop)
+    if iterations == None:
+        return None
+    # end if
+
+    t0 = Time("2000-01-01T00:00:00", format='isot', scale='utc')
+    start_mjd = Time(start, format='isot', scale='utc').mjd - t0.mjd
+    stop_mjd = Time(stop, format='isot', scale='utc').mjd - t0.mjd
+
+    return "get_footprint -b {} -e {} -o '{} {}' -s {} -n {}".format(start_mjd, stop_mjd, orbpre_file_path, orbpre_file_path, swath_definition_file_path, iterations)
+
+def _build_footprint_response(output, get_footprint_command):
+    """
+    Method to build the footprint obtained from the output of the get_footprint tool
+    :param output: output of the get_footprint tool
+    :type output: str
+    :param get_footprint_command: executed get_footprint command
+    :type get_footprint_command: str
+
+    :return: footprint request with the list of coordinates (split by the antimeridian) and the executed command
+    :rtype: dict
+    """
+    # Prepare footprint
+    coordinates = output.replace(" \n", "")
+
+    return {"footprints": siboa_functions.correct_footprint(coordinates),
+            "command": get_footprint_command,
+            "coordinates": coordinates}
+
+class FootprintProcess():
+    """
+    Long-lived shell receiving get_footprint requests through a pipe.
+    Each response is the output of the command followed by a line with
+    the end of response mark and the exit status of the command
+    """
+    end_of_response_mark = "S1BOA_END_OF_FOOTPRINT_RESPONSE"
+
+    def __init__(self):
+        self.process = subprocess.Popen(["/bin/sh"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+
+    def request(self, get_footprint_command):
+        """
+        Method to execute a get_footprint command in the long-lived shell
+        :param get_footprint_command: command to execute
+        :type get_footprint_command: str
+
+        :return: output of the command
+        :rtype: str
+        """
+        # The new line before the mark is removed from the output afterwards
+        try:
+            self.process.stdin.write("{} < /dev/null 2> /dev/null; printf '\\n{} %d\\n' $?\n".format(get_footprint_command, self.end_of_response_mark))
+            self.process.stdin.flush()
+        except OSError:
+            # The shell finished (BrokenPipeError is an OSError)
+            raise subprocess.CalledProcessError(self.process.wait(), get_footprint_command)
+        # end try
+
+        output = []
+        for line in self.process.stdout:
+            if line.startswith(self.end_of_response_mark + " "):
+                status = int(line.split(" ")[1])
+                break
+            # end if
+            output.append(line)
+        else:
+            # The shell finished before answering, wait for its exit status
+            raise subprocess.CalledProcessError(self.process.wait(), get_footprint_command)
+        # end for
+
+        if status != 0:
+            raise subprocess.CalledProcessError(status, get_footprint_command)
+        # end if
+
+        return "".join(output)[:-1]
+
+    def is_alive(self):
+        """
+        Method to check if the long-lived shell is still running
+        :return: True if the shell is running, False otherwise
+        :rtype: bool
+        """
+        return self.process.poll() == None
+
+    def close(self):
+        """
+        Method to finish the long-lived shell
+        """
+        try:
+            self.process.stdin.close()
+        except OSError:
+            # The shell already finished
+            pass
+        # end try
+        self.process.wait()
+        self.process.stdout.close()
+
+def get_footprint_workers():
+    """
+    Method to obtain the maximum number of get_footprint commands executed
+    in parallel (configuration item FOOTPRINT_WORKERS, 1 by default)
+
+    :return: maximum number of get_footprint commands executed in parallel
+    :rtype: int
+    """
+    return max(int(get_configuration_value("FOOTPRINT_WORKERS", 1)), 1)
+
+def _get_footprints_by_subprocess(get_footprint_commands):
+    """
+    Method to obtain the footprints executing one subprocess per command.
+    At most FOOTPRINT_WORKERS subprocesses are executed at the same time
+    :param get_footprint_commands: get_footprint commands to execute indexed by swath definition file
+    :type get_footprint_commands: dict
+
+    :return: footprint requests indexed by command (None if the command ended in error)
+    :rtype: dict
+    """
+    def execute_get_footprint_command(get_footprint_command):
+        try:
+            output = subprocess.check_output(get_footprint_command, shell=True, stderr=subprocess.DEVNULL)
+            return _build_footprint_response(output.decode("utf-8"), get_footprint_command)
+        except subprocess.CalledProcessError:
+            logger.error("The footprint of the events could not be built because the command {} ended in error".format(get_footprint_command))
+            return None
+        # end try
+    # end def
+
+    commands = list(chain.from_iterable([get_footprint_commands[swath_definition_file_path] for swath_definition_file_path in get_footprint_commands]))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers = get_footprint_workers()) as executor:
+        footprints = dict(zip(commands, executor.map(execute_get_footprint_command, commands)))
+    # end with
+
+    return footprints
+
+def _execute_in_footprint_process(get_footprint_commands):
+    """
+    Method to execute a list of get_footprint commands in one long-lived process
+    :param get_footprint_commands: get_footprint commands to execute
+    :type get_footprint_commands: list
+
+    :return: footprint requests indexed by command (None if the command ended in error)
+    :rtype: dict
+    """
+    footprints = {}
+    footprint_process = FootprintProcess()
+    try:
+        for get_footprint_command in get_footprint_commands:
+            footprints[get_footprint_command] = None
+            # The command is requested again once in a new process if the shell finished unexpectedly
+            for attempt in range(2):
+                try:
+                    output = footprint_process.request(get_footprint_command)
+                    footprints[get_footprint_command] = _build_footprint_response(output, get_footprint_command)
+                    break
+                except subprocess.CalledProcessError:
+                    shell_finished = not footprint_process.is_alive()
+                    if shell_finished:
+                        footprint_process.close()
+                        footprint_process = FootprintProcess()
+                    # end if
+                    if not shell_finished or attempt > 0:
+                        logger.error("The footprint of the events could not be built because the command {} ended in error".format(get_footprint_command))
+                        break
+                    # end if
+                # end try
+            # end for
+        # end for
+    finally:
+        footprint_process.close()
+    # end try
+
+    return footprints
+
+def _get_footprints_by_batch(get_footprint_commands):
+    """
+    Method to obtain the footprints sending the commands to long-lived processes.
+    The commands are distributed among FOOTPRINT_WORKERS processes
+    :param get_footprint_commands: get_footprint commands to execute indexed by swath definition file
+    :type get_footprint_commands: dict
+
+    :return: footprint requests indexed by command (None if the command ended in error)
+    :rtype: dict
+    """
+    commands = list(chain.from_iterable([get_footprint_commands[swath_definition_file_path] for swath_definition_file_path in get_footprint_commands]))
+
+    footprint_workers = get_footprint_workers()
+    commands_per_process = [commands[i::footprint_workers] for i in range(footprint_workers) if len(commands[i::footprint_workers]) > 0]
+
+    footprints = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers = footprint_workers) as executor:
+        for footprints_of_process in executor.map(_execute_in_footprint_process, commands_per_process):
+            footprints.update(footprints_of_process)
+        # end for
+    # end with
+
+    return footprints
+
+def _get_footprints_by_eocfi(footprint_request_keys, satellite, orbpre_manager, execute_get_footprint_commands):
+    """
+    Method to obtain the footprints using the get_footprint tool of the EOCFI over an ORBPRE file covering the requests
+    :param footprint_request_keys: footprint requests to obtain as tuples of satellite, swath definition, start and stop
+    :type footprint_request_keys: list
+    :param satellite: satellite of the events (S1A or S1B)
+    :type satellite: str
+    :param orbpre_manager: manager of the ORBPRE files
+    :type orbpre_manager: OrbpreManager
+    :param execute_get_footprint_commands: method to execute the get_footprint commands indexed by swath definition file
+    :type execute_get_footprint_commands: function
+
+    :return: footprint requests indexed by key (None if the footprint could not be obtained)
+    :rtype: dict
+    """
+    start = min([start for (_, _, start, stop) in footprint_request_keys])
+    stop = max([stop for (_, _, start, stop) in footprint_request_keys])
+    orbpre_file_path = orbpre_manager.get_orbpre_file(start, stop, satellite)
+
+    get_footprint_commands = {}
+    get_footprint_command_per_key = {}
+    for footprint_request_key in footprint_request_keys:
+        (_, swath_definition_file_name, start, stop) = footprint_request_key
+        swath_definition_file_path = eboa_functions.get_resources_path() + "/{}".format(swath_definition_file_name)
+        get_footprint_command = _build_footprint_request(start, stop, orbpre_file_path, swath_definition_file_path)
+        get_footprint_command_per_key[footprint_request_key] = get_footprint_command
+        if get_footprint_command != None:
+            if not swath_definition_file_path in get_footprint_commands:
+                get_footprint_commands[swath_definition_file_path] = []
+            # end if
+            get_footprint_commands[swath_definition_file_path].append(get_footprint_command)
+        # end if
+    # end for
+
+    footprints = execute_get_footprint_commands(get_footprint_commands)
+
+    footprints_per_key = {}
+    for footprint_request_key in footprint_request_keys:
+        get_footprint_command = get_footprint_command_per_key[footprint_request_key]
+        footprints_per_key[footprint_request_key] = None
+        if get_footprint_command != None:
+            footprints_per_key[footprint_request_key] = footprints[get_footprint_command]
+        # end if
+    # end for
+
+    return footprints_per_key
+
+def _get_footprints_by_native(footprint_request_keys, satellite, orbpre_manager):
+    """
+    Method to obtain the footprints using the native footprint engine (without EOCFI tools).
+    The footprints of the requests sharing swath definition are computed all at once
+    :param footprint_request_keys: footprint requests to obtain as tuples of satellite, swath definition, start and stop
+    :type footprint_request_keys: list
+    :param satellite: satellite of the events (S1A or S1B)
+    :type satellite: str
+    :param orbpre_manager: manager of the ORBPRE files (not used as the orbit is propagated from the orbit reference file)
+    :type orbpre_manager: OrbpreManager
+
+    :return: footprint requests indexed by key (None if the footprint could not be obtained)
+    :rtype: dict
+    """
+    windows_per_swath_definition = {}
+    footprints_per_key = {}
+    for footprint_request_key in footprint_request_keys:
+        (_, swath_definition_file_name, start, stop) = footprint_request_key
+        footprints_per_key[footprint_request_key] = None
+        iterations = _get_footprint_iterations(start, stop)
+        if iterations != None:
+            if not swath_definition_file_name in windows_per_swath_definition:
+                windows_per_swath_definition[swath_definition_file_name] = []
+            # end if
+            windows_per_swath_definition[swath_definition_file_name].append((footprint_request_key, iterations))
+        # end if
+    # end for
+
+    for swath_definition_file_name in windows_per_swath_definition:
+        swath_definition_file_path = eboa_functions.get_resources_path() + "/{}".format(swath_definition_file_name)
+        windows = windows_per_swath_definition[swath_definition_file_name]
+        coordinates_per_window = footprint_engine.get_footprints([(start, stop, iterations) for ((_, _, start, stop), iterations) in windows], satellite, swath_definition_file_path)
+        for ((footprint_request_key, iterations), coordinates) in zip(windows, coordinates_per_window):
+            footprints_per_key[footprint_request_key] = {"footprints": siboa_functions.correct_footprint(coordinates),
+                                                         "command": None,
+                                                         "coordinates": coordinates}
+        # end for
+    # end for
+
+    return footprints_per_key
+
+footprint_backends = {
+    "subprocess": functools.partial(_get_footprints_by_eocfi, execute_get_footprint_commands = _get_footprints_by_subprocess),
+    "batch": functools.partial(_get_footprints_by_eocfi, execute_get_footprint_commands = _get_footprints_by_batch),
+    "native": _get_footprints_by_native
+}
+
+footprint_caches = {}
+
+def get_footprint_cache():
+    """
+    Method to obtain the persistent cache of footprints configured through
+    FOOTPRINT_CACHE_PATH (by default resources/cache/footprints.sqlite) and
+    FOOTPRINT_CACHE_MAX_ENTRIES (0 disables the cache)
+
+    :return: cache of footprints or None if the cache is disabled
+    :rtype: FootprintCache
+    """
+    max_entries = int(get_configuration_value("FOOTPRINT_CACHE_MAX_ENTRIES", 0))
+    if max_entries <= 0:
+        return None
+    # end if
+
+    cache_file_path = get_configuration_value("FOOTPRINT_CACHE_PATH", eboa_functions.get_resources_path() + "/cache/footprints.sqlite")
+    if not (cache_file_path, max_entries) in footprint_caches:
+        footprint_caches[(cache_file_path, max_entries)] = FootprintCache(cache_file_path, max_entries)
+    # end if
+
+    return footprint_caches[(cache_file_path, max_entries)]
+
+def _get_footprints_using_cache(footprint_request_keys, satellite, orbpre_manager, footprint_backend, footprint_cache):
+    """
+    Method to obtain the footprints taking the ones available in the persistent cache
+    and storing in the cache the new ones
+    :param footprint_request_keys: footprint requests to obtain as tuples of satellite, swath definition, start and stop
+    :type footprint_request_keys: list
+    :param satellite: satellite of the events (S1A or S1B)
+    :type satellite: str
+    :param orbpre_manager: manager of the ORBPRE files
+    :type orbpre_manager: OrbpreManager
+    :param footprint_backend: name of the backend to obtain the footprints not available in the cache
+    :type footprint_backend: str
+    :param footprint_cache: cache of footprints
+    :type footprint_cache: FootprintCache
+
+    :return: footprint requests indexed by key (None if the footprint could not be obtained)
+    :rtype: dict
+    """
+    orbit_reference_file_path = glob.glob(eboa_functions.get_resources_path() + "/{}*MPL_ORBSCT*".format(satellite))[0]
+    orbit_reference_file_hash = get_file_hash(orbit_reference_file_path)
+
+    # The cache key is completed with the number of coordinates, the
+    # orbit reference and the backend, as they determine the footprint
+    cache_key_per_key = {}
+    footprints = {}
+    for footprint_request_key in footprint_request_keys:
+        (_, _, start, stop) = footprint_request_key
+        iterations = _get_footprint_iterations(start, stop)
+        if iterations != None:
+            cache_key_per_key[footprint_request_key] = footprint_request_key + (iterations, orbit_reference_file_hash, footprint_backend)
+        else:
+            footprints[footprint_request_key] = None
+        # end if
+    # end for
+
+    cached_footprints = footprint_cache.get(list(cache_key_per_key.values()))
+    footprint_request_keys_to_obtain = []
+    for footprint_request_key in cache_key_per_key:
+        cache_key = cache_key_per_key[footprint_request_key]
+        if cache_key in cached_footprints:
+            footprints[footprint_request_key] = cached_footprints[cache_key]
+        else:
+            footprint_request_keys_to_obtain.append(footprint_request_key)
+        # end if
+    # end for
+
+    logger.info("{} footprints have been taken from the cache and {} have to be obtained (cache statistics: {} hits and {} misses)".format(len(cached_footprints), len(footprint_request_keys_to_obtain), footprint_cache.hits, footprint_cache.misses))
+
+    if len(footprint_request_keys_to_obtain) > 0:
+        new_footprints = footprint_backends[footprint_backend](footprint_request_keys_to_obtain, satellite, orbpre_manager)
+        footprints.update(new_footprints)
+
+        # Footprints which could not be obtained are not stored. The
+        # command is not stored as it refers to an ORBPRE file of this execution
+        footprint_cache.put({cache_key_per_key[footprint_request_key]: dict(new_footprints[footprint_request_key], command = None) for footprint_request_key in new_footprints if new_footprints[footprint_request_key] != None})
+    # end if
+
+    return footprints
+
+def _build_footprint_samples(start, stop, coordinates):
+    """
+    Method to build the time-stamped samples of a footprint from its coordinates
+    (near edge followed by the far edge reversed) sampled uniformly from start to stop
+    :param start: start date in ISO 8601 of the window
+    :type start: str
+    :param stop: stop date in ISO 8601 of the window
+    :type stop: str
+    :param coordinates: coordinates of the footprint (longitude latitude pairs separated by spaces)
+    :type coordinates: str
+
+    :return: footprint samples with start and stop (in seconds from 2000-01-01), times and coordinates of the near and far edges or None if the coordinates do not follow the structure
+    :rtype: dict
+    """
+    values = [float(value) for value in coordinates.split()]
+    points = list(zip(values[0::2], values[1::2]))
+    if len(points) > 0 and points[0] == points[-1]:
+        points = points[:-1]
+    # end if
+    if len(points) < 4 or len(points) % 2 != 0:
+        return None
+    # end if
+
+    number_of_samples = int(len(points) / 2)
+    start_seconds = footprint_engine.to_seconds(start)
+    stop_seconds = footprint_engine.to_seconds(stop)
+
+    return {"start": start_seconds,
+            "stop": stop_seconds,
+            "times": [start_seconds + (stop_seconds - start_seconds) * i / (number_of_samples - 1) for i in range(number_of_samples)],
+            "near": points[:number_of_samples],
+            "far": points[number_of_samples:][::-1]}
+
+def _interpolate_point(point_1, point_2, fraction):
+    """
+    Method to interpolate linearly between two points taking into account the antimeridian
+    """
+    longitude_difference = point_2[0] - point_1[0]
+    if longitude_difference > 180:
+        longitude_difference -= 360
+    elif longitude_difference < -180:
+        longitude_difference += 360
+    # end if
+    longitude = point_1[0] + longitude_difference * fraction
+    if longitude > 180:
+        longitude -= 360
+    elif longitude <= -180:
+        longitude += 360
+    # end if
+
+    return (longitude, point_1[1] + (point_2[1] - point_1[1]) * fraction)
+
+def _clip_footprint_samples(footprint_samples, start, stop, iterations):
+    """
+    Method to obtain the coordinates of the footprint of a sub-window from the samples of a footprint covering it.
+    The edges are interpolated at the times get_footprint would use for the sub-window
+    :param footprint_samples: samples of the footprint covering the sub-window
+    :type footprint_samples: dict
+    :param start: start date in seconds from 2000-01-01 of the sub-window
+    :type start: float
+    :param stop: stop date in seconds from 2000-01-01 of the sub-window
+    :type stop: float
+    :param iterations: number of coordinates along track
+    :type iterations: int
+
+    :return: coordinates of the footprint (near edge followed by the far edge reversed and the first point)
+    :rtype: str
+    """
+    times = footprint_samples["times"]
+    near_points = []
+    far_points = []
+    number_of_samples = max(iterations, 2)
+    for i in range(number_of_samples):
+        time = start + (stop - start) * i / (number_of_samples - 1)
+        position = min(max(bisect.bisect_right(times, time) - 1, 0), len(times) - 2)
+        fraction = (time - times[position]) / (times[position + 1] - times[position])
+        near_points.append(_interpolate_point(footprint_samples["near"][position], footprint_samples["near"][position + 1], fraction))
+        far_points.append(_interpolate_point(footprint_samples["far"][position], footprint_samples["far"][position + 1], fraction))
+    # end for
+
+    points = near_points + far_points[::-1]
+    points.append(points[0])
+
+    return " ".join([footprint_engine.format_coordinate(longitude) + " " + footprint_engine.format_coordinate(latitude) for (longitude, latitude) in points])
+
+def _get_footprints_from_samples(footprint_request_keys, footprint_samples):
+    """
+    Method to obtain the footprints of the requests covered by the available footprint samples
+    :param footprint_request_keys: footprint requests to obtain as tuples of satellite, swath definition, start and stop
+    :type footprint_request_keys: list
+    :param footprint_samples: footprint samples indexed by (satellite, swath definition)
+    :type footprint_samples: dict
+
+    :return: footprint requests indexed by key (only the requests covered by the samples)
+    :rtype: dict
+    """
+    sorted_footprint_samples = {}
+    for samples_key in footprint_samples:
+        samples = sorted(footprint_samples[samples_key], key=lambda x:x["start"])
+        sorted_footprint_samples[samples_key] = (samples, [samples_of_window["start"] for samples_of_window in samples])
+    # end for
+
+    footprints = {}
+    for footprint_request_key in footprint_request_keys:
+        (satellite, swath_definition_file_name, start, stop) = footprint_request_key
+        if not (satellite, swath_definition_file_name) in sorted_footprint_samples:
+            continue
+        # end if
+        iterations = _get_footprint_iterations(start, stop)
+        if iterations == None:
+            continue
+        # end if
+        (samples, starts) = sorted_footprint_samples[(satellite, swath_definition_file_name)]
+        start_seconds = footprint_engine.to_seconds(start)
+        stop_seconds = footprint_engine.to_seconds(stop)
+
+        # Look for the samples covering the window (windows with footprint last less than 100 minutes)
+        position = bisect.bisect_right(starts, start_seconds) - 1
+        while position >= 0 and starts[position] > start_seconds - 6000:
+            if samples[position]["stop"] >= stop_seconds:
+                coordinates = _clip_footprint_samples(samples[position], start_seconds, stop_seconds, iterations)
+                footprints[footprint_request_key] = {"footprints": siboa_functions.correct_footprint(coordinates),
+                                                     "command": None,
+                                                     "coordinates": coordinates}
+                break
+            # end if
+            position -= 1
+        # end while
+    # end for
+
+    return footprints
+
 # Uncomment for debugging reasons
 # @debug
-def associate_footprints(events_per_imaging_mode, satellite, orbpre_events = None, return_polygon_format = False):
-    FNULL = open(os.devnull, 'w')
+def associate_footprints(events_per_imaging_mode, satellite, orbpre_events = None, return_polygon_format = False, footprint_requests = None, footprint_backend = None, orbpre_manager = None, footprint_samples = None):
+    """
+    Method to associate the footprints to the events
+    :param events_per_imaging_mode: events to associate the footprint to, indexed by imaging mode
+    :type events_per_imaging_mode: dict
+    :param satellite: satellite of the events (S1A or S1B)
+    :type satellite: str
+    :param return_polygon_format: flag to indicate if the footprints have to be returned in polygon format
+    :type return_polygon_format: bool
+    :param footprint_requests: footprints already obtained during the ingestion indexed by (satellite, swath definition, start, stop). It is updated with the new footprints obtained
+    :type footprint_requests: dict
+    :param footprint_backend: method to obtain the footprints (subprocess or batch using the get_footprint tool of the EOCFI or native). By default the configured FOOTPRINT_BACKEND
+    :type footprint_backend: str
+    :param orbpre_manager: manager of the ORBPRE files shared by the calls of the session. By default the ORBPRE files are generated and removed inside the call
+    :type orbpre_manager: OrbpreManager
+    :param footprint_samples: time-stamped samples of the footprints already obtained indexed by (satellite, swath definition). The footprints of the windows covered by them are interpolated from the samples. It is updated with the samples of the new footprints obtained
+    :type footprint_samples: dict
+
+    :return: list of events with the associated footprints
+    :rtype: list
+    """
     
     if not type(events_per_imaging_mode) == dict:
         raise EventsStructureIncorrect("The parameter events_per_imaging_mode has to be a list. Received events {}".format(events_per_imaging_mode))
@@ -157,92 +867,202 @@ def associate_footprints(events_per_imaging_mode, satellite, orbpre_events = Non
     logger.debug("There are {} events for associating footprints".format(len(all_events)))
 
     logger.debug("The events for associating footprints cover from {} to {}".format(all_events[0]["start"], all_events[-1]["stop"]))
-    
-    events_with_footprint = []
-    
-    t0 = Time("2000-01-01T00:00:00", format='isot', scale='utc')
 
-    orbpre_file_path = build_orbpre_file_from_reference(all_events[0]["start"], all_events[-1]["stop"], satellite)
+    # Windows sharing satellite, swath definition, start and stop
+    # (like the completeness events of the different levels) are
+    # requested only once
+    if footprint_requests == None:
+        footprint_requests = {}
+    # end if
 
-    for imaging_mode in events_per_imaging_mode:
-        events = events_per_imaging_mode[imaging_mode]
-        swath_definition_file_path = eboa_functions.get_resources_path() + "/{}".format(swath_definition[imaging_mode])
+    if footprint_backend == None:
+        footprint_backend = get_configuration_value("FOOTPRINT_BACKEND", "batch")
+    # end if
+    if not footprint_backend in footprint_backends:
+        raise FootprintBackendNotAvailable("The footprint backend {} is not available. Available backends: {}".format(footprint_backend, list(footprint_backends.keys())))
+    # end if
 
-        for event in events:
+    # Obtain the windows requiring a footprint
+    events_to_associate_footprint = []
+    for imaging_mode in events_per_imaging_mode:
+        for event in events_per_imaging_mode[imaging_mode]:
 
             if not type(event) == dict:
-                os.remove(orbpre_file_path)
                 raise EventsStructureIncorrect("The items of the events list has to be a dict. Received item {}".format(event))
             # end if
             footprint_details = []
             if "values" in event.keys():
                 footprint_details = [value for value in event["values"] if re.match("footprint_details.*", value["name"])]
             # end if
-            event_with_footprint = event.copy()
-
+            footprint_request_key = None
             if len(footprint_details) == 0:
-                start = Time(event["start"], format='isot', scale='utc')
-                stop = Time(event["stop"], format='isot', scale='utc')
-                start_mjd = start.mjd - t0.mjd
-                stop_mjd = stop.mjd - t0.mjd
-                # The footprint is created if the segment duration is less than 100 minutes (other segments are discarded as they are not interesting)
-                if (stop_mjd - start_mjd) < 0.0695:
-                    # The step between coordinates is fixed to 3.608 as for S2 (which is the duration of a scene) demonstrates a good step value
-                    iterations = int(((stop_mjd - start_mjd) * 24 * 60 * 60) / 3.608) + 1
-                    if iterations > 200:
-                        iterations = 200
-                    # end if
-                    get_footprint_command = "get_footprint -b {} -e {} -o '{} {}' -s {} -n {}".format(start_mjd, stop_mjd, orbpre_file_path, orbpre_file_path, swath_definition_file_path, iterations)
-                    try:
-                        footprint = subprocess.check_output(get_footprint_command, shell=True, stderr=FNULL)
-
-                        # Prepare footprint
-                        coordinates = footprint.decode("utf-8").replace(" \n", "")
-                        footprints = siboa_functions.correct_footprint(coordinates)
-
-                        for i, footprint in enumerate(footprints):
-
-                            if not ("values" in event_with_footprint.keys() and len(event_with_footprint["values"]) > 0):
-                                event_with_footprint["values"] = []
-                            # end if
-
-                            footprint_object_name = "footprint_details_" + str(i)
-
-                            if return_polygon_format:
-                                footprint = siboa_functions.obtain_polygon_format(footprint)
-                            # end if
-
-                            footprint_object = [{"name": "footprint",
-                                                 "type": "geometry",
-                                                 "value": footprint}]
-                            event_with_footprint["values"].append({
-                                "name": footprint_object_name,
-                                "type": "object",
-                                "values": footprint_object
-                            })
-
-                            if logger.getEffectiveLevel() == logging.DEBUG:
-                                footprint_object.append({"name": "get_footprint_command",
-                                                         "type": "text",
-                                                         "value": get_footprint_command})
-                            # end if
-                        # end for
-                    except subprocess.CalledProcessError:
-                        logger.error("The footprint of the events could not be built because the command {} ended in error".format(get_footprint_command))
+                footprint_request_key = (satellite, swath_definition[imaging_mode], event["start"], event["stop"])
+            # end if
+            events_to_associate_footprint.append((event, footprint_request_key))
+        # end for
+    # end for
+
+    new_footprint_request_keys = list(dict.fromkeys([footprint_request_key for (event, footprint_request_key) in events_to_associate_footprint if footprint_request_key != None and not footprint_request_key in footprint_requests]))
+
+    number_of_requests = len([footprint_request_key for (event, footprint_request_key) in events_to_associate_footprint if footprint_request_key != None])
+    logger.info("The number of footprint requests is {} from which {} have to be obtained".format(number_of_requests, len(new_footprint_request_keys)))
+
+    # Clip the footprints of the windows covered by the available samples
+    if footprint_samples != None and len(new_footprint_request_keys) > 0:
+        footprints_from_samples = _get_footprints_from_samples(new_footprint_request_keys, footprint_samples)
+        footprint_requests.update(footprints_from_samples)
+        new_footprint_request_keys = [footprint_request_key for footprint_request_key in new_footprint_request_keys if not footprint_request_key in footprints_from_samples]
+        logger.info("{} footprints have been obtained from the available footprint samples".format(len(footprints_from_samples)))
+    # end if
+
+    # Obtain the new footprints
+    if len(new_footprint_request_keys) > 0:
+        orbpre_manager_of_call = None
+        if orbpre_manager == None:
+            orbpre_manager_of_call = OrbpreManager()
+            orbpre_manager = orbpre_manager_of_call
+        # end if
+        try:
+            footprint_cache = get_footprint_cache()
+            if footprint_cache != None:
+                footprint_requests.update(_get_footprints_using_cache(new_footprint_request_keys, satellite, orbpre_manager, footprint_backend, footprint_cache))
+            else:
+                footprint_requests.update(footprint_backends[footprint_backend](new_footprint_request_keys, satellite, orbpre_manager))
+            # end if
+        finally:
+            if orbpre_manager_of_call != None:
+                orbpre_manager_of_call.close()
+            # end if
+        # end try
+
+        # Keep the samples of the new footprints
+        if footprint_samples != None:
+            for footprint_request_key in new_footprint_request_keys:
+                footprint_request = footprint_requests[footprint_request_key]
+                if footprint_request != None and "coordinates" in footprint_request:
+                    (_, swath_definition_file_name, start, stop) = footprint_request_key
+                    samples = _build_footprint_samples(start, stop, footprint_request["coordinates"])
+                    if samples != None:
+                        if not (satellite, swath_definition_file_name) in footprint_samples:
+                            footprint_samples[(satellite, swath_definition_file_name)] = []
+                        # end if
+                        footprint_samples[(satellite, swath_definition_file_name)].append(samples)
                     # end if
-                else:
-                    logger.info("The event with start {} and stop {} is too large".format(event["start"], event["stop"]))
                 # end if
+            # end for
+        # end if
+    # end if
+
+    # Associate the footprints to the events
+    events_with_footprint = []
+    for (event, footprint_request_key) in events_to_associate_footprint:
+        event_with_footprint = event.copy()
+
+        if footprint_request_key != None and footprint_requests[footprint_request_key] != None:
+            footprint_request = footprint_requests[footprint_request_key]
+
+            # The list of values is copied as it could be shared with other events (e.g. completeness events of different levels)
+            if "values" in event_with_footprint.keys() and len(event_with_footprint["values"]) > 0:
+                event_with_footprint["values"] = list(event_with_footprint["values"])
+            else:
+                event_with_footprint["values"] = []
             # end if
-            events_with_footprint.append(event_with_footprint)
 
-        # end for
-    # end for
+            for i, footprint in enumerate(footprint_request["footprints"]):
+
+                footprint_object_name = "footprint_details_" + str(i)
+
+                if return_polygon_format:
+                    footprint = siboa_functions.obtain_polygon_format(footprint)
+                # end if
 
-    os.remove(orbpre_file_path)
-        
-    FNULL.close()
+                footprint_object = [{"name": "footprint",
+                                     "type": "geometry",
+                                     "value": footprint}]
+                event_with_footprint["values"].append({
+                    "name": footprint_object_name,
+                    "type": "object",
+                    "values": footprint_object
+                })
+
+                if logger.getEffectiveLevel() == logging.DEBUG and footprint_request["command"] != None:
+                    footprint_object.append({"name": "get_footprint_command",
+                                             "type": "text",
+                                             "value": footprint_request["command"]})
+                # end if
+            # end for
+        # end if
+        events_with_footprint.append(event_with_footprint)
+    # end for
 
     logger.info("The number of events generated after associating the footprint is {}".format(len(events_with_footprint)))
     
     return events_with_footprint
+
+def split_completeness_operation(completeness_operation):
+    """
+    Method to split the completeness operation into one operation per level
+    (gauge) if configured (COMPLETENESS_OPERATIONS = "per_level"). The levels
+    do not interact, so the operations can be inserted concurrently. Every
+    operation uses the DIM signature of the completeness followed by the
+    level, as the source is inserted once per operation
+    :param completeness_operation: completeness operation
+    :type completeness_operation: dict
+
+    :return: completeness operations to insert
+    :rtype: list of dict
+    """
+    if get_configuration_value("COMPLETENESS_OPERATIONS", "single") != "per_level" or len(completeness_operation["events"]) == 0:
+        return [completeness_operation]
+    # end if
+
+    events_per_gauge = {}
+    for event in completeness_operation["events"]:
+        if event["gauge"]["name"] not in events_per_gauge:
+            events_per_gauge[event["gauge"]["name"]] = []
+        # end if
+        events_per_gauge[event["gauge"]["name"]].append(event)
+    # end for
+
+    completeness_operations = []
+    for gauge_name in sorted(events_per_gauge):
+        level = gauge_name.replace("PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_", "")
+        completeness_operation_per_level = dict(completeness_operation)
+        completeness_operation_per_level["dim_signature"] = dict(completeness_operation["dim_signature"], name = completeness_operation["dim_signature"]["name"] + "_" + level)
+        completeness_operation_per_level["source"] = dict(completeness_operation["source"])
+        completeness_operation_per_level["events"] = events_per_gauge[gauge_name]
+        completeness_operations.append(completeness_operation_per_level)
+    # end for
+
+    return completeness_operations
+
+def get_planned_imagings_by_datatake_id(query, satellite, start, stop):
+    """
+    Method to obtain the planned imagings of a satellite intersecting a window indexed by datatake identifier.
+    Only the UUID of the event, the datatake identifier and the imaging mode are obtained (one joined query
+    without loading the events and their values)
+    :param query: Query instance
+    :type query: Query
+    :param satellite: satellite of the planned imagings
+    :type satellite: str
+    :param start: start of the window
+    :type start: str
+    :param stop: stop of the window
+    :type stop: str
+
+    :return: tuples (event_uuid, imaging_mode) indexed by datatake identifier
+    :rtype: dict
+    """
+    datatake_id_values = aliased(EventText)
+    imaging_mode_values = aliased(EventText)
+
+    planned_imagings = query.session.query(Event.event_uuid, datatake_id_values.value, imaging_mode_values.value) \
+                                    .join(Gauge, Event.gauge_uuid == Gauge.gauge_uuid) \
+                                    .join(datatake_id_values, and_(datatake_id_values.event_uuid == Event.event_uuid, datatake_id_values.name == "datatake_id")) \
+                                    .join(imaging_mode_values, and_(imaging_mode_values.event_uuid == Event.event_uuid, imaging_mode_values.name == "imaging_mode")) \
+                                    .filter(Gauge.name == "PLANNED_IMAGING",
+                                            Gauge.system == satellite,
+                                            Event.start < stop,
+                                            Event.stop > start).all()
+
+    return {datatake_id: (event_uuid, imaging_mode) for (event_uuid, datatake_id, imaging_mode) in planned_imagings}
@@ -10,8 +10,11 @@ import os
 import argparse
 from dateutil import parser
 import datetime
-import tempfile
 import json
+import itertools
+import collections
+import multiprocessing
+import concurrent.futures
 
 # Import xml parser
 from lxml import etree
@@ -36,124 +39,199 @@ levels = {
     "OCN": "L2_OCN",
 }
 
-def process_file(file_path, engine, query, reception_time):
-    """Function to process the file and insert its relevant information
-    into the DDBB of the eboa
-    
-    :param file_path: path to the file to be processed
-    :type file_path: str
-    :param engine: Engine instance
-    :type engine: Engine
-    :param query: Query instance
-    :type query: Query
-    :param reception_time: time of the reception of the file by the triggering
-    :type reception_time: str
-
-    :return: data with the structure to be inserted into the DDBB
-    :rtype: dict
+class EntityFixedFile():
+    """
+    File object with the content of the OPDHUS file where the escaped
+    characters &gt; and &lt; are replaced by > and < while reading (the
+    geometries of the products are escaped XML nodes)
     """
-    list_of_dhus_product_events = []
-    completeness_events_per_imaging_mode = {}
-    list_of_annotations = []
-    list_of_explicit_references = []
-    file_name = os.path.basename(file_path)
 
-    # Get the general source entry (processor = None, version = None, DIM signature = PENDING_SOURCES)
-    # This is for registrering the ingestion progress
-    query_general_source = Query()
-    session_progress = query_general_source.session
-    general_source_progress = query_general_source.get_sources(names = {"filter": file_name, "op": "=="},
-                                                               dim_signatures = {"filter": "PENDING_SOURCES", "op": "=="},
-                                                               processors = {"filter": "", "op": "=="},
-                                                               processor_version_filters = [{"filter": "", "op": "=="}])
+    def __init__(self, file):
+        """
+        :param file: file object opened in binary mode
+        :type file: file
+        """
+        self.file = file
+
+    def read(self, size = -1):
+        data = self.file.read(size)
+        # Complete the escaped character split by the end of the read data
+        index = data.rfind(b"&", max(len(data) - 3, 0))
+        while index != -1 and (b"&gt;".startswith(data[index:]) or b"&lt;".startswith(data[index:])):
+            more_data = self.file.read(4 - (len(data) - index))
+            if len(more_data) == 0:
+                break
+            # end if
+            data += more_data
+            index = data.rfind(b"&", max(len(data) - 3, 0))
+        # end while
+
+        return data.replace(b"&gt;", b">").replace(b"&lt;", b"<")
+
+def _decode_dhus_product(dhus_product):
+    """
+    Method to decode an entry of the OPDHUS file
+    :param dhus_product: entry node without namespaces
+    :type dhus_product: lxml.etree._Element
 
-    if len(general_source_progress) > 0:
-        general_source_progress = general_source_progress[0]
-    # end if
-    
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 10)
+    :return: metadata of the DHUS product
+    :rtype: dict
+    """
+    return {
+        "name": dhus_product.xpath("properties/Name")[0].text,
+        "identifier": dhus_product.xpath("properties/Id")[0].text,
+        "ingestion_date": dhus_product.xpath("properties/IngestionDate")[0].text,
+        "creation_date": dhus_product.xpath("properties/CreationDate")[0].text,
+        "size": dhus_product.xpath("properties/ContentLength")[0].text,
+        "metadata_url": dhus_product.xpath("id")[0].text,
+        "geometry": dhus_product.xpath("properties/ContentGeometry/Polygon/outerBoundaryIs/LinearRing/coordinates")[0].text,
+        "start": dhus_product.xpath("properties/ContentDate/Start")[0].text,
+        "stop": dhus_product.xpath("properties/ContentDate/End")[0].text
+    }
 
-    # Replace &gt; by > and &lt; by <
-    new_file_with_wrong_characters = tempfile.NamedTemporaryFile("w+t")
-    new_file_with_wrong_characters_path = new_file_with_wrong_characters.name
-    input_file = open(file_path, "rt")
-    data = input_file.read()
-    input_file.close()
-    new_file_with_wrong_characters_replace = open(new_file_with_wrong_characters_path, "wt")
-    new_file_with_wrong_characters_replace.write(data.replace("&gt;", ">").replace("&lt;", "<"))
-    new_file_with_wrong_characters_replace.close()
-
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 20)
-    
-    # Remove namespaces
-    new_file = tempfile.NamedTemporaryFile()
-    new_file_path = new_file.name
-    eboa_ingestion_functions.remove_namespaces(new_file_with_wrong_characters_path, new_file_path)
-    
-    # Parse file
-    parsed_xml = etree.parse(new_file_path)
-    xpath_xml = etree.XPathEvaluator(parsed_xml)
+def _read_dhus_products(file_path):
+    """
+    Method to read the entries of the OPDHUS file in streaming. The escaped
+    characters are replaced and the namespaces are removed while parsing and
+    every entry is freed once decoded, so no intermediate files are written
+    and the XML tree does not grow with the number of entries. The entries
+    are yielded as they are decoded
+    :param file_path: path to the OPDHUS file
+    :type file_path: str
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 30)
+    :return: metadata of the DHUS products
+    :rtype: generator of dict
+    """
+    with open(file_path, "rb") as file:
+        for (_, element) in etree.iterparse(EntityFixedFile(file), events = ("end",), tag = "{*}entry"):
+            parent = element.getparent()
+            dhus_product = None
+            if etree.QName(parent).localname == "feed" and parent.getparent() is None:
+                s1boa_ingestion_functions.remove_namespaces_from_element(element)
+                dhus_product = _decode_dhus_product(element)
+            # end if
+
+            # Free the entry and the already processed ones
+            element.clear()
+            while element.getprevious() is not None:
+                del parent[0]
+            # end while
+
+            if dhus_product != None:
+                yield dhus_product
+            # end if
+        # end for
+    # end with
 
-    satellite = file_name[16:19]
-    reported_generation_time = file_name[25:40]
-    reported_validity_start = file_name[42:57]
-    reported_validity_stop = file_name[58:73]
-    sensing_start_nodes = xpath_xml("/feed/entry/properties/ContentDate/Start")
-    sensing_stop_nodes = xpath_xml("/feed/entry/properties/ContentDate/End")
-    if len(sensing_start_nodes) > 0:
-        sensing_starts = [node.text for node in sensing_start_nodes]
-        sensing_starts.sort()
-        # Apply same margin applied for events
-        validity_start = (parser.parse(sensing_starts[0]) - datetime.timedelta(seconds=1)).isoformat()
-    else:
-        validity_start = reported_validity_start
-    # end if
-    if len(sensing_stop_nodes) > 0:
-        sensing_stops = [node.text for node in sensing_stop_nodes]
-        sensing_stops.sort()
-        validity_stop = sensing_stops[-1]
-    else:
-        validity_stop = reported_validity_stop
-    # end if
-    ingestion_completeness = "true"
-    ingestion_completeness_message = ""
+def _get_chunks(dhus_products, chunk_size):
+    """
+    Method to group the DHUS products in chunks as they are read
+    :param dhus_products: metadata of the DHUS products
+    :type dhus_products: iterable of dict
+    :param chunk_size: maximum number of DHUS products per chunk
+    :type chunk_size: int
+
+    :return: chunks of DHUS products
+    :rtype: generator of list of dict
+    """
+    dhus_products = iter(dhus_products)
+    chunk = list(itertools.islice(dhus_products, chunk_size))
+    while len(chunk) > 0:
+        yield chunk
+        chunk = list(itertools.islice(dhus_products, chunk_size))
+    # end while
+
+def _coalesce_completeness_events(completeness_events):
+    """
+    Method to merge the overlapping or adjacent completeness events of the
+    products with the same level, datatake id, orbit and status into one
+    event. The names of the merged products are kept in the object
+    dhus_products (values dhus_product_N) and the footprints already
+    associated (geometries of the products) are renumbered
+    :param completeness_events: completeness events of the DHUS products
+    :type completeness_events: list of dict
+
+    :return: coalesced completeness events
+    :rtype: list of dict
+    """
+    completeness_events_by_segment = {}
+    for event in completeness_events:
+        values = {value["name"]: value["value"] for value in event["values"] if value["type"] != "object"}
+        segment = (event["gauge"]["name"], values["datatake_id"], values["orbit"], values["status"])
+        if segment not in completeness_events_by_segment:
+            completeness_events_by_segment[segment] = []
+        # end if
+        completeness_events_by_segment[segment].append(event)
+    # end for
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 40)
+    coalesced_completeness_events = []
+    for segment in completeness_events_by_segment:
+        merged_events = []
+        for event in sorted(completeness_events_by_segment[segment], key = lambda event: parser.parse(event["start"])):
+            if len(merged_events) > 0 and parser.parse(event["start"]) <= parser.parse(merged_events[-1][-1]["stop"]):
+                merged_events[-1].append(event)
+            else:
+                merged_events.append([event])
+            # end if
+        # end for
 
-    dhus_products = xpath_xml("/feed/entry")
-    indexed_planned_imagings = {}
-    if len(dhus_products) > 0:
-        # Obtain the planned imaging
-        planned_imagings = query.get_events(gauge_names = {"filter": "PLANNED_IMAGING", "op": "=="},
-                                            gauge_systems = {"filter": satellite, "op": "=="},
-                                            start_filters = [{"date": validity_stop, "op": "<"}],
-                                            stop_filters = [{"date": validity_start, "op": ">"}])
-
-        for planned_imaging in planned_imagings:
-            datatake_id_values = [value for value in planned_imaging.eventTexts if value.name == "datatake_id"]
-            datatake_id = datatake_id_values[0].value
-                    
-            indexed_planned_imagings[datatake_id] = planned_imaging
+        for events in merged_events:
+            coalesced_event = dict(events[0])
+            coalesced_event["stop"] = max([event["stop"] for event in events], key = parser.parse)
+            coalesced_event["values"] = [value for value in events[0]["values"] if not value["name"].startswith("footprint_details_")]
+            footprints = [value for event in events for value in event["values"] if value["name"].startswith("footprint_details_")]
+            for (iterator, footprint) in enumerate(footprints):
+                coalesced_event["values"].append(dict(footprint, name = "footprint_details_" + str(iterator)))
+            # end for
+            coalesced_event["values"].append({
+                "name": "dhus_products",
+                "type": "object",
+                "values": [{"name": "dhus_product_" + str(iterator),
+                            "type": "text",
+                            "value": event["explicit_reference"]} for (iterator, event) in enumerate(events)]
+            })
+            coalesced_completeness_events.append(coalesced_event)
         # end for
-    # end if
+    # end for
 
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 60)
+    return coalesced_completeness_events
+
+def _generate_dhus_product_entities(dhus_products, satellite, indexed_planned_imagings, completeness_footprint, notification_time):
+    """
+    Method to generate the explicit references, annotations and events for the DHUS products
+    :param dhus_products: metadata of the DHUS products
+    :type dhus_products: list of dict
+    :param satellite: satellite of the DHUS products
+    :type satellite: str
+    :param indexed_planned_imagings: tuples (event_uuid, imaging_mode) of the planned imagings indexed by datatake id
+    :type indexed_planned_imagings: dict
+    :param completeness_footprint: origin of the footprints of the completeness (product or orbit)
+    :type completeness_footprint: str
+    :param notification_time: notification time of the alerts
+    :type notification_time: str
+
+    :return: explicit references, annotations, DHUS product events, completeness events with their imaging mode and flag indicating if any product has no planned imaging
+    :rtype: tuple
+    """
+    explicit_references = []
+    annotations = []
+    dhus_product_events = []
+    completeness_events = []
+    missing_planning = False
 
     for dhus_product in dhus_products:
         ########
         # Obtain metadata
         ########
-        name = dhus_product.xpath("properties/Name")[0].text
+        name = dhus_product["name"]
         imaging_mode = name[4:6]
-        identifier = dhus_product.xpath("properties/Id")[0].text
-        ingestion_date = dhus_product.xpath("properties/IngestionDate")[0].text
-        creation_date = dhus_product.xpath("properties/CreationDate")[0].text
-        size = dhus_product.xpath("properties/ContentLength")[0].text
-        metadata_url = dhus_product.xpath("id")[0].text
+        identifier = dhus_product["identifier"]
+        ingestion_date = dhus_product["ingestion_date"]
+        creation_date = dhus_product["creation_date"]
+        size = dhus_product["size"]
+        metadata_url = dhus_product["metadata_url"]
         product_url = metadata_url + "/$value"
-        geometry = dhus_product.xpath("properties/ContentGeometry/Polygon/outerBoundaryIs/LinearRing/coordinates")[0].text
+        geometry = dhus_product["geometry"]
         orbit = str(int(name[49:55]))
         # All these elements are to remove the 0 at the left side
         datatake_id = hex(int(int(name[56:62], 16).to_bytes(4,'big').hex(),16)).replace("0x", "").upper()
@@ -161,8 +239,8 @@ def process_file(file_path, engine, query, reception_time):
         ########
         # Obtain timings
         ########
-        start = dhus_product.xpath("properties/ContentDate/Start")[0].text
-        stop = dhus_product.xpath("properties/ContentDate/End")[0].text
+        start = dhus_product["start"]
+        stop = dhus_product["stop"]
 
         ########
         # Define dhus product reference
@@ -172,7 +250,7 @@ def process_file(file_path, engine, query, reception_time):
             "group": "DHUS_PRODUCT",
             "name": name
         }
-        list_of_explicit_references.append(dhus_product_reference)
+        explicit_references.append(dhus_product_reference)
 
         ########
         # Define dhus product annotations
@@ -190,7 +268,7 @@ def process_file(file_path, engine, query, reception_time):
                  "value": creation_date
                 }]
         }
-        list_of_annotations.append(dhus_publication_annotation)
+        annotations.append(dhus_publication_annotation)
 
         # Dhus metadata time
         # Correct geometry as it comes in the form of latitude,
@@ -239,7 +317,7 @@ def process_file(file_path, engine, query, reception_time):
                 }]
         }
 
-        list_of_annotations.append(dhus_metadata_annotation)
+        annotations.append(dhus_metadata_annotation)
 
         ########
         # Define dhus product event
@@ -250,17 +328,15 @@ def process_file(file_path, engine, query, reception_time):
         status = "PUBLISHED"
         if datatake_id in indexed_planned_imagings:
             # Obtain the planned imaging
-            planned_imaging = indexed_planned_imagings[datatake_id]
-            imaging_mode_values = [value for value in planned_imaging.eventTexts if value.name == "imaging_mode"]
-            imaging_mode = imaging_mode_values[0].value
+            (planned_imaging_uuid, imaging_mode) = indexed_planned_imagings[datatake_id]
             links_dhus_product.append({
-                "link": str(planned_imaging.event_uuid),
+                "link": str(planned_imaging_uuid),
                 "link_mode": "by_uuid",
                 "name": "DHUS_PRODUCT",
                 "back_ref": "PLANNED_IMAGING"
             })
             links_dhus_product_completeness.append({
-                "link": str(planned_imaging.event_uuid),
+                "link": str(planned_imaging_uuid),
                 "link_mode": "by_uuid",
                 "name": "DHUS_PRODUCT_COMPLETENESS",
                 "back_ref": "PLANNED_IMAGING"
@@ -270,7 +346,7 @@ def process_file(file_path, engine, query, reception_time):
             alerts.append({
                 "message": "The DHUS product {} could not be linked to any planned imaging".format(name),
                 "generator": os.path.basename(__file__),
-                "notification_time": (datetime.datetime.now()).isoformat(),
+                "notification_time": notification_time,
                 "alert_cnf": {
                     "name": "ALERT-0200: NO PLANNED IMAGING FOR A DHUS PRODUCT",
                     "severity": "fatal",
@@ -278,8 +354,7 @@ def process_file(file_path, engine, query, reception_time):
                     "group": "S1_DHUS"
                 }
             })
-            ingestion_completeness = "false"
-            ingestion_completeness_message = "MISSING_PLANNING"
+            missing_planning = True
         # end if
 
         # Dhus product event
@@ -309,7 +384,7 @@ def process_file(file_path, engine, query, reception_time):
             ]
         }
 
-        list_of_dhus_product_events.append(dhus_product_event)
+        dhus_product_events.append(dhus_product_event)
 
         # Insert geometries
         iterator = 0
@@ -364,11 +439,156 @@ def process_file(file_path, engine, query, reception_time):
             ]
         }
 
-        s1boa_ingestion_functions.insert_event(dhus_product_completeness_event, completeness_events_per_imaging_mode, imaging_mode)
+        if completeness_footprint == "product":
+            for (iterator, coordinates) in enumerate(list_formatted_coordinates_corrected):
+                dhus_product_completeness_event["values"].append({
+                    "name": "footprint_details_" + str(iterator),
+                    "type": "object",
+                    "values": [{"name": "footprint",
+                                "type": "geometry",
+                                "value": coordinates.replace(",", " ")}]
+                })
+            # end for
+        # end if
+
+        completeness_events.append((imaging_mode, dhus_product_completeness_event))
+
+    # end for
+
+    return (explicit_references, annotations, dhus_product_events, completeness_events, missing_planning)
+
+def process_file(file_path, engine, query, reception_time):
+    """Function to process the file and insert its relevant information
+    into the DDBB of the eboa
+    
+    :param file_path: path to the file to be processed
+    :type file_path: str
+    :param engine: Engine instance
+    :type engine: Engine
+    :param query: Query instance
+    :type query: Query
+    :param reception_time: time of the reception of the file by the triggering
+    :type reception_time: str
+
+    :return: data with the structure to be inserted into the DDBB
+    :rtype: dict
+    """
+    list_of_dhus_product_events = []
+    completeness_events_per_imaging_mode = {}
+    list_of_annotations = []
+    list_of_explicit_references = []
+    file_name = os.path.basename(file_path)
+
+    # The footprints of the completeness can be the geometries of the products instead of the ones obtained from the orbit
+    completeness_footprint = s1boa_ingestion_functions.get_configuration_value("DHUS_COMPLETENESS_FOOTPRINT", "orbit")
+
+    # Get the general source entry (processor = None, version = None, DIM signature = PENDING_SOURCES)
+    # This is for registrering the ingestion progress
+    query_general_source = Query()
+    session_progress = query_general_source.session
+    general_source_progress = query_general_source.get_sources(names = {"filter": file_name, "op": "=="},
+                                                               dim_signatures = {"filter": "PENDING_SOURCES", "op": "=="},
+                                                               processors = {"filter": "", "op": "=="},
+                                                               processor_version_filters = [{"filter": "", "op": "=="}])
+
+    if len(general_source_progress) > 0:
+        general_source_progress = general_source_progress[0]
+    # end if
+    
+    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 10)
+
+    satellite = file_name[16:19]
+    reported_generation_time = file_name[25:40]
+    reported_validity_start = file_name[42:57]
+    reported_validity_stop = file_name[58:73]
+
+    # Read the DHUS products replacing the escaped characters and removing the namespaces on the fly
+    # and generate their entities in chunks as they are read (processed by a pool of processes if configured),
+    # so only the DHUS products of the chunks being processed are kept in memory
+    # The notification time of the alerts is common so that the result does not depend on the chunks
+    notification_time = datetime.datetime.now().isoformat()
+    dhus_products_workers = int(s1boa_ingestion_functions.get_configuration_value("DHUS_PRODUCTS_WORKERS", 1))
+    chunk_size = int(s1boa_ingestion_functions.get_configuration_value("DHUS_PRODUCTS_CHUNK_SIZE", 500))
+    validity_start = None
+    validity_stop = None
+    # Planned imaging (UUID and imaging mode) indexed by datatake id, obtained for the window of every chunk
+    indexed_planned_imagings = {}
+    entities_per_chunk = []
+    executor = None
+    if dhus_products_workers > 1:
+        # The processes are spawned to not inherit the connections to the DDBB
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers = dhus_products_workers, mp_context = multiprocessing.get_context("spawn"))
+    # end if
+    try:
+        pending_chunks = collections.deque()
+        for chunk in _get_chunks(_read_dhus_products(file_path), chunk_size):
+            # Apply same margin applied for events
+            chunk_start = (parser.parse(min([dhus_product["start"] for dhus_product in chunk])) - datetime.timedelta(seconds=1)).isoformat()
+            chunk_stop = max([dhus_product["stop"] for dhus_product in chunk])
+            if validity_start == None or chunk_start < validity_start:
+                validity_start = chunk_start
+            # end if
+            if validity_stop == None or chunk_stop > validity_stop:
+                validity_stop = chunk_stop
+            # end if
+
+            indexed_planned_imagings.update(s1boa_ingestion_functions.get_planned_imagings_by_datatake_id(query, satellite, chunk_start, chunk_stop))
+
+            if executor != None:
+                # The planned imagings are copied as they are sent to the process after the submission
+                pending_chunks.append(executor.submit(_generate_dhus_product_entities, chunk, satellite, dict(indexed_planned_imagings), completeness_footprint, notification_time))
+                # Limit the chunks waiting to be processed
+                if len(pending_chunks) >= 2 * dhus_products_workers:
+                    entities_per_chunk.append(pending_chunks.popleft().result())
+                # end if
+            else:
+                entities_per_chunk.append(_generate_dhus_product_entities(chunk, satellite, indexed_planned_imagings, completeness_footprint, notification_time))
+            # end if
+        # end for
+        while len(pending_chunks) > 0:
+            entities_per_chunk.append(pending_chunks.popleft().result())
+        # end while
+    finally:
+        if executor != None:
+            executor.shutdown()
+        # end if
+    # end try
+
+    if validity_start == None:
+        validity_start = reported_validity_start
+        validity_stop = reported_validity_stop
+    # end if
+    ingestion_completeness = "true"
+    ingestion_completeness_message = ""
+
+    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 60)
 
+    # Merge the entities in the order of the DHUS products
+    for (explicit_references, annotations, dhus_product_events, completeness_events, missing_planning) in entities_per_chunk:
+        list_of_explicit_references += explicit_references
+        list_of_annotations += annotations
+        list_of_dhus_product_events += dhus_product_events
+        for (imaging_mode, dhus_product_completeness_event) in completeness_events:
+            s1boa_ingestion_functions.insert_event(dhus_product_completeness_event, completeness_events_per_imaging_mode, imaging_mode)
+        # end for
+        if missing_planning:
+            ingestion_completeness = "false"
+            ingestion_completeness_message = "MISSING_PLANNING"
+        # end if
     # end for
 
-    list_of_completeness_events_with_footprints = s1boa_ingestion_functions.associate_footprints(completeness_events_per_imaging_mode, satellite)
+    # Merge the completeness of the products of the same datatake
+    if s1boa_ingestion_functions.get_configuration_value("DHUS_COMPLETENESS_COALESCE", "false") == "true":
+        for imaging_mode in completeness_events_per_imaging_mode:
+            completeness_events_per_imaging_mode[imaging_mode] = _coalesce_completeness_events(completeness_events_per_imaging_mode[imaging_mode])
+        # end for
+    # end if
+
+    if completeness_footprint == "product":
+        list_of_completeness_events_with_footprints = [event for imaging_mode in completeness_events_per_imaging_mode for event in completeness_events_per_imaging_mode[imaging_mode]]
+    else:
+        list_of_completeness_events_with_footprints = s1boa_ingestion_functions.associate_footprints(completeness_events_per_imaging_mode, satellite)
+    # end if
     
     # Build the json
     dhus_products_operation = {
@@ -419,13 +639,10 @@ def process_file(file_path, engine, query, reception_time):
         "events": list_of_completeness_events_with_footprints
     }
 
-    data = {"operations": [dhus_products_operation, nppf_completeness_operation]}
+    data = {"operations": [dhus_products_operation] + s1boa_ingestion_functions.split_completeness_operation(nppf_completeness_operation)}
     
     eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 100)
 
     query.close_session()
-
-    new_file.close()
-    new_file_with_wrong_characters.close()
     
     return data
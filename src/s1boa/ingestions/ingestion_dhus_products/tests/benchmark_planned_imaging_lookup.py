@@ -0,0 +1,127 @@
+"""
+Benchmark of the lookup of the planned imagings by datatake identifier
+used by the ingestion of the OPDHUS_S1 files
+
+Planned imagings are inserted in the configured database (its content is
+removed) and they are indexed by datatake identifier loading the events
+and their values (previous lookup) and with the projected query.
+
+Usage: python3 benchmark_planned_imaging_lookup.py [-n 5000]
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1boa
+"""
+# Import python utilities
+import argparse
+import datetime
+import time
+
+# Import engine of the DDBB
+from eboa.engine.engine import Engine
+from eboa.engine.query import Query
+
+# Import functions
+import s1boa.ingestions.functions as s1boa_functions
+
+window_start = datetime.datetime(2021, 3, 16)
+
+def insert_planned_imagings(number_of_planned_imagings):
+    """
+    Method to insert planned imagings of 5 minutes every 10 minutes
+    :param number_of_planned_imagings: number of planned imagings to insert
+    :type number_of_planned_imagings: int
+    """
+    events = []
+    for i in range(number_of_planned_imagings):
+        start = window_start + datetime.timedelta(minutes = 10 * i)
+        events.append({
+            "gauge": {
+                "insertion_type": "SIMPLE_UPDATE",
+                "name": "PLANNED_IMAGING",
+                "system": "S1A"
+            },
+            "start": start.isoformat(),
+            "stop": (start + datetime.timedelta(minutes = 5)).isoformat(),
+            "values": [
+                {"name": "request_id", "type": "text", "value": str(i)},
+                {"name": "imaging_mode", "type": "text", "value": "IW"},
+                {"name": "imaging_mode_long_name", "type": "text", "value": "INTERFEROMETRIC_WIDE_SWATH"},
+                {"name": "warmup", "type": "text", "value": "0"},
+                {"name": "polarisation", "type": "text", "value": "DV"},
+                {"name": "datatake_id", "type": "text", "value": hex(i + 1).replace("0x", "").upper()},
+                {"name": "number_of_chops", "type": "double", "value": "1"}
+            ]
+        })
+    # end for
+    stop = window_start + datetime.timedelta(minutes = 10 * number_of_planned_imagings)
+
+    engine = Engine()
+    engine.treat_data({"operations": [{
+        "mode": "insert",
+        "dim_signature": {
+            "name": "NPPF_S1A",
+            "exec": "benchmark_planned_imaging_lookup.py",
+            "version": "1.0"
+        },
+        "source": {
+            "name": "BENCHMARK_PLANNED_IMAGING_LOOKUP",
+            "reception_time": stop.isoformat(),
+            "generation_time": window_start.isoformat(),
+            "validity_start": window_start.isoformat(),
+            "validity_stop": stop.isoformat()
+        },
+        "events": events
+    }]})
+    engine.close_session()
+
+    return stop.isoformat()
+
+def index_loading_events(query, start, stop):
+    """
+    Method to index the planned imagings by datatake identifier loading the events and their values
+    """
+    indexed_planned_imagings = {}
+    planned_imagings = query.get_events(gauge_names = {"filter": "PLANNED_IMAGING", "op": "=="},
+                                        gauge_systems = {"filter": "S1A", "op": "=="},
+                                        start_filters = [{"date": stop, "op": "<"}],
+                                        stop_filters = [{"date": start, "op": ">"}])
+    for planned_imaging in planned_imagings:
+        datatake_id = [value for value in planned_imaging.eventTexts if value.name == "datatake_id"][0].value
+        imaging_mode = [value for value in planned_imaging.eventTexts if value.name == "imaging_mode"][0].value
+        indexed_planned_imagings[datatake_id] = (planned_imaging.event_uuid, imaging_mode)
+    # end for
+
+    return indexed_planned_imagings
+
+lookups = {
+    "events": index_loading_events,
+    "projected": lambda query, start, stop: s1boa_functions.get_planned_imagings_by_datatake_id(query, "S1A", start, stop)
+}
+
+def main():
+    args_parser = argparse.ArgumentParser(description="Benchmark of the lookup of the planned imagings by datatake identifier")
+    args_parser.add_argument("-n", "--number_of_planned_imagings", type=int, default=5000,
+                             help="Number of planned imagings in the window")
+    args = args_parser.parse_args()
+
+    query = Query()
+    query.clear_db()
+    stop = insert_planned_imagings(args.number_of_planned_imagings)
+
+    print("{:>10} {:>12} {:>18}".format("lookup", "time (s)", "planned imagings"))
+    for lookup_name in lookups:
+        # New session so that no event is already loaded
+        query.close_session()
+        query = Query()
+        start = time.perf_counter()
+        indexed_planned_imagings = lookups[lookup_name](query, window_start.isoformat(), stop)
+        duration = time.perf_counter() - start
+        print("{:>10} {:>12.3f} {:>18}".format(lookup_name, duration, len(indexed_planned_imagings)))
+    # end for
+
+    query.clear_db()
+    query.close_session()
+
+if __name__ == "__main__":
+    main()
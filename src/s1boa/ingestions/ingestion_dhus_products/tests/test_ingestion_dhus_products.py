@@ -11,6 +11,9 @@ import os
 import sys
 import unittest
 import datetime
+import io
+import re
+import json
 
 # Import engine of the DDBB
 import eboa.engine.engine as eboa_engine
@@ -20,6 +23,9 @@ from eboa.engine.query import Query
 # Import ingestion
 import eboa.ingestion.eboa_ingestion as ingestion
 
+# Import DHUS products ingestion
+from s1boa.ingestions.ingestion_dhus_products import ingestion_dhus_products
+
 class TestOpdhus(unittest.TestCase):
     def setUp(self):
         # Create the engine to manage the data
@@ -618,3 +624,114 @@ class TestOpdhus(unittest.TestCase):
         assert alerts_planned_imaging[0].message == "The L2 OCN product related to the datatake id 45BC0 and corresponding to the planned imaging with mode INTERFEROMETRIC_WIDE_SWATH and timings 2021-03-17T04:10:33.066685_2021-03-17T04:17:48.873819 over orbit 37033 has not been published"
 
         assert alerts_planned_imaging[1].message == "The L2 OCN product related to the datatake id 45BC0 and corresponding to the planned imaging with mode INTERFEROMETRIC_WIDE_SWATH and timings 2021-03-17T04:10:33.066685_2021-03-17T04:17:48.873819 over orbit 37033 has not been published"
+
+    def test_read_opdhus_escaped_characters(self):
+        filename = "DEC_OPER_OPDHUS_S1A_AUIP_20210419T135405_V20210316T000000_20210319T000000_2161_2150_SHORTENED.xml"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        with open(file_path, "rb") as file:
+            content = file.read()
+        # end with
+
+        # Reads of few bytes split the escaped characters
+        for size in [1, 2, 3, 5, 7, 1024]:
+            entity_fixed_file = ingestion_dhus_products.EntityFixedFile(io.BytesIO(content))
+            fixed_content = b""
+            data = entity_fixed_file.read(size)
+            while len(data) > 0:
+                fixed_content += data
+                data = entity_fixed_file.read(size)
+            # end while
+
+            assert fixed_content == content.replace(b"&gt;", b">").replace(b"&lt;", b"<")
+        # end for
+
+        # The entries are yielded as they are read
+        dhus_products = ingestion_dhus_products._read_dhus_products(file_path)
+        first_dhus_product = next(dhus_products)
+
+        assert len(list(dhus_products)) == 84
+        assert first_dhus_product == {
+            "name": "S1A_EW_GRDM_1SDH_20210316T181053_20210316T181157_037027_045B92_2677",
+            "identifier": "5d9c9636-460f-4716-9827-6ccf3d88046d",
+            "ingestion_date": "2021-03-16T20:39:12.848",
+            "creation_date": "2021-03-16T21:24:18.270",
+            "size": "228598125",
+            "metadata_url": "https://scihub.copernicus.eu/dhus/odata/v1/Products('5d9c9636-460f-4716-9827-6ccf3d88046d')",
+            "geometry": "76.901695,-155.149475 78.285431,-171.469025 81.995888,-165.186462 80.133499,-143.971863 76.901695,-155.149475",
+            "start": "2021-03-16T18:10:53.109",
+            "stop": "2021-03-16T18:11:57.398"
+        }
+
+    def test_insert_opdhus_completeness_footprint_from_product(self):
+        filename = "DEC_OPER_OPDHUS_S1A_AUIP_20210419T135405_V20210316T000000_20210319T000000_2161_2150_SHORTENED.xml"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        os.environ["S1BOA_DHUS_COMPLETENESS_FOOTPRINT"] = "product"
+        try:
+            exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_dhus_products.ingestion_dhus_products", file_path, "2018-01-01T00:00:00")
+        finally:
+            del os.environ["S1BOA_DHUS_COMPLETENESS_FOOTPRINT"]
+        # end try
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        # The footprints of the completeness are the geometries of the products
+        events = self.query_eboa.get_events(gauge_names = {"filter": "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_L1_GRD", "op": "=="},
+                                                start_filters = [{"date": "2021-03-16T18:10:52.109000", "op": "=="}],
+                                                stop_filters = [{"date": "2021-03-16T18:11:57.398000", "op": "=="}])
+
+        assert len(events) == 1
+
+        dhus_product_events = self.query_eboa.get_events(gauge_names = {"filter": "DHUS_PRODUCT", "op": "=="},
+                                                         explicit_refs = {"filter": "S1A_EW_GRDM_1SDH_20210316T181053_20210316T181157_037027_045B92_2677", "op": "=="})
+
+        assert len(dhus_product_events) == 1
+
+        footprints = [value["values"][0]["value"] for value in events[0].get_structured_values() if value["name"].startswith("footprint_details_")]
+        geometries = [value["value"] for value in dhus_product_events[0].get_structured_values() if value["name"].startswith("coordinates_")]
+
+        assert len(footprints) > 0
+        assert footprints == geometries
+
+    def test_insert_opdhus_coalesced_completeness(self):
+        filename = "DEC_OPER_OPDHUS_S1A_AUIP_20210419T135405_V20210316T000000_20210319T000000_2161_2150_SHORTENED.xml"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        os.environ["S1BOA_DHUS_COMPLETENESS_COALESCE"] = "true"
+        try:
+            exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_dhus_products.ingestion_dhus_products", file_path, "2018-01-01T00:00:00")
+        finally:
+            del os.environ["S1BOA_DHUS_COMPLETENESS_COALESCE"]
+        # end try
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        # Every product is referenced by one completeness segment
+        events = self.query_eboa.get_events(gauge_names = {"filter": "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_%", "op": "like"})
+
+        dhus_products = [product["value"] for event in events for value in event.get_structured_values() if value["name"] == "dhus_products" for product in value["values"]]
+
+        assert len(events) < 85
+        assert len(dhus_products) == 85
+        assert len(set(dhus_products)) == 85
+
+    def test_process_opdhus_in_chunks(self):
+        filename = "DEC_OPER_OPDHUS_S1A_AUIP_20210419T135405_V20210316T000000_20210319T000000_2161_2150_SHORTENED.xml"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        data = ingestion_dhus_products.process_file(file_path, self.engine_eboa, Query(), "2018-01-01T00:00:00")
+
+        os.environ["S1BOA_DHUS_PRODUCTS_WORKERS"] = "2"
+        os.environ["S1BOA_DHUS_PRODUCTS_CHUNK_SIZE"] = "10"
+        try:
+            data_in_chunks = ingestion_dhus_products.process_file(file_path, self.engine_eboa, Query(), "2018-01-01T00:00:00")
+        finally:
+            del os.environ["S1BOA_DHUS_PRODUCTS_WORKERS"]
+            del os.environ["S1BOA_DHUS_PRODUCTS_CHUNK_SIZE"]
+        # end try
+
+        # Same output apart from the time of the notification of the alerts
+        notification_time_pattern = re.compile('"notification_time": "[^"]*"')
+
+        assert notification_time_pattern.sub("", json.dumps(data_in_chunks)) == notification_time_pattern.sub("", json.dumps(data))
@@ -7,7 +7,6 @@ module s1boa
 """
 # Import python utilities
 import os
-import tempfile
 
 # Import xml parser
 from lxml import etree
@@ -15,12 +14,138 @@ from lxml import etree
 # Import ingestion_functions.helpers
 import eboa.ingestion.functions as eboa_ingestion_functions
 import siboa.ingestions.functions as siboa_ingestion_functions
+import s1boa.ingestions.functions as s1boa_ingestion_functions
 
 # Import query
 from eboa.engine.query import Query
 
 version = "1.0"
 
+# Values of the ExtendedData of the placemarks used by the ingestion
+placemark_extended_data = {
+    "DatatakeId": "datatake_id",
+    "Mode": "mode",
+    "Swath": "swath",
+    "Polarisation": "polarisation",
+    "OrbitAbsolute": "orbit"
+}
+
+def _decode_placemark(placemark):
+    """
+    Method to decode a placemark (without namespaces) walking its nodes once
+    :param placemark: Placemark node
+    :type placemark: lxml.etree._Element
+
+    :return: timings, coordinates and values of the ExtendedData of the placemark
+    :rtype: dict
+    """
+    decoded_placemark = {}
+    for child in placemark:
+        if child.tag == "TimeSpan":
+            for time in child:
+                if time.tag == "begin":
+                    decoded_placemark["start"] = time.text
+                elif time.tag == "end":
+                    decoded_placemark["stop"] = time.text
+                # end if
+            # end for
+        elif child.tag == "LinearRing":
+            for coordinates in child:
+                if coordinates.tag == "coordinates":
+                    decoded_placemark["coordinates"] = coordinates.text
+                # end if
+            # end for
+        elif child.tag == "ExtendedData":
+            for data in child:
+                name = data.get("name")
+                if name in placemark_extended_data:
+                    for value in data:
+                        if value.tag == "value":
+                            decoded_placemark[placemark_extended_data[name]] = value.text
+                        # end if
+                    # end for
+                # end if
+            # end for
+        # end if
+    # end for
+
+    return decoded_placemark
+
+def _read_kml_tree(file_path):
+    """
+    Method to read the KML loading the whole XML tree and querying every value of the placemarks
+    :param file_path: path to the KML
+    :type file_path: str
+
+    :return: satellite, name of the document and decoded placemarks
+    :rtype: tuple
+    """
+    parsed_xml = etree.parse(file_path)
+    s1boa_ingestion_functions.remove_namespaces_from_element(parsed_xml.getroot())
+    xpath_xml = etree.XPathEvaluator(parsed_xml)
+
+    satellite = xpath_xml("/kml/Document/Folder/Folder/name")[0].text
+    document_name = xpath_xml("/kml/Document/name")[0].text
+
+    placemarks = []
+    for planned_imaging in xpath_xml("/kml/Document/Folder/Folder/Placemark"):
+        placemarks.append({
+            "start": planned_imaging.xpath("TimeSpan/begin")[0].text,
+            "stop": planned_imaging.xpath("TimeSpan/end")[0].text,
+            "coordinates": planned_imaging.xpath("LinearRing/coordinates")[0].text,
+            "datatake_id": planned_imaging.xpath("ExtendedData/Data[@name = 'DatatakeId']/value")[0].text,
+            "mode": planned_imaging.xpath("ExtendedData/Data[@name = 'Mode']/value")[0].text,
+            "swath": planned_imaging.xpath("ExtendedData/Data[@name = 'Swath']/value")[0].text,
+            "polarisation": planned_imaging.xpath("ExtendedData/Data[@name = 'Polarisation']/value")[0].text,
+            "orbit": planned_imaging.xpath("ExtendedData/Data[@name = 'OrbitAbsolute']/value")[0].text
+        })
+    # end for
+
+    return (satellite, document_name, placemarks)
+
+def _read_kml_streaming(file_path):
+    """
+    Method to read the KML in streaming. Every placemark is decoded and freed
+    once parsed, so the memory used does not depend on the length of the plan
+    :param file_path: path to the KML
+    :type file_path: str
+
+    :return: satellite, name of the document and decoded placemarks
+    :rtype: tuple
+    """
+    satellite = None
+    document_name = None
+    placemarks = []
+
+    for (_, element) in etree.iterparse(file_path, events = ("end",), tag = ("{*}name", "{*}Placemark")):
+        parent = element.getparent()
+        grandparent = parent.getparent()
+        tag = etree.QName(element).localname
+        if tag == "Placemark":
+            if etree.QName(parent).localname == "Folder" and etree.QName(grandparent).localname == "Folder":
+                s1boa_ingestion_functions.remove_namespaces_from_element(element)
+                placemarks.append(_decode_placemark(element))
+            # end if
+
+            # Free the placemark and the already processed nodes
+            element.clear()
+            while element.getprevious() is not None:
+                del parent[0]
+            # end while
+        elif etree.QName(parent).localname == "Document" and document_name == None:
+            document_name = element.text
+        elif etree.QName(parent).localname == "Folder" and grandparent is not None and etree.QName(grandparent).localname == "Folder" and satellite == None:
+            satellite = element.text
+        # end if
+    # end for
+
+    return (satellite, document_name, placemarks)
+
+kml_readers = {
+    "tree": _read_kml_tree,
+    "streaming": _read_kml_streaming
+}
+
 def process_file(file_path, engine, query, reception_time):
     """Function to process the file and insert its relevant information
     into the DDBB of the eboa
@@ -51,22 +176,14 @@ def process_file(file_path, engine, query, reception_time):
 
     eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 10)
     
-    # Remove namespaces
-    new_file = tempfile.NamedTemporaryFile()
-    new_file_path = new_file.name
-    eboa_ingestion_functions.remove_namespaces(file_path, new_file_path)
-
-    eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 20)
-
-    parsed_xml = etree.parse(new_file_path)
-    xpath_xml = etree.XPathEvaluator(parsed_xml)
+    # Read the KML
+    kml_parser = s1boa_ingestion_functions.get_configuration_value("KML_PARSER", "streaming")
+    (satellite, document_name, placemarks) = kml_readers[kml_parser](file_path)
 
     eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 30)
 
     # Obtain metadata of the file
-    file_name = os.path.basename(file_path)    
-    satellite = xpath_xml("/kml/Document/Folder/Folder/name")[0].text
-    period = xpath_xml("/kml/Document/name")[0].text.split("from")[1].replace(" ", "").split("to")
+    period = document_name.split("from")[1].replace(" ", "").split("to")
     validity_start = period[0]
     validity_stop = period[1]
     generation_time = validity_start
@@ -75,8 +192,8 @@ def process_file(file_path, engine, query, reception_time):
 
     # Generate the events containing the planned imaging
     list_of_events = []
-    for planned_imaging in xpath_xml("/kml/Document/Folder/Folder/Placemark"):
-        coordinates = planned_imaging.xpath("LinearRing/coordinates")[0].text
+    for planned_imaging in placemarks:
+        coordinates = planned_imaging["coordinates"]
         list_coordinates = [group[0:len(group)-2] for group in coordinates.split(" ")]
         formatted_coordinates = " ".join(list_coordinates)
 
@@ -86,9 +203,6 @@ def process_file(file_path, engine, query, reception_time):
         # Split geometries crossing the antimeridian
         list_formatted_coordinates_corrected = siboa_ingestion_functions.correct_antimeridian_issue_in_footprint(formatted_coordinates_to_correct)
 
-        # This statement is commented because it is used to calibrate the chops duration of the NPPF
-        # print("{};{};{};{};{}".format(planned_imaging.xpath("ExtendedData/Data[@name = 'DatatakeId']/value")[0].text, planned_imaging.xpath("ExtendedData/Data[@name = 'Mode']/value")[0].text, planned_imaging.xpath("ExtendedData/Data[@name = 'Swath']/value")[0].text, planned_imaging.xpath("ExtendedData/Data[@name = 'ObservationDuration']/value")[0].text, planned_imaging.xpath("TimeSpan/begin")[0].text))
-        
         # Generate event
         values = [
                 {"name": "satellite",
@@ -96,19 +210,19 @@ def process_file(file_path, engine, query, reception_time):
                  "value": satellite},
                 {"name": "datatake_id",
                  "type": "text",
-                 "value": planned_imaging.xpath("ExtendedData/Data[@name = 'DatatakeId']/value")[0].text},
+                 "value": planned_imaging["datatake_id"]},
                 {"name": "mode",
                  "type": "text",
-                 "value": planned_imaging.xpath("ExtendedData/Data[@name = 'Mode']/value")[0].text},
+                 "value": planned_imaging["mode"]},
                 {"name": "swath",
                  "type": "text",
-                 "value": planned_imaging.xpath("ExtendedData/Data[@name = 'Swath']/value")[0].text},
+                 "value": planned_imaging["swath"]},
                 {"name": "polarisation",
                  "type": "text",
-                 "value": planned_imaging.xpath("ExtendedData/Data[@name = 'Polarisation']/value")[0].text},
+                 "value": planned_imaging["polarisation"]},
                 {"name": "orbit",
                  "type": "double",
-                 "value": planned_imaging.xpath("ExtendedData/Data[@name = 'OrbitAbsolute']/value")[0].text}
+                 "value": planned_imaging["orbit"]}
         ]
         event = {
             "gauge": {
@@ -116,8 +230,8 @@ def process_file(file_path, engine, query, reception_time):
                 "name": "PLANNED_IMAGING_KML",
                 "system": satellite
             },
-            "start": planned_imaging.xpath("TimeSpan/begin")[0].text,
-            "stop": planned_imaging.xpath("TimeSpan/end")[0].text,
+            "start": planned_imaging["start"],
+            "stop": planned_imaging["stop"],
             "values": values
         }
         iterator = 0
@@ -153,7 +267,5 @@ def process_file(file_path, engine, query, reception_time):
     eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 100)
 
     query.close_session()
-
-    new_file.close()
     
     return data
@@ -0,0 +1,58 @@
+"""
+Benchmark of the readers of the KML files of Sentinel-1
+
+The KML files used by the tests are read with every reader, each one in
+its own process to measure its duration, its throughput in placemarks
+per second and its peak resident memory.
+
+Usage: python3 benchmark_kml_parser.py [-r 5]
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1boa
+"""
+# Import python utilities
+import os
+import argparse
+import glob
+import time
+import resource
+import multiprocessing
+
+# Import KML ingestion
+from s1boa.ingestions.ingestion_kml import ingestion_kml
+
+kml_file_paths = sorted(glob.glob(os.path.dirname(os.path.abspath(__file__)) + "/inputs/*.kml"))
+
+def run_reader(kml_parser, file_path, repetitions, results):
+    """
+    Method to execute a reader and return its best duration and peak resident memory
+    """
+    durations = []
+    for i in range(repetitions):
+        start = time.perf_counter()
+        (_, _, placemarks) = ingestion_kml.kml_readers[kml_parser](file_path)
+        durations.append(time.perf_counter() - start)
+    # end for
+    results.put((min(durations), len(placemarks), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+def main():
+    args_parser = argparse.ArgumentParser(description="Benchmark of the readers of the KML files")
+    args_parser.add_argument("-r", "--repetitions", type=int, default=5,
+                             help="Number of readings per file and reader (the best one is reported)")
+    args = args_parser.parse_args()
+
+    print("{:>60} {:>10} {:>12} {:>12} {:>14}".format("KML", "reader", "time (s)", "Placemarks/s", "peak RSS (MB)"))
+    for file_path in kml_file_paths:
+        for kml_parser in ingestion_kml.kml_readers:
+            results = multiprocessing.Queue()
+            process = multiprocessing.Process(target = run_reader, args = (kml_parser, file_path, args.repetitions, results))
+            process.start()
+            (duration, number_of_placemarks, peak_rss) = results.get()
+            process.join()
+            print("{:>60} {:>10} {:>12.3f} {:>12.0f} {:>14.1f}".format(os.path.basename(file_path), kml_parser, duration, number_of_placemarks / duration, peak_rss))
+        # end for
+    # end for
+
+if __name__ == "__main__":
+    main()
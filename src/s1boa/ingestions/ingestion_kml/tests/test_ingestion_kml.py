@@ -18,6 +18,7 @@ from eboa.engine.query import Query
 
 # Import ingestion
 import eboa.ingestion.eboa_ingestion as ingestion
+from s1boa.ingestions.ingestion_kml import ingestion_kml
 
 class TestKml(unittest.TestCase):
     def setUp(self):
@@ -101,3 +102,15 @@ class TestKml(unittest.TestCase):
                 "value": "POLYGON ((180 79.03911960988972, 161.24506 70.43071, 150.24231 71.40302, 161.28791 81.7145, 180 80.08467215204669, 180 79.03911960988972))"
             }
         ]
+
+    def test_read_kml_streaming(self):
+        filename = "Sentinel-1A_MP_20210312T160000_20210401T180000.kml"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        (satellite, document_name, placemarks) = ingestion_kml._read_kml_streaming(file_path)
+
+        assert satellite == "S1A"
+        assert document_name == "Planned from 2021-03-12T16:00:00 to 2021-04-01T18:00:00"
+
+        # The streaming reader decodes the same placemarks as the reader of the whole tree
+        assert (satellite, document_name, placemarks) == ingestion_kml._read_kml_tree(file_path)
@@ -8,6 +8,7 @@ module s1boa
 # Import python utilities
 import os
 import argparse
+import bisect
 from dateutil import parser
 import datetime
 import json
@@ -29,6 +30,13 @@ from eboa.logging import Log
 # Import query
 from eboa.engine.query import Query
 
+# Import entities of the datamodel
+from eboa.datamodel.events import Event, EventText
+from eboa.datamodel.gauges import Gauge
+
+# Import SQLalchemy entities
+from sqlalchemy import and_
+
 logging_module = Log(name = __name__)
 logger = logging_module.logger
 
@@ -122,14 +130,166 @@ playback_means_by_stop={
     "MPOCPRDY": "OCP"
 }
 
+# Requests of the imaging operations (calibrations are skipped for the moment)
+imaging_requests = ["MPSARDT2", "MPPASTH1", "MPPASTHD"]
+
+class ImagingOperation():
+    """
+    Information of an imaging operation (EVRQ) needed to generate its events
+    """
+    __slots__ = ("request", "request_id", "operation_start", "ecc", "warmup", "polarisation_code", "datatake_id_code",
+                 "number_of_chops", "start_orbit", "start_angle", "h_packet_store_id", "v_packet_store_id")
+
+    def __init__(self):
+        for field in self.__slots__:
+            setattr(self, field, None)
+        # end for
+
+# Fields of the imaging operation indexed by the name of the RQ parameter
+imaging_operation_parameters = {
+    "ECCPRNR": "ecc",
+    "WARM_UP": "warmup",
+    "POLAR": "polarisation_code",
+    "DT_ID": "datatake_id_code",
+    "N_PG_REP": "number_of_chops",
+    "ORB_NUM": "start_orbit",
+    "ORB_ANGL": "start_angle",
+    "PS_ID_H": "h_packet_store_id",
+    "PS_ID_V": "v_packet_store_id"
+}
+
+xpath_request = etree.XPath("string(RQ/RQ_Name)")
+xpath_request_id = etree.XPath("string(RQ/List_of_RQ_Attributes/RQ_Attribute[RQ_Attribute_Name = 'RQ_ID']/RQ_Attribute_Value)")
+xpath_operation_start = etree.XPath("string(EVRQ_Header/EVRQ_Time)")
+xpath_execution_time = etree.XPath("string(RQ/RQ_Execution_Time)")
+xpath_list_of_parameters = etree.XPath("RQ/List_of_RQ_Parameters")
+
+def _decode_imaging_operation(imaging_operation):
+    """
+    Method to decode the information of an imaging operation needed to generate its events.
+    The list of parameters is walked only once
+    :param imaging_operation: EVRQ of the imaging operation
+    :type imaging_operation: lxml.etree._Element
+
+    :return: information of the imaging operation
+    :rtype: ImagingOperation
+    """
+    decoded_imaging_operation = ImagingOperation()
+    decoded_imaging_operation.request = xpath_request(imaging_operation)
+    decoded_imaging_operation.request_id = xpath_request_id(imaging_operation)
+    decoded_imaging_operation.operation_start = xpath_operation_start(imaging_operation).split("=")[1]
+
+    for list_of_parameters in xpath_list_of_parameters(imaging_operation):
+        for parameter in list_of_parameters:
+            parameter_name = None
+            parameter_value = None
+            for item in parameter:
+                if item.tag == "RQ_Parameter_Name":
+                    parameter_name = item.text
+                elif item.tag == "RQ_Parameter_Value":
+                    parameter_value = item.text
+                # end if
+            # end for
+            field = imaging_operation_parameters.get(parameter_name)
+            if field != None:
+                setattr(decoded_imaging_operation, field, parameter_value)
+            # end if
+        # end for
+    # end for
+
+    # Packet store ids (enabled by ENA_PS_V and ENA_PS_H -
+    # supposed to be always activated, otherwise values will be
+    # empty and not inserted in the event)
+    if decoded_imaging_operation.h_packet_store_id != None:
+        decoded_imaging_operation.h_packet_store_id = int(decoded_imaging_operation.h_packet_store_id)
+    # end if
+    if decoded_imaging_operation.v_packet_store_id != None:
+        decoded_imaging_operation.v_packet_store_id = int(decoded_imaging_operation.v_packet_store_id)
+    # end if
+
+    return decoded_imaging_operation
+
+def _read_nppf_tree(file_path):
+    """
+    Method to read the NPPF loading the whole XML tree
+    :param file_path: path to the NPPF or file object with its content
+    :type file_path: str or file
+
+    :return: header values, execution times of the deletion queue requests (MGDHQDEL) and decoded imaging operations
+    :rtype: tuple
+    """
+    parsed_xml = etree.parse(file_path)
+    s1boa_ingestion_functions.remove_namespaces_from_element(parsed_xml.getroot())
+    xpath_xml = etree.XPathEvaluator(parsed_xml)
+
+    header = {
+        "reported_generation_time": xpath_xml("/Earth_Explorer_File/Earth_Explorer_Header/Fixed_Header/Source/Creation_Date")[0].text.split("=")[1],
+        "reported_validity_start": xpath_xml("/Earth_Explorer_File/Earth_Explorer_Header/Fixed_Header/Validity_Period/Validity_Start")[0].text.split("=")[1],
+        "validity_stop": xpath_xml("/Earth_Explorer_File/Earth_Explorer_Header/Fixed_Header/Validity_Period/Validity_Stop")[0].text.split("=")[1]
+    }
+    deletion_queue_execution_times = [xpath_execution_time(deletion_request).split("=")[1] for deletion_request in xpath_xml("/Earth_Explorer_File/Data_Block/List_of_EVRQs/EVRQ[RQ/RQ_Name='MGDHQDEL']")]
+    imaging_operations = [_decode_imaging_operation(imaging_operation) for imaging_operation in xpath_xml("/Earth_Explorer_File/Data_Block/List_of_EVRQs/EVRQ[RQ/RQ_Name='MPSARDT2' or RQ/RQ_Name='MPPASTH1' or RQ/RQ_Name='MPPASTHD']")]
+
+    return (header, deletion_queue_execution_times, imaging_operations)
+
+def _read_nppf_streaming(file):
+    """
+    Method to read the NPPF in streaming. Every EVRQ is decoded and freed once
+    parsed, so the memory used does not depend on the length of the plan
+    :param file: path to the NPPF or file object with its content
+    :type file: str or file
+
+    :return: header values, execution times of the deletion queue requests (MGDHQDEL) and decoded imaging operations
+    :rtype: tuple
+    """
+    header = {}
+    deletion_queue_execution_times = []
+    imaging_operations = []
+
+    header_items = {"Creation_Date": "reported_generation_time",
+                    "Validity_Start": "reported_validity_start",
+                    "Validity_Stop": "validity_stop"}
+
+    # The tags are matched in any namespace (NPPF in TGZ format) and the namespaces of the EVRQs are removed on the fly
+    for (_, element) in etree.iterparse(file, events = ("end",), tag = ("{*}Creation_Date", "{*}Validity_Start", "{*}Validity_Stop", "{*}EVRQ")):
+        parent = element.getparent()
+        tag = etree.QName(element).localname
+        if tag == "EVRQ":
+            if etree.QName(parent).localname == "List_of_EVRQs":
+                s1boa_ingestion_functions.remove_namespaces_from_element(element)
+                request = xpath_request(element)
+                if request in imaging_requests:
+                    imaging_operations.append(_decode_imaging_operation(element))
+                elif request == "MGDHQDEL":
+                    deletion_queue_execution_times.append(xpath_execution_time(element).split("=")[1])
+                # end if
+            # end if
+
+            # Free the EVRQ and the already processed ones
+            element.clear()
+            while element.getprevious() is not None:
+                del parent[0]
+            # end while
+        elif parent.getparent() is not None and etree.QName(parent.getparent()).localname == "Fixed_Header" and etree.QName(parent).localname in ("Source", "Validity_Period"):
+            header[header_items[tag]] = element.text.split("=")[1]
+        # end if
+    # end for
+
+    return (header, deletion_queue_execution_times, imaging_operations)
+
+nppf_readers = {
+    "tree": _read_nppf_tree,
+    "streaming": _read_nppf_streaming
+}
+
 @debug
-def _generate_imaging_events(xpath_xml, source, events_per_imaging_mode, completeness_events_per_imaging_mode):
+def _generate_imaging_events(imaging_operations, source, events_per_imaging_mode, completeness_events_per_imaging_mode):
     """
     Method to generate the events for the imaging operations
-    :param xpath_xml: source of information that was xpath evaluated
-    :type xpath_xml: XPathEvaluator
+    :param imaging_operations: decoded imaging operations
+    :type imaging_operations: list of ImagingOperation
     :param source: information of the source
-    :type xpath_xml: dict
+    :type source: dict
     :param events_per_imaging_mode: dict to store the events per imaging mode
     :type events_per_imaging_mode: dict
     :param completeness_events_per_imaging_mode: dict to store the completeness events per imaging mode
@@ -138,55 +298,51 @@ def _generate_imaging_events(xpath_xml, source, events_per_imaging_mode, complet
 
     satellite = source["name"][0:3]
 
-    # Imaging operations (calibrations are skipped for the moment)
-    imaging_operations = xpath_xml("/Earth_Explorer_File/Data_Block/List_of_EVRQs/EVRQ[RQ/RQ_Name='MPSARRFB' or RQ/RQ_Name='MPSARRFC' or RQ/RQ_Name='MPSARDT2' or RQ/RQ_Name='MPPASTH1' or RQ/RQ_Name='MPPASTHD']")
-    imaging_operations = xpath_xml("/Earth_Explorer_File/Data_Block/List_of_EVRQs/EVRQ[RQ/RQ_Name='MPSARDT2' or RQ/RQ_Name='MPPASTH1' or RQ/RQ_Name='MPPASTHD']")
-
     for imaging_operation in imaging_operations:
 
         ########
         # Obtain metadata
         ########
         # Request
-        imaging_request = imaging_operation.xpath("RQ/RQ_Name")[0].text
+        imaging_request = imaging_operation.request
         imaging_request_operation = imaging_request_operations[imaging_request]
 
         # Request id
-        request_id = imaging_operation.xpath("RQ/List_of_RQ_Attributes/RQ_Attribute[RQ_Attribute_Name = 'RQ_ID']/RQ_Attribute_Value")[0].text
+        request_id = imaging_operation.request_id
 
         # Imaging mode
-        ecc = imaging_operation.xpath("RQ/List_of_RQ_Parameters/RQ_Parameter[RQ_Parameter_Name = 'ECCPRNR']/RQ_Parameter_Value")[0].text
+        ecc = imaging_operation.ecc
         imaging_mode = imaging_modes[ecc]
 
         # Warm up
-        warmup = imaging_operation.xpath("RQ/List_of_RQ_Parameters/RQ_Parameter[RQ_Parameter_Name = 'WARM_UP']/RQ_Parameter_Value")[0].text
+        warmup = imaging_operation.warmup
 
         # Polarisation
-        polarisation_code = imaging_operation.xpath("RQ/List_of_RQ_Parameters/RQ_Parameter[RQ_Parameter_Name = 'POLAR']/RQ_Parameter_Value")[0].text
+        polarisation_code = imaging_operation.polarisation_code
         polarisation = polarisations[polarisation_code]
 
         # ORB_SWTH, BAQXXX, SDI time (WI_TO_FL, IN_TO_FL, I_TO_VAL, W_TO_VAL) metadata not yet understood if needed
         
         # Datatake ID
-        datatake_id_code = imaging_operation.xpath("RQ/List_of_RQ_Parameters/RQ_Parameter[RQ_Parameter_Name = 'DT_ID']/RQ_Parameter_Value")[0].text
+        datatake_id_code = imaging_operation.datatake_id_code
         # The datatake id is corresponding to the 23 most significant bits. As the value has 32, to obtain the datatake id the 9 least significant bits are discarded
         datatake_id = hex(int((int(datatake_id_code,16) >> 9).to_bytes(4,'big').hex(), 16)).replace("0x", "").upper()
 
         # Number of chops
-        number_of_chops = imaging_operation.xpath("RQ/List_of_RQ_Parameters/RQ_Parameter[RQ_Parameter_Name = 'N_PG_REP']/RQ_Parameter_Value")[0].text
+        number_of_chops = imaging_operation.number_of_chops
         
         ########
         # Obtain timings, orbit and angle
         ########
         # Imaging start information
-        operation_start = imaging_operation.xpath("EVRQ_Header/EVRQ_Time")[0].text.split("=")[1]
+        operation_start = imaging_operation.operation_start
         imaging_start_datetime = parser.parse(operation_start) + datetime.timedelta(seconds=imaging_mode["preamble"])
         if warmup == "1":
             imaging_start_datetime = imaging_start_datetime + datetime.timedelta(seconds=imaging_mode["warmup"])
         # end if
         imaging_start = imaging_start_datetime.isoformat()
-        imaging_start_orbit = imaging_operation.xpath("RQ/List_of_RQ_Parameters/RQ_Parameter[RQ_Parameter_Name = 'ORB_NUM']/RQ_Parameter_Value")[0].text
-        imaging_start_angle = imaging_operation.xpath("RQ/List_of_RQ_Parameters/RQ_Parameter[RQ_Parameter_Name = 'ORB_ANGL']/RQ_Parameter_Value")[0].text
+        imaging_start_orbit = imaging_operation.start_orbit
+        imaging_start_angle = imaging_operation.start_angle
 
         # Duration (if N_PG_REP = 0 -> observation will be 1 chop)
         duration = (float(number_of_chops) + 1) * imaging_mode["chop_duration"]
@@ -262,21 +418,19 @@ def _generate_imaging_events(xpath_xml, source, events_per_imaging_mode, complet
         # supposed to be always activated, otherwise values will be
         # empty and not inserted in the event)
         if imaging_request == "MPSARDT2":
-            h_packet_store_id_node = imaging_operation.xpath("RQ/List_of_RQ_Parameters/RQ_Parameter[RQ_Parameter_Name = 'PS_ID_H']/RQ_Parameter_Value")
-            if len(h_packet_store_id_node) > 0:
-                h_packet_store_id = h_packet_store_id_node[0].text
+            h_packet_store_id = imaging_operation.h_packet_store_id
+            if h_packet_store_id != None:
                 imaging_event_values.append({
                     "name": "h_packet_store_id",
                     "type": "double",
-                    "value": int(h_packet_store_id)})
+                    "value": h_packet_store_id})
             # end if
-            v_packet_store_id_node = imaging_operation.xpath("RQ/List_of_RQ_Parameters/RQ_Parameter[RQ_Parameter_Name = 'PS_ID_V']/RQ_Parameter_Value")
-            if len(v_packet_store_id_node) > 0:
-                v_packet_store_id = v_packet_store_id_node[0].text
+            v_packet_store_id = imaging_operation.v_packet_store_id
+            if v_packet_store_id != None:
                 imaging_event_values.append({
                     "name": "v_packet_store_id",
                     "type": "double",
-                    "value": int(v_packet_store_id)})
+                    "value": v_packet_store_id})
             # end if
         # end if
 
@@ -439,12 +593,238 @@ def _generate_imaging_events(xpath_xml, source, events_per_imaging_mode, complet
 
     return
 
+def _get_delta_start(query, satellite, validity_start, validity_stop, events_per_imaging_mode):
+    """
+    Method to obtain the date from which the imaging events differ from the ones
+    ingested from the previous NPPFs. The imaging events are compared by their
+    fingerprint (timings and text values: request id, datatake id, imaging mode...)
+    in order of start. The date is moved backwards if any of the previous events
+    crosses it, so that the events before the date are kept untouched.
+    The comparison stops at the first difference, so the events after it are
+    ingested again even if they did not change
+    :param query: Query instance
+    :type query: Query
+    :param satellite: satellite of the NPPF
+    :type satellite: str
+    :param validity_start: validity start of the NPPF
+    :type validity_start: str
+    :param validity_stop: validity stop of the NPPF
+    :type validity_stop: str
+    :param events_per_imaging_mode: imaging events generated from the NPPF
+    :type events_per_imaging_mode: dict
+
+    :return: date in ISO 8601 from which the events have to be ingested
+    :rtype: str
+    """
+    # Obtain the timings and the text values of the previous events in one query
+    planned_imaging_texts = query.session.query(Event.event_uuid, Event.start, Event.stop, EventText.name, EventText.value) \
+                                         .join(Gauge, Event.gauge_uuid == Gauge.gauge_uuid) \
+                                         .outerjoin(EventText, EventText.event_uuid == Event.event_uuid) \
+                                         .filter(Gauge.name == "PLANNED_IMAGING",
+                                                 Gauge.system == satellite,
+                                                 Event.start < validity_stop,
+                                                 Event.stop > validity_start).all()
+
+    previous_texts = {}
+    for (event_uuid, start, stop, name, value) in planned_imaging_texts:
+        if not event_uuid in previous_texts:
+            previous_texts[event_uuid] = (start, stop, [])
+        # end if
+        if name != None:
+            previous_texts[event_uuid][2].append((name, value))
+        # end if
+    # end for
+
+    previous_fingerprints = sorted([(start, stop, tuple(sorted(texts))) for (start, stop, texts) in previous_texts.values()])
+
+    fingerprints = sorted([(parser.parse(event["start"]), parser.parse(event["stop"]), tuple(sorted([(value["name"], value["value"]) for value in event["values"] if value["type"] == "text"])))
+                           for imaging_mode in events_per_imaging_mode for event in events_per_imaging_mode[imaging_mode]])
+
+    # Obtain the unchanged events
+    number_of_unchanged_events = 0
+    while number_of_unchanged_events < min(len(previous_fingerprints), len(fingerprints)) and previous_fingerprints[number_of_unchanged_events] == fingerprints[number_of_unchanged_events]:
+        number_of_unchanged_events += 1
+    # end while
+
+    if number_of_unchanged_events == len(previous_fingerprints) and number_of_unchanged_events == len(fingerprints):
+        return validity_stop
+    # end if
+
+    delta_start = min([fingerprints_of_plan[number_of_unchanged_events][0] for fingerprints_of_plan in (previous_fingerprints, fingerprints) if number_of_unchanged_events < len(fingerprints_of_plan)])
+
+    # The unchanged events cannot cross the delta start
+    while number_of_unchanged_events > 0 and max([fingerprint[1] for fingerprint in fingerprints[:number_of_unchanged_events]]) > delta_start:
+        number_of_unchanged_events -= 1
+        delta_start = fingerprints[number_of_unchanged_events][0]
+    # end while
+
+    if delta_start <= parser.parse(validity_start):
+        return validity_start
+    # end if
+
+    return delta_start.isoformat()
+
+def _merge_segments(segments):
+    """
+    Method to merge the overlapping segments
+    :param segments: segments as (start, stop)
+    :type segments: list of tuple
+
+    :return: sorted and disjoint segments covering the same periods
+    :rtype: list of list
+    """
+    merged_segments = []
+    for (start, stop) in sorted(segments):
+        if len(merged_segments) > 0 and start <= merged_segments[-1][1]:
+            merged_segments[-1][1] = max(merged_segments[-1][1], stop)
+        else:
+            merged_segments.append([start, stop])
+        # end if
+    # end for
+
+    return merged_segments
+
+def _resolve_completeness_intersections(query, satellite, completeness_events, footprint_requests = None, orbpre_manager = None, footprint_samples = None):
+    """
+    Method to resolve in memory the intersections of the completeness events
+    with the completeness events of the DHUS products (higher priority)
+    already ingested. The completeness events are cut by the DHUS segments
+    with a sweep over the sorted segments and the residual MISSING segments
+    are inserted with SIMPLE_UPDATE. The footprints of the residual segments
+    are obtained for their windows (as the engine does when it cuts an event).
+    The completeness events intersecting completeness events of previous plans,
+    or other completeness events of the same plan, keep
+    INSERT_and_ERASE_INTERSECTED_EVENTS_with_PRIORITY as the engine has to
+    erase the events with lower priority
+    :param query: Query instance
+    :type query: Query
+    :param satellite: satellite of the NPPF
+    :type satellite: str
+    :param completeness_events: completeness events generated from the NPPF (with their footprints)
+    :type completeness_events: list of dict
+    :param footprint_requests: footprints already obtained during the ingestion
+    :type footprint_requests: dict
+    :param orbpre_manager: manager of the ORBPRE files of the ingestion
+    :type orbpre_manager: OrbpreManager
+    :param footprint_samples: samples of the footprints of the imaging events, from which the footprints of the residual segments are clipped
+    :type footprint_samples: dict
+
+    :return: completeness events to insert
+    :rtype: list of dict
+    """
+    if len(completeness_events) == 0:
+        return completeness_events
+    # end if
+
+    timings = [(parser.parse(event["start"]), parser.parse(event["stop"])) for event in completeness_events]
+    gauge_names = sorted(set([event["gauge"]["name"] for event in completeness_events]))
+
+    # Only the timings, the gauge and the status are obtained (one joined query without loading the events and their values)
+    existing_completeness_events = query.session.query(Event.start, Event.stop, Gauge.name, EventText.value) \
+                                                .join(Gauge, Event.gauge_uuid == Gauge.gauge_uuid) \
+                                                .outerjoin(EventText, and_(EventText.event_uuid == Event.event_uuid, EventText.name == "status")) \
+                                                .filter(Gauge.name.in_(gauge_names),
+                                                        Gauge.system == satellite,
+                                                        Event.start < max([stop for (_, stop) in timings]),
+                                                        Event.stop > min([start for (start, _) in timings])).all()
+
+    # The DHUS completeness events (status different from MISSING) have higher priority
+    segments_with_higher_priority = {gauge_name: [] for gauge_name in gauge_names}
+    segments_with_lower_priority = {gauge_name: [] for gauge_name in gauge_names}
+    for (event_start, event_stop, gauge_name, status) in existing_completeness_events:
+        if status == "MISSING":
+            segments_with_lower_priority[gauge_name].append((event_start, event_stop))
+        else:
+            segments_with_higher_priority[gauge_name].append((event_start, event_stop))
+        # end if
+    # end for
+
+    # The completeness events of the plan intersecting each other are resolved by the engine
+    events_intersecting_events_of_the_plan = set()
+    for gauge_name in gauge_names:
+        indexes = sorted([i for i in range(len(completeness_events)) if completeness_events[i]["gauge"]["name"] == gauge_name], key = lambda i: timings[i])
+        for (previous_index, index) in zip(indexes, indexes[1:]):
+            if timings[index][0] < timings[previous_index][1]:
+                events_intersecting_events_of_the_plan.update([previous_index, index])
+            # end if
+        # end for
+    # end for
+
+    merged_segments_with_higher_priority = {gauge_name: _merge_segments(segments_with_higher_priority[gauge_name]) for gauge_name in gauge_names}
+    merged_segments_with_lower_priority = {gauge_name: _merge_segments(segments_with_lower_priority[gauge_name]) for gauge_name in gauge_names}
+    stops_with_higher_priority = {gauge_name: [stop for (_, stop) in merged_segments_with_higher_priority[gauge_name]] for gauge_name in gauge_names}
+    stops_with_lower_priority = {gauge_name: [stop for (_, stop) in merged_segments_with_lower_priority[gauge_name]] for gauge_name in gauge_names}
+
+    resolved_completeness_events = []
+    # Residual segments shorter than their events and their positions in the resolved events, indexed by imaging mode
+    residual_events_per_imaging_mode = {}
+    positions_of_residual_events_per_imaging_mode = {}
+    for (i, event) in enumerate(completeness_events):
+        gauge_name = event["gauge"]["name"]
+        (start, stop) = timings[i]
+
+        # Check intersection with the completeness events of previous plans
+        index = bisect.bisect_right(stops_with_lower_priority[gauge_name], start)
+        if i in events_intersecting_events_of_the_plan or (index < len(merged_segments_with_lower_priority[gauge_name]) and merged_segments_with_lower_priority[gauge_name][index][0] < stop):
+            resolved_completeness_events.append(event)
+            continue
+        # end if
+
+        # Remove the periods covered by the DHUS completeness events
+        residual_segments = []
+        current_start = start
+        index = bisect.bisect_right(stops_with_higher_priority[gauge_name], start)
+        while index < len(merged_segments_with_higher_priority[gauge_name]) and merged_segments_with_higher_priority[gauge_name][index][0] < stop:
+            (segment_start, segment_stop) = merged_segments_with_higher_priority[gauge_name][index]
+            if segment_start > current_start:
+                residual_segments.append((current_start, segment_start))
+            # end if
+            current_start = max(current_start, segment_stop)
+            index += 1
+        # end while
+        if current_start < stop:
+            residual_segments.append((current_start, stop))
+        # end if
+
+        for (residual_start, residual_stop) in residual_segments:
+            residual_event = dict(event)
+            residual_event["gauge"] = dict(event["gauge"], insertion_type = "SIMPLE_UPDATE")
+            if residual_start != start:
+                residual_event["start"] = residual_start.isoformat()
+            # end if
+            if residual_stop != stop:
+                residual_event["stop"] = residual_stop.isoformat()
+            # end if
+            # The footprints of the whole event do not correspond to the residual segment
+            if residual_start != start or residual_stop != stop:
+                residual_event["values"] = [value for value in event["values"] if not value["name"].startswith("footprint_details")]
+                imaging_mode = [value["value"] for value in event["values"] if value["name"] == "imaging_mode"][0]
+                if not imaging_mode in residual_events_per_imaging_mode:
+                    residual_events_per_imaging_mode[imaging_mode] = []
+                    positions_of_residual_events_per_imaging_mode[imaging_mode] = []
+                # end if
+                residual_events_per_imaging_mode[imaging_mode].append(residual_event)
+                positions_of_residual_events_per_imaging_mode[imaging_mode].append(len(resolved_completeness_events))
+            # end if
+            resolved_completeness_events.append(residual_event)
+        # end for
+    # end for
+
+    # Obtain the footprints of the residual segments (the events are returned in order of imaging mode)
+    residual_events_with_footprints = s1boa_ingestion_functions.associate_footprints(residual_events_per_imaging_mode, satellite, footprint_requests = footprint_requests, orbpre_manager = orbpre_manager, footprint_samples = footprint_samples)
+    positions = [position for imaging_mode in residual_events_per_imaging_mode for position in positions_of_residual_events_per_imaging_mode[imaging_mode]]
+    for (position, residual_event_with_footprints) in zip(positions, residual_events_with_footprints):
+        resolved_completeness_events[position] = residual_event_with_footprints
+    # end for
+
+    return resolved_completeness_events
+
 def process_file(file_path, engine, query, reception_time, tgz_filename = None):
     """Function to process the file and insert its relevant information
     into the DDBB of the eboa
     
-    :param file_path: path to the file to be processed
-    :type file_path: str
+    :param file_path: path to the file to be processed or file object with its content (for NPPF files in TGZ format)
+    :type file_path: str or file
     :param engine: Engine instance
     :type engine: Engine
     :param query: Query instance
@@ -461,14 +841,15 @@ def process_file(file_path, engine, query, reception_time, tgz_filename = None):
     else:
         file_name = os.path.basename(file_path)
     # end if
-    parsed_xml = etree.parse(file_path)
-    xpath_xml = etree.XPathEvaluator(parsed_xml)
+
+    # Read the NPPF (by default in streaming)
+    nppf_parser = s1boa_ingestion_functions.get_configuration_value("NPPF_PARSER", "streaming")
+    (header, deletion_queue_execution_times, imaging_operations) = nppf_readers[nppf_parser](file_path)
 
     satellite = file_name[0:3]
-    reported_generation_time = xpath_xml("/Earth_Explorer_File/Earth_Explorer_Header/Fixed_Header/Source/Creation_Date")[0].text.split("=")[1]    
-    reported_validity_start = xpath_xml("/Earth_Explorer_File/Earth_Explorer_Header/Fixed_Header/Validity_Period/Validity_Start")[0].text.split("=")[1]
-    validity_stop = xpath_xml("/Earth_Explorer_File/Earth_Explorer_Header/Fixed_Header/Validity_Period/Validity_Stop")[0].text.split("=")[1]
-    deletion_queue = xpath_xml("/Earth_Explorer_File/Data_Block/List_of_EVRQs/EVRQ[RQ/RQ_Name='MGDHQDEL']")
+    reported_generation_time = header["reported_generation_time"]
+    reported_validity_start = header["reported_validity_start"]
+    validity_stop = header["validity_stop"]
 
     # Generation time is changed to be the validity start in case the generation time is greater than the validity start to avoid problems on completeness analysis
     generation_time = reported_generation_time
@@ -477,8 +858,8 @@ def process_file(file_path, engine, query, reception_time, tgz_filename = None):
     # end if
 
     validity_start = reported_validity_start
-    if len(deletion_queue) == 1:
-        validity_start = deletion_queue[0].xpath("RQ/RQ_Execution_Time")[0].text.split("=")[1]
+    if len(deletion_queue_execution_times) == 1:
+        validity_start = deletion_queue_execution_times[0]
     # end if
 
     source = {
@@ -507,13 +888,53 @@ def process_file(file_path, engine, query, reception_time, tgz_filename = None):
     eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 10)
 
     # Generate imaging events
-    _generate_imaging_events(xpath_xml, source, events_per_imaging_mode, completeness_events_per_imaging_mode)
+    _generate_imaging_events(imaging_operations, source, events_per_imaging_mode, completeness_events_per_imaging_mode)
+
+    # Delta ingestion: only the events from the first change with respect to the previous NPPFs are ingested.
+    # The plans are compared in order of start up to the first difference, so a change at
+    # the beginning of the NPPF makes the whole rest of the plan to be ingested again (as in
+    # the full mode) even if the following datatakes did not change
+    delta_start = validity_start
+    nppf_ingestion_mode = s1boa_ingestion_functions.get_configuration_value("NPPF_INGESTION_MODE", "full")
+    if nppf_ingestion_mode == "delta":
+        delta_start = _get_delta_start(query, satellite, validity_start, validity_stop, events_per_imaging_mode)
+        if delta_start != validity_start:
+            for imaging_mode in events_per_imaging_mode:
+                events_per_imaging_mode[imaging_mode] = [event for event in events_per_imaging_mode[imaging_mode] if event["start"] >= delta_start]
+                # The events before the delta start are kept, so the events of the delta do not erase by the validity of the NPPF
+                for event in events_per_imaging_mode[imaging_mode]:
+                    event["gauge"] = dict(event["gauge"], insertion_type = "SIMPLE_UPDATE")
+                # end for
+            # end for
+            imaging_event_link_refs = set([event["link_ref"] for imaging_mode in events_per_imaging_mode for event in events_per_imaging_mode[imaging_mode]])
+            for imaging_mode in completeness_events_per_imaging_mode:
+                completeness_events_per_imaging_mode[imaging_mode] = [event for event in completeness_events_per_imaging_mode[imaging_mode] if event["links"][0]["link"] in imaging_event_link_refs]
+            # end for
+        # end if
+        logger.info("The events of the NPPF {} are ingested from {} ({} imaging events)".format(file_name, delta_start, len([event for imaging_mode in events_per_imaging_mode for event in events_per_imaging_mode[imaging_mode]])))
+    # end if
 
     eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 40)
 
-    list_of_events_with_footprints = s1boa_ingestion_functions.associate_footprints(events_per_imaging_mode, satellite)
+    # Footprints obtained during the ingestion (shared by the events with the same window)
+    footprint_requests = {}
+
+    # Samples of the footprints of the imaging events. The completeness
+    # windows are inside the imaging windows so their footprints are
+    # clipped from these samples
+    footprint_samples = {}
 
-    list_of_completeness_events_with_footprints = s1boa_ingestion_functions.associate_footprints(completeness_events_per_imaging_mode, satellite)
+    # ORBPRE file shared by the imaging and completeness events
+    with s1boa_ingestion_functions.OrbpreManager() as orbpre_manager:
+        list_of_events_with_footprints = s1boa_ingestion_functions.associate_footprints(events_per_imaging_mode, satellite, footprint_requests = footprint_requests, orbpre_manager = orbpre_manager, footprint_samples = footprint_samples)
+
+        list_of_completeness_events_with_footprints = s1boa_ingestion_functions.associate_footprints(completeness_events_per_imaging_mode, satellite, footprint_requests = footprint_requests, orbpre_manager = orbpre_manager, footprint_samples = footprint_samples)
+
+        # Intersections with the completeness of the DHUS products resolved in memory instead of by the engine (by default)
+        if s1boa_ingestion_functions.get_configuration_value("COMPLETENESS_RESOLUTION", "engine") == "ingestion":
+            list_of_completeness_events_with_footprints = _resolve_completeness_intersections(query, satellite, list_of_completeness_events_with_footprints, footprint_requests = footprint_requests, orbpre_manager = orbpre_manager, footprint_samples = footprint_samples)
+        # end if
+    # end with
     
     # Build the json
     nppf_operation = {
@@ -526,6 +947,25 @@ def process_file(file_path, engine, query, reception_time, tgz_filename = None):
         "source": source,
         "events": list_of_events_with_footprints
     }
+    nppf_operations = [nppf_operation]
+
+    # Delta ingestion: the source keeps the validity of the NPPF and the
+    # events of the previous NPPFs are erased only from the delta start
+    # by a source without events covering the window of the delta
+    if delta_start != validity_start:
+        nppf_operation["mode"] = "insert"
+        if delta_start != validity_stop:
+            nppf_erase_operation = {
+                "mode": "insert_and_erase",
+                "dim_signature": nppf_operation["dim_signature"],
+                "source": dict(source,
+                               name = file_name + "_DELTA",
+                               validity_start = delta_start),
+                "events": []
+            }
+            nppf_operations = [nppf_erase_operation, nppf_operation]
+        # end if
+    # end if
 
     eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 50)
 
@@ -549,7 +989,7 @@ def process_file(file_path, engine, query, reception_time, tgz_filename = None):
         "events": list_of_completeness_events_with_footprints
     }
 
-    data = {"operations": [nppf_operation, nppf_completeness_operation]}
+    data = {"operations": nppf_operations + s1boa_ingestion_functions.split_completeness_operation(nppf_completeness_operation)}
     
     eboa_ingestion_functions.insert_ingestion_progress(session_progress, general_source_progress, 100)
 
@@ -7,21 +7,61 @@ module s1boa
 """
 # Import python utilities
 import tarfile
-import tempfile
+import io
 import os
 
 # Import NPPF ingestion
 from s1boa.ingestions.ingestion_nppf import ingestion_nppf
 
-# Import ingestion_functions.helpers
-import eboa.ingestion.functions as ingestion_functions
-
 # Import logging
 from eboa.logging import Log
 
 logging_module = Log(name = __name__)
 logger = logging_module.logger
 
+class NppfStream():
+    """
+    File object with the content of the NPPF built from the HDR and DBL
+    members of the TGZ, read directly from the archive. The XML declarations
+    of the members are removed and their content is enclosed in the
+    Earth_Explorer_File node. The namespaces are removed by the NPPF reader
+    """
+
+    def __init__(self, tar, member_names):
+        """
+        :param tar: opened TGZ file
+        :type tar: tarfile.TarFile
+        :param member_names: names of the HDR and DBL members
+        :type member_names: list of str
+        """
+        self.tar = tar
+        self.parts = self._get_parts(member_names)
+        self.current_part = next(self.parts)
+
+    def _get_parts(self, member_names):
+        yield io.BytesIO(b'<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n<Earth_Explorer_File>\n')
+        for member_name in member_names:
+            member = self.tar.extractfile(member_name)
+            first_line = member.readline()
+            if first_line.lstrip().startswith(b"<?xml"):
+                first_line = first_line[first_line.index(b"?>") + 2:]
+            # end if
+            yield io.BytesIO(first_line)
+            yield member
+        # end for
+        yield io.BytesIO(b"</Earth_Explorer_File>")
+
+    def read(self, size = -1):
+        while self.current_part is not None:
+            data = self.current_part.read(size)
+            if len(data) > 0:
+                return data
+            # end if
+            self.current_part = next(self.parts, None)
+        # end while
+
+        return b""
+
 def process_file(file_path, engine, query, reception_time):
     """Function to process the file and insert its relevant information
     into the DDBB of the eboa
@@ -37,39 +77,12 @@ def process_file(file_path, engine, query, reception_time):
     """
 
     file_name = os.path.basename(file_path)
-    
-    # Create temporary folder for extracting the files inside the tar into it
-    temporary_folder = tempfile.TemporaryDirectory()
 
-    tar = tarfile.open(file_path)
-    tar.extractall(path=temporary_folder.name)
+    # Stream the HDR and DBL files from the TGZ (without extracting them)
+    with tarfile.open(file_path) as tar:
+        nppf_stream = NppfStream(tar, [file_name.replace("TGZ", "HDR"), file_name.replace("TGZ", "DBL")])
 
-    # Merge HDR and DBL files into a EOF
-    # Remove xml nodes and namespaces
-    # HDR
-    hdr = open(temporary_folder.name + "/FILE.HDR", "w+")
-    ingestion_functions.remove_namespaces(temporary_folder.name + "/" + file_name.replace("TGZ", "HDR"), hdr.name, xml_declaration = False)
-    hdr_content = hdr.read()
-
-    # DBL
-    dbl = open(temporary_folder.name + "/FILE.DBL", "w+")
-    ingestion_functions.remove_namespaces(temporary_folder.name + "/" + file_name.replace("TGZ", "DBL"), dbl.name, xml_declaration = False)
-    dbl_content = dbl.read()
-    
-    # Write EOF
-    eof = open(temporary_folder.name + "/" + file_name.replace("TGZ", "EOF"), "w+")
-    eof.write('<?xml version="1.0" encoding="UTF-8" standalone="no"?>\n')
-    eof.write('<Earth_Explorer_File>\n')
-    eof.write(hdr_content)
-    eof.write(dbl_content)
-    eof.write('</Earth_Explorer_File>')
-
-    eof_path = eof.name
-    eof.close()
-
-    data = ingestion_nppf.process_file(eof_path, engine, query, reception_time, tgz_filename = file_name)
-    
-    # Remove temporary folder
-    temporary_folder.cleanup()
+        data = ingestion_nppf.process_file(nppf_stream, engine, query, reception_time, tgz_filename = file_name)
+    # end with
     
     return data
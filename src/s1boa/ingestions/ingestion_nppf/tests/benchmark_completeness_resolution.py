@@ -0,0 +1,69 @@
+"""
+Benchmark of the insertion of the NPPF files of Sentinel-1 resolving the
+intersections of the completeness events in the engine or in the ingestion
+
+The NPPF used by the tests is ingested with every configuration on a
+cleared database and on a database with the completeness of the DHUS
+products of the OPDHUS used by the tests (so the completeness of the plan
+is cut). The content of the configured database is removed.
+
+Usage: python3 benchmark_completeness_resolution.py [-r 3]
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1boa
+"""
+# Import python utilities
+import os
+import argparse
+import time
+
+# Import engine of the DDBB
+import eboa.engine.engine as eboa_engine
+from eboa.engine.query import Query
+
+# Import ingestion
+import eboa.ingestion.eboa_ingestion as ingestion
+
+nppf_file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+opdhus_file_path = os.path.dirname(os.path.abspath(__file__)) + "/../../ingestion_dhus_products/tests/inputs/DEC_OPER_OPDHUS_S1A_AUIP_20210419T135405_V20210316T000000_20210319T000000_2161_2150_SHORTENED.xml"
+
+def ingest(module, file_path):
+    exit_status = ingestion.command_process_file(module, file_path, "2018-01-01T00:00:00")
+    if len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) > 0:
+        raise Exception("The ingestion of the file {} failed: {}".format(file_path, exit_status))
+    # end if
+
+def main():
+    args_parser = argparse.ArgumentParser(description="Benchmark of the resolution of the completeness of the NPPF files")
+    args_parser.add_argument("-r", "--repetitions", type=int, default=3,
+                             help="Number of ingestions per configuration")
+    args = args_parser.parse_args()
+
+    query = Query()
+
+    print("{:>14} {:>12} {:>12} {:>18}".format("database", "resolution", "time (s)", "completeness events"))
+    for with_dhus_completeness in [False, True]:
+        for completeness_resolution in ["engine", "ingestion"]:
+            os.environ["S1BOA_COMPLETENESS_RESOLUTION"] = completeness_resolution
+            durations = []
+            for i in range(args.repetitions):
+                query.clear_db()
+                if with_dhus_completeness:
+                    ingest("s1boa.ingestions.ingestion_dhus_products.ingestion_dhus_products", opdhus_file_path)
+                # end if
+                start = time.perf_counter()
+                ingest("s1boa.ingestions.ingestion_nppf.ingestion_nppf", nppf_file_path)
+                durations.append(time.perf_counter() - start)
+            # end for
+            number_of_events = len(query.get_events(gauge_names = {"filter": "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_%", "op": "like"}))
+            print("{:>14} {:>12} {:>12.3f} {:>18}".format("DHUS products" if with_dhus_completeness else "empty", completeness_resolution, min(durations), number_of_events))
+        # end for
+    # end for
+
+    del os.environ["S1BOA_COMPLETENESS_RESOLUTION"]
+    query.clear_db()
+    query.close_session()
+
+if __name__ == "__main__":
+    main()
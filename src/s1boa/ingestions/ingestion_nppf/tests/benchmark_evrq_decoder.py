@@ -0,0 +1,72 @@
+"""
+Microbenchmark of the decoding of the imaging EVRQs of the NPPF files of Sentinel-1
+
+The imaging EVRQs of the NPPF used by the tests are decoded repeatedly
+with one XPath query per parameter (previous decoding) and with the
+single-pass decoder of the ingestion.
+
+Usage: python3 benchmark_evrq_decoder.py [-n 100000]
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1boa
+"""
+# Import python utilities
+import os
+import argparse
+import time
+
+# Import xml parser
+from lxml import etree
+
+# Import NPPF ingestion
+from s1boa.ingestions.ingestion_nppf import ingestion_nppf
+
+nppf_file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+
+def decode_imaging_operation_by_parameter(imaging_operation):
+    """
+    Method to decode an imaging EVRQ with one XPath query per parameter
+    """
+    decoded_imaging_operation = {
+        "request": imaging_operation.xpath("RQ/RQ_Name")[0].text,
+        "request_id": imaging_operation.xpath("RQ/List_of_RQ_Attributes/RQ_Attribute[RQ_Attribute_Name = 'RQ_ID']/RQ_Attribute_Value")[0].text,
+        "operation_start": imaging_operation.xpath("EVRQ_Header/EVRQ_Time")[0].text.split("=")[1]
+    }
+    for (parameter, field) in ingestion_nppf.imaging_operation_parameters.items():
+        node = imaging_operation.xpath("RQ/List_of_RQ_Parameters/RQ_Parameter[RQ_Parameter_Name = '{}']/RQ_Parameter_Value".format(parameter))
+        decoded_imaging_operation[field] = None
+        if len(node) > 0:
+            decoded_imaging_operation[field] = node[0].text
+        # end if
+    # end for
+
+    return decoded_imaging_operation
+
+decoders = {
+    "xpath per parameter": decode_imaging_operation_by_parameter,
+    "single pass": ingestion_nppf._decode_imaging_operation
+}
+
+def main():
+    args_parser = argparse.ArgumentParser(description="Microbenchmark of the decoding of the imaging EVRQs")
+    args_parser.add_argument("-n", "--number_of_evrqs", type=int, default=100000,
+                             help="Number of EVRQs to decode")
+    args = args_parser.parse_args()
+
+    parsed_xml = etree.parse(nppf_file_path)
+    imaging_operations = [evrq for evrq in parsed_xml.iterfind("Data_Block/List_of_EVRQs/EVRQ") if ingestion_nppf.xpath_request(evrq) in ingestion_nppf.imaging_requests]
+
+    print("{:>20} {:>12} {:>12}".format("decoder", "time (s)", "EVRQs/s"))
+    for decoder_name in decoders:
+        decoder = decoders[decoder_name]
+        start = time.perf_counter()
+        for i in range(args.number_of_evrqs):
+            decoder(imaging_operations[i % len(imaging_operations)])
+        # end for
+        duration = time.perf_counter() - start
+        print("{:>20} {:>12.3f} {:>12.0f}".format(decoder_name, duration, args.number_of_evrqs / duration))
+    # end for
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of the readers of the NPPF files of Sentinel-1
+
+The EVRQs of the NPPF used by the tests are replicated to build plans of
+increasing length. Every reader is executed in its own process to measure
+its duration and its peak resident memory.
+
+Usage: python3 benchmark_nppf_parser.py [-n 1000 10000 50000]
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1boa
+"""
+# Import python utilities
+import os
+import argparse
+import copy
+import time
+import resource
+import tempfile
+import multiprocessing
+
+# Import xml parser
+from lxml import etree
+
+# Import NPPF ingestion
+from s1boa.ingestions.ingestion_nppf import ingestion_nppf
+
+nppf_file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+
+def build_nppf(number_of_evrqs, file_path):
+    """
+    Method to build an NPPF with the requested number of EVRQs replicating the ones of the NPPF used by the tests
+    :param number_of_evrqs: number of EVRQs of the NPPF
+    :type number_of_evrqs: int
+    :param file_path: path to the NPPF to build
+    :type file_path: str
+    """
+    parsed_xml = etree.parse(nppf_file_path)
+    list_of_evrqs = parsed_xml.find("Data_Block/List_of_EVRQs")
+    evrqs = list(list_of_evrqs)
+    for evrq in evrqs:
+        list_of_evrqs.remove(evrq)
+    # end for
+    for i in range(number_of_evrqs):
+        list_of_evrqs.append(copy.deepcopy(evrqs[i % len(evrqs)]))
+    # end for
+    list_of_evrqs.set("count", str(number_of_evrqs))
+    parsed_xml.write(file_path, xml_declaration = True, encoding = "UTF-8")
+
+def run_reader(nppf_parser, file_path, results):
+    """
+    Method to execute a reader and return its duration and peak resident memory
+    """
+    start = time.perf_counter()
+    (_, _, imaging_operations) = ingestion_nppf.nppf_readers[nppf_parser](file_path)
+    duration = time.perf_counter() - start
+    results.put((duration, len(imaging_operations), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+def main():
+    args_parser = argparse.ArgumentParser(description="Benchmark of the readers of the NPPF files")
+    args_parser.add_argument("-n", "--number_of_evrqs", type=int, nargs="+", default=[1000, 10000, 50000],
+                             help="Number of EVRQs of the NPPFs to read")
+    args = args_parser.parse_args()
+
+    print("{:>10} {:>10} {:>12} {:>12} {:>14}".format("EVRQs", "reader", "time (s)", "EVRQs/s", "peak RSS (MB)"))
+    for number_of_evrqs in args.number_of_evrqs:
+        (_, file_path) = tempfile.mkstemp(suffix = ".EOF")
+        try:
+            # The NPPF is built in its own process to keep the memory of this process low
+            process = multiprocessing.Process(target = build_nppf, args = (number_of_evrqs, file_path))
+            process.start()
+            process.join()
+            for nppf_parser in ingestion_nppf.nppf_readers:
+                results = multiprocessing.Queue()
+                process = multiprocessing.Process(target = run_reader, args = (nppf_parser, file_path, results))
+                process.start()
+                (duration, number_of_imaging_operations, peak_rss) = results.get()
+                process.join()
+                print("{:>10} {:>10} {:>12.3f} {:>12.0f} {:>14.1f}".format(number_of_evrqs, nppf_parser, duration, number_of_evrqs / duration, peak_rss))
+            # end for
+        finally:
+            os.remove(file_path)
+        # end try
+    # end for
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,14 @@ import os
 import sys
 import unittest
 import datetime
+import io
+import tarfile
+import tempfile
+import shutil
+import re
+
+# Import xml parser
+from lxml import etree
 
 # Import engine of the DDBB
 import eboa.engine.engine as eboa_engine
@@ -20,6 +28,22 @@ from eboa.engine.query import Query
 # Import ingestion
 import eboa.ingestion.eboa_ingestion as ingestion
 
+# Import entities of the datamodel
+from eboa.datamodel.events import EventGeometry
+
+# Import GEOalchemy entities
+from geoalchemy2.shape import to_shape
+
+# Import NPPF ingestion
+from s1boa.ingestions.ingestion_nppf import ingestion_nppf
+from s1boa.ingestions.ingestion_nppf import ingestion_nppf_tgz
+
+# Import parallel ingestion
+import s1boa.ingestions.parallel_ingestion as parallel_ingestion
+
+# Import errors
+from s1boa.ingestions.errors import LinkReferenceAmbiguous
+
 class TestEngine(unittest.TestCase):
     def setUp(self):
         # Create the engine to manage the data
@@ -1366,3 +1390,328 @@ class TestEngine(unittest.TestCase):
 
         assert len(events) == 1
         assert len([link for link in events[0].eventLinks if link.event_uuid_link == planned_imaging_event_uuid]) > 0
+
+    def test_delta_start_nppf(self):
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_nppf.ingestion_nppf", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        (_, _, imaging_operations) = ingestion_nppf._read_nppf_streaming(file_path)
+        events_per_imaging_mode = {}
+        ingestion_nppf._generate_imaging_events(imaging_operations, {"name": filename, "validity_start": "2021-03-16T18:07:38.057000", "validity_stop": "2021-04-05T18:00:00"}, events_per_imaging_mode, {})
+
+        # The same plan has no changes
+        delta_start = ingestion_nppf._get_delta_start(self.query_eboa, "S1A", "2021-03-16T18:07:38.057000", "2021-04-05T18:00:00", events_per_imaging_mode)
+
+        assert delta_start == "2021-04-05T18:00:00"
+
+        # Removing the last imaging, the changes start with it
+        last_event = max([event for imaging_mode in events_per_imaging_mode for event in events_per_imaging_mode[imaging_mode]], key = lambda event: event["start"])
+        for imaging_mode in events_per_imaging_mode:
+            events_per_imaging_mode[imaging_mode] = [event for event in events_per_imaging_mode[imaging_mode] if event != last_event]
+        # end for
+
+        delta_start = ingestion_nppf._get_delta_start(self.query_eboa, "S1A", "2021-03-16T18:07:38.057000", "2021-04-05T18:00:00", events_per_imaging_mode)
+
+        assert delta_start == datetime.datetime.fromisoformat(last_event["start"]).isoformat()
+
+    def test_process_nppf_delta(self):
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        os.environ["S1BOA_NPPF_INGESTION_MODE"] = "delta"
+        try:
+            data = ingestion_nppf.process_file(file_path, self.engine_eboa, Query(), "2018-01-01T00:00:00")
+        finally:
+            del os.environ["S1BOA_NPPF_INGESTION_MODE"]
+        # end try
+
+        nppf_operations = [operation for operation in data["operations"] if operation["dim_signature"]["name"] == "NPPF_S1A"]
+
+        assert len(nppf_operations) == 2
+
+        # The erasing is limited to the window of the delta
+        (nppf_erase_operation, nppf_operation) = nppf_operations
+        delta_start = min([event["start"] for event in nppf_operation["events"]])
+
+        assert nppf_erase_operation["mode"] == "insert_and_erase"
+        assert nppf_erase_operation["source"]["name"] == filename + "_DELTA"
+        assert nppf_erase_operation["source"]["validity_start"] == datetime.datetime.fromisoformat(delta_start).isoformat()
+        assert nppf_erase_operation["source"]["validity_stop"] == "2021-04-05T18:00:00"
+        assert len(nppf_erase_operation["events"]) == 0
+
+        # The source of the NPPF keeps the validity of the file
+        assert nppf_operation["mode"] == "insert"
+        assert nppf_operation["source"]["name"] == filename
+        assert nppf_operation["source"]["validity_start"] == "2021-03-16T18:07:38.057"
+        assert nppf_operation["source"]["validity_stop"] == "2021-04-05T18:00:00"
+        assert len(nppf_operation["events"]) > 0
+        assert len([event for event in nppf_operation["events"] if event["gauge"]["insertion_type"] != "SIMPLE_UPDATE"]) == 0
+
+        completeness_operations = [operation for operation in data["operations"] if operation["dim_signature"]["name"].startswith("COMPLETENESS_NPPF_S1A")]
+
+        assert len([operation for operation in completeness_operations if operation["source"]["validity_start"] != "2021-03-16T18:07:38.057"]) == 0
+
+    def test_resolve_completeness_intersections(self):
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        (_, _, imaging_operations) = ingestion_nppf._read_nppf_streaming(file_path)
+        completeness_events_per_imaging_mode = {}
+        ingestion_nppf._generate_imaging_events(imaging_operations, {"name": filename, "validity_start": "2021-03-16T18:07:38.057000", "validity_stop": "2021-04-05T18:00:00"}, {}, completeness_events_per_imaging_mode)
+        completeness_events = [event for imaging_mode in completeness_events_per_imaging_mode for event in completeness_events_per_imaging_mode[imaging_mode]]
+
+        # Without previous completeness, the events are inserted without intersections
+        resolved_completeness_events = ingestion_nppf._resolve_completeness_intersections(self.query_eboa, "S1A", completeness_events)
+
+        assert len(resolved_completeness_events) == len(completeness_events)
+        assert len([event for event in resolved_completeness_events if event["gauge"]["insertion_type"] == "SIMPLE_UPDATE"]) == len(completeness_events)
+
+        exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_nppf.ingestion_nppf", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        # The completeness of the previous plan has to be erased by the engine
+        resolved_completeness_events = ingestion_nppf._resolve_completeness_intersections(self.query_eboa, "S1A", completeness_events)
+
+        assert len(resolved_completeness_events) == len(completeness_events)
+        assert len([event for event in resolved_completeness_events if event["gauge"]["insertion_type"] == "INSERT_and_ERASE_INTERSECTED_EVENTS_with_PRIORITY"]) == len(completeness_events)
+
+    def test_resolve_completeness_intersections_with_dhus_completeness(self):
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        opdhus_filename = "DEC_OPER_OPDHUS_S1A_AUIP_20210419T135405_V20210316T000000_20210319T000000_2161_2150_SHORTENED.xml"
+        opdhus_file_path = os.path.dirname(os.path.abspath(__file__)) + "/../../ingestion_dhus_products/tests/inputs/" + opdhus_filename
+
+        # The completeness of the plan is cut by the completeness of the DHUS products (priority 30) resolving the intersections in the engine and in the ingestion
+        completeness_per_resolution = {}
+        for completeness_resolution in ["engine", "ingestion"]:
+            self.query_eboa.clear_db()
+
+            exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_dhus_products.ingestion_dhus_products", opdhus_file_path, "2018-01-01T00:00:00")
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+            os.environ["S1BOA_COMPLETENESS_RESOLUTION"] = completeness_resolution
+            try:
+                exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_nppf.ingestion_nppf", file_path, "2018-01-01T00:00:00")
+            finally:
+                del os.environ["S1BOA_COMPLETENESS_RESOLUTION"]
+            # end try
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+            completeness = {}
+            for level in ["L0", "L1_SLC", "L1_GRD", "L2_OCN"]:
+                events = self.query_eboa.get_events(gauge_names = {"filter": "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_" + level, "op": "=="})
+                for event in events:
+                    values = self.query_eboa.get_event_values(event_uuids = [str(event.event_uuid)])
+                    status = [value.value for value in values if value.name == "status"][0]
+                    footprints = sorted([[float(coordinate) for coordinate in re.findall("-?[0-9.]+", to_shape(value.value).wkt)] for value in values if type(value) == EventGeometry and value.name == "footprint"])
+                    completeness[(level, event.start, event.stop, status)] = footprints
+                # end for
+            # end for
+            completeness_per_resolution[completeness_resolution] = completeness
+        # end for
+
+        # Some completeness events of the plan have been cut
+        missing_completeness = [key for key in completeness_per_resolution["engine"] if key[3] == "MISSING"]
+        dhus_completeness_stops = set([(level, stop) for (level, start, stop, status) in completeness_per_resolution["engine"] if status != "MISSING"])
+
+        assert len(missing_completeness) > 0
+        assert len([(level, start) for (level, start, stop, status) in missing_completeness if (level, start) in dhus_completeness_stops]) > 0
+
+        # Both resolutions produce the same completeness
+        assert set(completeness_per_resolution["ingestion"].keys()) == set(completeness_per_resolution["engine"].keys())
+
+        # The footprints of the cut events are obtained for the remaining windows within a tolerance of 0.01 degrees (clipped from the footprints of the imaging events in the ingestion)
+        for key in completeness_per_resolution["engine"]:
+            footprints = completeness_per_resolution["engine"][key]
+            footprints_resolved_in_ingestion = completeness_per_resolution["ingestion"][key]
+
+            assert len(footprints_resolved_in_ingestion) == len(footprints)
+            for (footprint_resolved_in_ingestion, footprint) in zip(footprints_resolved_in_ingestion, footprints):
+                assert len(footprint_resolved_in_ingestion) == len(footprint)
+                assert max([abs(coordinate_resolved_in_ingestion - coordinate) for (coordinate_resolved_in_ingestion, coordinate) in zip(footprint_resolved_in_ingestion, footprint)] + [0]) < 0.01
+            # end for
+        # end for
+
+    def test_insert_nppf_completeness_in_parallel(self):
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        os.environ["S1BOA_COMPLETENESS_OPERATIONS"] = "per_level"
+        try:
+            returned_values = parallel_ingestion.command_process_file_in_parallel("s1boa.ingestions.ingestion_nppf.ingestion_nppf", file_path, "2018-01-01T00:00:00", workers = 2)
+        finally:
+            del os.environ["S1BOA_COMPLETENESS_OPERATIONS"]
+        # end try
+
+        assert len([item for item in returned_values if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        # One source for the plan and one per level of completeness
+        sources = self.query_eboa.get_sources()
+
+        assert len(sources) == 5
+
+        sources = self.query_eboa.get_sources(dim_signatures = {"filter": "COMPLETENESS_NPPF_S1A_%", "op": "like"})
+
+        assert len(sources) == 4
+
+        # Same events as the sequential ingestion, linked to the planned imaging
+        events = self.query_eboa.get_events()
+
+        assert len(events) == 36
+
+        planned_imaging_event_uuids = set([event.event_uuid for event in self.query_eboa.get_events(gauge_names = {"filter": "PLANNED_IMAGING", "op": "=="})])
+        completeness_events = self.query_eboa.get_events(gauge_names = {"filter": "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_%", "op": "like"})
+
+        assert len([event for event in completeness_events if len([link for link in event.eventLinks if link.event_uuid_link in planned_imaging_event_uuids]) == 0]) == 0
+
+    def test_resolve_links_by_ref(self):
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_nppf.ingestion_nppf", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        planned_imaging = self.query_eboa.get_events(gauge_names = {"filter": "PLANNED_IMAGING", "op": "=="})[0]
+        referenced_event = {
+            "link_ref": "PLANNED_IMAGING_" + planned_imaging.start.isoformat(),
+            "gauge": {"name": "PLANNED_IMAGING", "system": "S1A"},
+            "start": planned_imaging.start.isoformat(),
+            "stop": planned_imaging.stop.isoformat()
+        }
+
+        # The events with the same timings inserted by other sources are not linked
+        for (source_name, link_mode, link) in [("S1A_OPER_MPL__NPPF__OTHER.EOF", "by_ref", referenced_event["link_ref"]),
+                                               (filename, "by_uuid", str(planned_imaging.event_uuid))]:
+            inserted_operations = [{"dim_signature": {"name": "NPPF_S1A"}, "source": {"name": source_name}, "events": [referenced_event]}]
+            operations = [{"events": [{"links": [{"link": referenced_event["link_ref"], "link_mode": "by_ref", "name": "DHUS_PRODUCT_COMPLETENESS"}]}]}]
+
+            parallel_ingestion._resolve_links_by_ref(self.query_eboa, inserted_operations, operations)
+
+            assert operations[0]["events"][0]["links"][0]["link_mode"] == link_mode
+            assert operations[0]["events"][0]["links"][0]["link"] == link
+        # end for
+
+    def test_resolve_links_by_ref_ambiguous(self):
+
+        # Two events of the same gauge with the same timings inserted by the same source
+        event = {
+            "gauge": {"name": "PLANNED_IMAGING",
+                      "system": "S1A",
+                      "insertion_type": "SIMPLE_UPDATE"},
+            "start": "2021-03-17T04:10:33.066685",
+            "stop": "2021-03-17T04:17:48.873819"
+        }
+        data = {"operations": [{
+            "mode": "insert",
+            "dim_signature": {"name": "NPPF_S1A",
+                              "exec": "ingestion_nppf.py",
+                              "version": "1.0"},
+            "source": {"name": "S1A_OPER_MPL__NPPF__AMBIGUOUS.EOF",
+                       "reception_time": "2021-03-17T00:00:00",
+                       "generation_time": "2021-03-17T00:00:00",
+                       "validity_start": "2021-03-17T00:00:00",
+                       "validity_stop": "2021-03-18T00:00:00"},
+            "events": [event, event]
+        }]
+        }
+        exit_status = self.engine_eboa.treat_data(data)
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        inserted_operations = [{"dim_signature": {"name": "NPPF_S1A"}, "source": {"name": "S1A_OPER_MPL__NPPF__AMBIGUOUS.EOF"}, "events": [dict(event, link_ref = "PLANNED_IMAGING_" + event["start"])]}]
+        operations = [{"events": [{"links": [{"link": "PLANNED_IMAGING_" + event["start"], "link_mode": "by_ref", "name": "DHUS_PRODUCT_COMPLETENESS"}]}]}]
+
+        test_success = False
+        try:
+            parallel_ingestion._resolve_links_by_ref(self.query_eboa, inserted_operations, operations)
+        except LinkReferenceAmbiguous:
+            test_success = True
+        # end try
+
+        assert test_success
+
+        # The link is not translated
+        assert operations[0]["events"][0]["links"][0]["link_mode"] == "by_ref"
+
+    def test_insert_data_in_parallel_skipped_steps(self):
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+
+        # The exceptions of the processing are raised to the caller and no source is registered
+        test_success = False
+        try:
+            parallel_ingestion.command_process_file_in_parallel("s1boa.ingestions.ingestion_nppf.ingestion_nppf", "/not_a_file/" + filename, "2018-01-01T00:00:00")
+        except Exception:
+            test_success = True
+        # end try
+
+        assert test_success
+
+        sources = self.query_eboa.get_sources()
+
+        assert len(sources) == 0
+
+        # The failed insertions are not retried and their statuses are returned
+        completeness_operation = {
+            "mode": "insert",
+            "dim_signature": {"name": "COMPLETENESS_NPPF_S1A",
+                              "exec": "ingestion_nppf.py",
+                              "version": "1.0"},
+            "source": {"name": filename,
+                       "reception_time": "2021-03-17T00:00:00",
+                       "generation_time": "2021-03-17T00:00:00",
+                       "validity_start": "2021-03-18T00:00:00",
+                       "validity_stop": "2021-03-17T00:00:00"},
+            "events": []
+        }
+
+        returned_values = parallel_ingestion.insert_data_in_parallel({"operations": [completeness_operation]})
+
+        assert len(returned_values) == 1
+        assert returned_values[0]["status"] != eboa_engine.exit_codes["OK"]["status"]
+
+    def test_read_nppf_tgz(self):
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        # Build the TGZ with the HDR and DBL files using namespaces
+        tgz_filename = filename.replace("EOF", "TGZ")
+        root = etree.parse(file_path).getroot()
+        members = {}
+        for (extension, node, namespace) in [("HDR", root[0], "http://eop-cfi.esa.int/CFI"), ("DBL", root[1], "http://www.esa.int/safe/sentinel-1.0")]:
+            content = etree.tostring(node).decode().replace("<" + node.tag, "<" + node.tag + " xmlns=\"" + namespace + "\"", 1)
+            members[tgz_filename.replace("TGZ", extension)] = ("<?xml version=\"1.0\" encoding=\"UTF-8\"?>\n" + content).encode()
+        # end for
+
+        temporary_dir_path = tempfile.mkdtemp()
+        try:
+            with tarfile.open(temporary_dir_path + "/" + tgz_filename, "w:gz") as tar:
+                for member_name in members:
+                    member = tarfile.TarInfo(member_name)
+                    member.size = len(members[member_name])
+                    tar.addfile(member, io.BytesIO(members[member_name]))
+                # end for
+            # end with
+
+            for nppf_reader in ingestion_nppf.nppf_readers.values():
+                with tarfile.open(temporary_dir_path + "/" + tgz_filename) as tar:
+                    (header, deletion_queue_execution_times, imaging_operations) = nppf_reader(ingestion_nppf_tgz.NppfStream(tar, [tgz_filename.replace("TGZ", "HDR"), tgz_filename.replace("TGZ", "DBL")]))
+                # end with
+
+                (expected_header, expected_deletion_queue_execution_times, expected_imaging_operations) = ingestion_nppf._read_nppf_streaming(file_path)
+
+                assert header == expected_header
+                assert deletion_queue_execution_times == expected_deletion_queue_execution_times
+                assert [[getattr(imaging_operation, name) for name in imaging_operation.__slots__] for imaging_operation in imaging_operations] == [[getattr(imaging_operation, name) for name in imaging_operation.__slots__] for imaging_operation in expected_imaging_operations]
+            # end for
+        finally:
+            shutil.rmtree(temporary_dir_path)
+        # end try
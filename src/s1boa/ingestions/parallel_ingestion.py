@@ -0,0 +1,247 @@
+"""
+Driver for the ingestion of files of Sentinel-1 inserting the completeness
+operations in parallel
+
+The operations different from the completeness ones are inserted first
+in one session. Then, the completeness operations (one per level when
+COMPLETENESS_OPERATIONS = "per_level") are inserted concurrently, each
+one in its own process with its own engine and so its own session of the
+DDBB. The links by
+reference to the events inserted in the first phase are translated to
+links by UUID as the references are only known by the engine that
+inserted those events.
+
+The data is inserted calling the engine directly instead of going through
+eboa.ingestion.eboa_ingestion, so the steps of the standard ingestion flow
+are skipped:
+- the status of the source is not registered when the processing or the
+  insertion fails. The exceptions of the processing are raised to the
+  caller and the statuses of the operations are only returned
+- the insertions are not retried (INGESTION_RETRIES does not apply)
+The caller has to check the returned statuses and ingest the file again
+through the standard flow if any of the operations failed.
+
+Usage: parallel_ingestion.py -p s1boa.ingestions.ingestion_nppf.ingestion_nppf -f file_path [-w 4]
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1boa
+"""
+# Import python utilities
+import os
+import sys
+import argparse
+import datetime
+import importlib
+import multiprocessing
+import concurrent.futures
+from dateutil import parser
+
+# Import engine of the DDBB
+import eboa.engine.engine as eboa_engine
+from eboa.engine.engine import Engine
+from eboa.engine.query import Query
+
+# Import entities of the datamodel
+from eboa.datamodel.sources import Source
+from eboa.datamodel.dim_signatures import DimSignature
+from eboa.datamodel.events import Event
+from eboa.datamodel.gauges import Gauge
+
+# Import errors
+from s1boa.ingestions.errors import LinkReferenceAmbiguous
+
+# Import logging
+from eboa.logging import Log
+
+logging_module = Log(name = __name__)
+logger = logging_module.logger
+
+def _is_completeness_operation(operation):
+    """
+    Method to check if an operation inserts completeness events
+    :param operation: operation to check
+    :type operation: dict
+
+    :return: True if the operation is a completeness operation, False otherwise
+    :rtype: bool
+    """
+    return operation["dim_signature"]["name"].startswith("COMPLETENESS_")
+
+def _resolve_links_by_ref(query, inserted_operations, operations):
+    """
+    Method to translate the links by reference to the events of the inserted operations into links by UUID.
+    The referenced events are searched by their timings among the events of the same gauge (name and
+    satellite) inserted by the same source and DIM signature, as other sources (e.g. previous plans) can
+    contain events with the same timings. The translation fails if the timings match more than one event
+    :param query: Query instance
+    :type query: Query
+    :param inserted_operations: operations already inserted
+    :type inserted_operations: list of dict
+    :param operations: operations with the links to translate
+    :type operations: list of dict
+    """
+    # Events referenced per source and gauge
+    referenced_events_per_source_and_gauge = {}
+    for operation in inserted_operations:
+        for event in operation.get("events", []):
+            if "link_ref" in event:
+                source_and_gauge = (operation["source"]["name"], operation["dim_signature"]["name"], event["gauge"]["name"], event["gauge"]["system"])
+                if source_and_gauge not in referenced_events_per_source_and_gauge:
+                    referenced_events_per_source_and_gauge[source_and_gauge] = []
+                # end if
+                referenced_events_per_source_and_gauge[source_and_gauge].append(event)
+            # end if
+        # end for
+    # end for
+
+    # Obtain the UUIDs of the referenced events by their timings (one projected query per source and gauge)
+    event_uuids_by_ref = {}
+    for (source_name, dim_signature, gauge_name, gauge_system) in referenced_events_per_source_and_gauge:
+        referenced_events = referenced_events_per_source_and_gauge[(source_name, dim_signature, gauge_name, gauge_system)]
+        inserted_events = query.session.query(Event.event_uuid, Event.start, Event.stop) \
+                                       .join(Gauge, Event.gauge_uuid == Gauge.gauge_uuid) \
+                                       .join(Source, Event.source_uuid == Source.source_uuid) \
+                                       .join(DimSignature, Source.dim_signature_uuid == DimSignature.dim_signature_uuid) \
+                                       .filter(Source.name == source_name,
+                                               DimSignature.dim_signature == dim_signature,
+                                               Gauge.name == gauge_name,
+                                               Gauge.system == gauge_system).all()
+        event_uuids_by_timings = {}
+        for (event_uuid, start, stop) in inserted_events:
+            event_uuids_by_timings.setdefault((start, stop), []).append(event_uuid)
+        # end for
+        for event in referenced_events:
+            event_uuids = event_uuids_by_timings.get((parser.parse(event["start"]), parser.parse(event["stop"])), [])
+            if len(event_uuids) == 1:
+                event_uuids_by_ref[event["link_ref"]] = str(event_uuids[0])
+            elif len(event_uuids) > 1:
+                raise LinkReferenceAmbiguous("The event referenced by {} is ambiguous as the source {} contains {} events of the gauge {} ({}) with the same timings".format(event["link_ref"], source_name, len(event_uuids), gauge_name, gauge_system))
+            # end if
+        # end for
+    # end for
+
+    for operation in operations:
+        for event in operation.get("events", []):
+            for link in event.get("links", []):
+                if link["link_mode"] == "by_ref" and link["link"] in event_uuids_by_ref:
+                    link["link"] = event_uuids_by_ref[link["link"]]
+                    link["link_mode"] = "by_uuid"
+                elif link["link_mode"] == "by_ref":
+                    logger.warning("The event referenced by {} could not be found in the DDBB".format(link["link"]))
+                # end if
+            # end for
+        # end for
+    # end for
+
+def _insert_operations(operations):
+    """
+    Method to insert operations with a new engine (and so a new session of the DDBB)
+    :param operations: operations to insert
+    :type operations: list of dict
+
+    :return: returned values of the engine
+    :rtype: list
+    """
+    engine = Engine()
+    try:
+        return engine.treat_data({"operations": operations})
+    finally:
+        engine.close_session()
+    # end try
+
+def insert_data_in_parallel(data, workers = None):
+    """
+    Method to insert the data generated by an ingestion inserting the completeness operations in parallel
+    :param data: data generated by the ingestion
+    :type data: dict
+    :param workers: maximum number of concurrent insertions (by default the number of completeness operations limited to the number of cores)
+    :type workers: int
+
+    :return: returned values of the engine for all the operations
+    :rtype: list
+    """
+    operations = [operation for operation in data["operations"] if not _is_completeness_operation(operation)]
+    completeness_operations = [operation for operation in data["operations"] if _is_completeness_operation(operation)]
+
+    returned_values = []
+    if len(operations) > 0:
+        returned_values += _insert_operations(operations)
+    # end if
+
+    if len(completeness_operations) > 0:
+        query = Query()
+        try:
+            _resolve_links_by_ref(query, operations, completeness_operations)
+        finally:
+            query.close_session()
+        # end try
+
+        if workers is None:
+            workers = min(len(completeness_operations), os.cpu_count())
+        # end if
+        start = datetime.datetime.now()
+        # The processes are spawned to not inherit the connections to the DDBB
+        with concurrent.futures.ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context("spawn")) as executor:
+            for returned_values_of_operation in executor.map(_insert_operations, [[operation] for operation in completeness_operations]):
+                returned_values += returned_values_of_operation
+            # end for
+        # end with
+        logger.info("{} completeness operations have been inserted with {} workers in {} seconds".format(len(completeness_operations), workers, (datetime.datetime.now() - start).total_seconds()))
+    # end if
+
+    return returned_values
+
+def command_process_file_in_parallel(processor, file_path, reception_time, workers = None):
+    """
+    Method to process a file and insert the generated data inserting the completeness operations in parallel
+    :param processor: module of the ingestion
+    :type processor: str
+    :param file_path: path to the file to be processed
+    :type file_path: str
+    :param reception_time: time of the reception of the file
+    :type reception_time: str
+    :param workers: maximum number of concurrent insertions
+    :type workers: int
+
+    :return: returned values of the engine for all the operations
+    :rtype: list
+    """
+    processor_module = importlib.import_module(processor)
+
+    engine = Engine()
+    query = Query()
+    try:
+        data = processor_module.process_file(file_path, engine, query, reception_time)
+    finally:
+        engine.close_session()
+        query.close_session()
+    # end try
+
+    return insert_data_in_parallel(data, workers)
+
+def main():
+    args_parser = argparse.ArgumentParser(description="Ingestion of files inserting the completeness operations in parallel")
+    args_parser.add_argument("-p", "--processor", type=str, required=True,
+                             help="Module of the ingestion")
+    args_parser.add_argument("-f", "--file_path", type=str, required=True,
+                             help="Path to the file to ingest")
+    args_parser.add_argument("-w", "--workers", type=int, default=None,
+                             help="Maximum number of concurrent insertions (by default one per completeness operation limited to the number of cores)")
+    args = args_parser.parse_args()
+
+    os.environ.setdefault("S1BOA_COMPLETENESS_OPERATIONS", "per_level")
+
+    returned_values = command_process_file_in_parallel(args.processor, os.path.abspath(args.file_path), datetime.datetime.now().isoformat(), args.workers)
+    for returned_value in returned_values:
+        logger.info(returned_value)
+    # end for
+
+    # The insertions are not retried, so the failure is reported to the caller
+    if len([returned_value for returned_value in returned_values if returned_value["status"] != eboa_engine.exit_codes["OK"]["status"]]) > 0:
+        logger.error("Some operations of the file {} could not be inserted".format(args.file_path))
+        sys.exit(1)
+    # end if
+
+if __name__ == "__main__":
+    main()
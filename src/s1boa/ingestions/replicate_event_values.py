@@ -7,6 +7,7 @@ module eboa
 """
 # Import python utilities
 import re
+import atexit
 
 # Import entities of the datamodel
 from eboa.datamodel.events import EventObject, EventGeometry
@@ -17,6 +18,14 @@ from geoalchemy2.shape import to_shape
 # Import ingestion helpers
 import s1boa.ingestions.functions as functions
 
+# ORBPRE files shared by all the replications of the engine session.
+# The file of a satellite is reset when a replication falls far from the
+# covered window, so the file does not grow with the life of the process.
+# The engine does not notify the end of the session so the last files are
+# removed when the process finishes
+orbpre_manager = functions.OrbpreManager()
+atexit.register(orbpre_manager.close)
+
 def replicate_event_values(query, from_event_uuid, to_event_uuid, to_event, list_values_to_be_created):
     """
     Method to replicate the values associated to events that were overwritten partially by other events
@@ -29,55 +38,99 @@ def replicate_event_values(query, from_event_uuid, to_event_uuid, to_event, list
     :type list_values_to_be_created: list
     """
 
-    # Get values from the previous events
-    values = query.get_event_values(event_uuids = [str(from_event_uuid)])
-
-    # Check if the footprints can be updated using the satellite and the orbit prediction information
-    satellite_values = [value for value in values if value.name == "satellite"]
-    footprint_values = [value for value in values if type(value) in (EventGeometry, EventObject) and re.match(".*footprint.*", value.name)]
-    imaging_mode_values = [value for value in values if value.name == "imaging_mode"]
-    
-    # Get the values to be directly copied (all but those related to the footprints)
-    values_to_copy = values
-    if len(footprint_values) > 0 and len(satellite_values):
-        values_to_copy = [value for value in values if not(type(value) in (EventGeometry, EventObject) and re.match(".*footprint.*", value.name))]
+    replicate_event_values_bulk(query, [(from_event_uuid, to_event_uuid, to_event)], list_values_to_be_created)
+
+    return
+
+def replicate_event_values_bulk(query, replications, list_values_to_be_created):
+    """
+    Method to replicate the values associated to several events that were overwritten partially by other events.
+    The values are obtained with one query and the footprints are obtained with one request per satellite
+
+    :param replications: list of tuples with the original event where to get the associated values from, the new event to associate the values and the new event
+    :type replications: list
+    :param list_values_to_be_created: list of values to be stored later inside the DDBB
+    :type list_values_to_be_created: list
+    """
+
+    if len(replications) == 0:
+        return
     # end if
-    position_footprints = 0
-    for value in values_to_copy:
-        if not type(value) in list_values_to_be_created:
-            list_values_to_be_created[type(value)] = []
+
+    # Get values from the previous events
+    values_per_event = {}
+    for value in query.get_event_values(event_uuids = list(set([str(from_event_uuid) for (from_event_uuid, to_event_uuid, to_event) in replications]))):
+        if not str(value.event_uuid) in values_per_event:
+            values_per_event[str(value.event_uuid)] = []
         # end if
-        value_to_insert = {"event_uuid": to_event_uuid,
-                           "name": value.name,
-                           "position": value.position,
-                           "parent_level": value.parent_level,
-                           "parent_position": value.parent_position
-        }
-        if not type(value) in (EventObject, EventGeometry):
-            value_to_insert["value"] = value.value
-        elif type(value) == EventGeometry:
-            value_to_insert["value"] = to_shape(value.value).wkt
+        values_per_event[str(value.event_uuid)].append(value)
+    # end for
+
+    # Events to obtain footprint indexed by satellite and imaging mode
+    events_to_obtain_footprint_per_satellite = {}
+    # Position for the footprints of every new event
+    position_footprints_per_replication = {}
+
+    for i, (from_event_uuid, to_event_uuid, to_event) in enumerate(replications):
+        values = values_per_event.get(str(from_event_uuid), [])
+
+        # Check if the footprints can be updated using the satellite and the orbit prediction information
+        satellite_values = [value for value in values if value.name == "satellite"]
+        footprint_values = [value for value in values if type(value) in (EventGeometry, EventObject) and re.match(".*footprint.*", value.name)]
+        imaging_mode_values = [value for value in values if value.name == "imaging_mode"]
+
+        # Get the values to be directly copied (all but those related to the footprints)
+        values_to_copy = values
+        if len(footprint_values) > 0 and len(satellite_values):
+            values_to_copy = [value for value in values if not(type(value) in (EventGeometry, EventObject) and re.match(".*footprint.*", value.name))]
         # end if
+        position_footprints = 0
+        for value in values_to_copy:
+            if not type(value) in list_values_to_be_created:
+                list_values_to_be_created[type(value)] = []
+            # end if
+            value_to_insert = {"event_uuid": to_event_uuid,
+                               "name": value.name,
+                               "position": value.position,
+                               "parent_level": value.parent_level,
+                               "parent_position": value.parent_position
+            }
+            if not type(value) in (EventObject, EventGeometry):
+                value_to_insert["value"] = value.value
+            elif type(value) == EventGeometry:
+                value_to_insert["value"] = to_shape(value.value).wkt
+            # end if
 
-        # Increment position for footprints
-        if value.parent_level == -1:
-            position_footprints += 1
+            # Increment position for footprints
+            if value.parent_level == -1:
+                position_footprints += 1
+            # end if
+            list_values_to_be_created[type(value)].append(value_to_insert)
+        # end for
+
+        # Footprints to update
+        if len(footprint_values) > 0 and len(satellite_values) > 0 and len(imaging_mode_values) > 0:
+            satellite = satellite_values[0].value
+            imaging_mode = imaging_mode_values[0].value
+            if not satellite in events_to_obtain_footprint_per_satellite:
+                events_to_obtain_footprint_per_satellite[satellite] = {}
+            # end if
+            if not imaging_mode in events_to_obtain_footprint_per_satellite[satellite]:
+                events_to_obtain_footprint_per_satellite[satellite][imaging_mode] = []
+            # end if
+            events_to_obtain_footprint_per_satellite[satellite][imaging_mode].append({
+                "start": to_event["start"].isoformat(),
+                "stop": to_event["stop"].isoformat(),
+                "values": [],
+                "replication": i
+            })
+            position_footprints_per_replication[i] = position_footprints
         # end if
-        list_values_to_be_created[type(value)].append(value_to_insert)
     # end for
 
     # Update footprints
-    if len(footprint_values) > 0 and len(satellite_values) > 0 and len(imaging_mode_values) > 0:
-        satellite = satellite_values[0].value
-        imaging_mode = imaging_mode_values[0].value
-        events_to_obtain_footprint = {
-            imaging_mode: [{
-                "start": to_event["start"].isoformat(),
-                "stop": to_event["stop"].isoformat(),
-                "values": []
-            }]
-        }
-        events = functions.associate_footprints(events_to_obtain_footprint, satellite, return_polygon_format = True)
+    for satellite in events_to_obtain_footprint_per_satellite:
+        events = functions.associate_footprints(events_to_obtain_footprint_per_satellite[satellite], satellite, return_polygon_format = True, orbpre_manager = orbpre_manager)
 
         if not EventGeometry in list_values_to_be_created:
             list_values_to_be_created[EventGeometry] = []
@@ -85,27 +138,31 @@ def replicate_event_values(query, from_event_uuid, to_event_uuid, to_event, list
         if not EventObject in list_values_to_be_created:
             list_values_to_be_created[EventObject] = []
         # end if
-        
-        iterator = 0
-        for footprint_object in events[0]["values"]:
-            list_values_to_be_created[EventObject].append(
-                {"event_uuid": to_event_uuid,
-                 "name": "footprint_details_" + str(iterator),
-                 "position": position_footprints,
-                 "parent_level": -1,
-                 "parent_position": 0
-                 })
-            list_values_to_be_created[EventGeometry].append(
-                {"event_uuid": to_event_uuid,
-                 "name": "footprint",
-                 "position": 0,
-                 "parent_level": 0,
-                 "parent_position": position_footprints,
-                 "value": footprint_object["values"][0]["value"]
-                 })
-            iterator += 1
-            position_footprints += 1
+
+        for event in events:
+            (_, to_event_uuid, _) = replications[event["replication"]]
+            position_footprints = position_footprints_per_replication[event["replication"]]
+            iterator = 0
+            for footprint_object in event["values"]:
+                list_values_to_be_created[EventObject].append(
+                    {"event_uuid": to_event_uuid,
+                     "name": "footprint_details_" + str(iterator),
+                     "position": position_footprints,
+                     "parent_level": -1,
+                     "parent_position": 0
+                     })
+                list_values_to_be_created[EventGeometry].append(
+                    {"event_uuid": to_event_uuid,
+                     "name": "footprint",
+                     "position": 0,
+                     "parent_level": 0,
+                     "parent_position": position_footprints,
+                     "value": footprint_object["values"][0]["value"]
+                     })
+                iterator += 1
+                position_footprints += 1
+            # end for
         # end for
-    # end if
+    # end for
 
     return
@@ -0,0 +1,83 @@
+"""
+Automated tests for the persistent cache of footprints of the S1BOA submodule
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1boa
+"""
+# Import python utilities
+import os
+import unittest
+import tempfile
+import shutil
+
+# Import functions
+import s1boa.ingestions.functions as s1boa_functions
+
+# Import cache
+from s1boa.ingestions.footprint_cache import FootprintCache
+
+class TestFootprintCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir_path)
+        for name in ["S1BOA_FOOTPRINT_CACHE_PATH", "S1BOA_FOOTPRINT_CACHE_MAX_ENTRIES"]:
+            if name in os.environ:
+                del os.environ[name]
+            # end if
+        # end for
+
+    def test_footprint_cache_lru(self):
+
+        footprint_cache = FootprintCache(self.cache_dir_path + "/footprints.sqlite", 2)
+
+        footprint_cache.put({("S1A", "SDF_SARWIW.S1", "2021-03-17T04:12:10", "2021-03-17T04:12:35", 7, "hash", "batch"): {"footprints": ["1 1 2 2 1 1"], "command": "command_1"}})
+        footprint_cache.put({("S1A", "SDF_SARWIW.S1", "2021-03-17T04:13:10", "2021-03-17T04:13:35", 7, "hash", "batch"): {"footprints": ["3 3 4 4 3 3"], "command": "command_2"}})
+
+        # The first footprint is accessed so that the second one is the least recently used
+        footprints = footprint_cache.get([("S1A", "SDF_SARWIW.S1", "2021-03-17T04:12:10", "2021-03-17T04:12:35", 7, "hash", "batch")])
+        assert footprints == {("S1A", "SDF_SARWIW.S1", "2021-03-17T04:12:10", "2021-03-17T04:12:35", 7, "hash", "batch"): {"footprints": ["1 1 2 2 1 1"], "command": "command_1"}}
+
+        footprint_cache.put({("S1A", "SDF_SARWIW.S1", "2021-03-17T04:14:10", "2021-03-17T04:14:35", 7, "hash", "batch"): {"footprints": ["5 5 6 6 5 5"], "command": "command_3"}})
+
+        footprints = footprint_cache.get([("S1A", "SDF_SARWIW.S1", "2021-03-17T04:12:10", "2021-03-17T04:12:35", 7, "hash", "batch"),
+                                          ("S1A", "SDF_SARWIW.S1", "2021-03-17T04:13:10", "2021-03-17T04:13:35", 7, "hash", "batch"),
+                                          ("S1A", "SDF_SARWIW.S1", "2021-03-17T04:14:10", "2021-03-17T04:14:35", 7, "hash", "batch")])
+
+        # The second footprint has been removed
+        assert set(footprints.keys()) == set([("S1A", "SDF_SARWIW.S1", "2021-03-17T04:12:10", "2021-03-17T04:12:35", 7, "hash", "batch"),
+                                              ("S1A", "SDF_SARWIW.S1", "2021-03-17T04:14:10", "2021-03-17T04:14:35", 7, "hash", "batch")])
+
+        assert footprint_cache.get_statistics() == {"hits": 3,
+                                                    "misses": 1,
+                                                    "entries": 2}
+
+    def test_associate_footprints_cache(self):
+
+        os.environ["S1BOA_FOOTPRINT_CACHE_PATH"] = self.cache_dir_path + "/footprints.sqlite"
+        os.environ["S1BOA_FOOTPRINT_CACHE_MAX_ENTRIES"] = "10"
+
+        events_per_imaging_mode = {
+            "IW": [{"start": "2021-03-17T04:12:10.501000",
+                    "stop": "2021-03-17T04:12:35.499000",
+                    }]
+        }
+
+        events_with_footprint = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A")
+
+        footprint_cache = s1boa_functions.get_footprint_cache()
+
+        assert footprint_cache.get_statistics() == {"hits": 0,
+                                                    "misses": 1,
+                                                    "entries": 1}
+
+        # The second request is served by the cache
+        events_with_footprint_from_cache = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A")
+
+        assert footprint_cache.get_statistics() == {"hits": 1,
+                                                    "misses": 1,
+                                                    "entries": 1}
+
+        assert events_with_footprint_from_cache == events_with_footprint
@@ -14,6 +14,8 @@ from dateutil import parser
 import traceback
 import pdb
 import re
+import math
+import subprocess
 
 # Import engine of the DDBB
 import eboa.engine.engine as eboa_engine
@@ -27,7 +29,7 @@ import eboa.ingestion.eboa_ingestion as ingestion
 import s1boa.ingestions.functions as s1boa_functions
 
 # Import errors
-from s1boa.ingestions.errors import WrongDate, WrongSatellite
+from s1boa.ingestions.errors import WrongDate, WrongSatellite, FootprintBackendNotAvailable
 
 # Import logging
 from eboa.logging import Log
@@ -421,3 +423,344 @@ class TestS2boaFunctions(unittest.TestCase):
             del os.environ["EBOA_LOG_LEVEL"]
         # end if
         logging_module.define_logging_configuration()
+
+    def test_orbpre_manager(self):
+
+        orbpre_manager = s1boa_functions.OrbpreManager()
+
+        orbpre_file_path = orbpre_manager.get_orbpre_file("2021-03-17T04:12:10.501000", "2021-03-17T04:12:35.499000", "S1A")
+
+        # A window inside the covered one reuses the ORBPRE file
+        assert orbpre_manager.get_orbpre_file("2021-03-17T04:12:20", "2021-03-17T04:12:30", "S1A") == orbpre_file_path
+
+        # A window outside the covered one extends the ORBPRE file
+        extended_orbpre_file_path = orbpre_manager.get_orbpre_file("2021-03-17T04:12:20", "2021-03-17T06:12:30", "S1A")
+
+        assert extended_orbpre_file_path != orbpre_file_path
+        assert not os.path.isfile(orbpre_file_path)
+        assert orbpre_manager.orbpre_files["S1A"] == (extended_orbpre_file_path, "2021-03-17T04:12:10.501000", "2021-03-17T06:12:30")
+
+        # A window far from the covered one resets the ORBPRE file
+        reset_orbpre_file_path = orbpre_manager.get_orbpre_file("2021-03-20T04:12:10", "2021-03-20T04:12:35", "S1A")
+
+        assert not os.path.isfile(extended_orbpre_file_path)
+        assert orbpre_manager.orbpre_files["S1A"] == (reset_orbpre_file_path, "2021-03-20T04:12:10", "2021-03-20T04:12:35")
+
+        orbpre_manager.close()
+
+        assert not os.path.isfile(reset_orbpre_file_path)
+
+    def test_associate_footprints_same_window(self):
+
+        values = [{"name": "status",
+                   "type": "text",
+                   "value": "MISSING"}]
+        events_per_imaging_mode = {
+            "IW": [{"start": "2021-03-17T04:12:10.501000",
+                    "stop": "2021-03-17T04:12:35.499000",
+                    "values": values
+                    },
+                   {"start": "2021-03-17T04:12:10.501000",
+                    "stop": "2021-03-17T04:12:35.499000",
+                    "values": values
+                    }],
+            "NIW": [{"start": "2021-03-17T04:12:10.501000",
+                     "stop": "2021-03-17T04:12:35.499000",
+                     }]
+        }
+
+        footprint_requests = {}
+        events_with_footprint = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_requests = footprint_requests)
+
+        assert len(events_with_footprint) == 3
+
+        # IW and NIW share the swath definition so only one footprint is obtained
+        assert list(footprint_requests.keys()) == [("S1A", "SDF_SARWIW.S1", "2021-03-17T04:12:10.501000", "2021-03-17T04:12:35.499000")]
+
+        # The values shared by the events are not modified
+        assert values == [{"name": "status",
+                           "type": "text",
+                           "value": "MISSING"}]
+
+        footprint_values = [{"name": "footprint_details_0",
+                             "type": "object",
+                             "values": [{"name": "footprint",
+                                         "type": "geometry",
+                                         "value": "32.000866 50.519131 31.922603 50.270001 31.844881 50.020833 31.767632 49.771631 31.690902 49.522393 31.614684 49.273118 31.538968 49.023807 28.128559 49.414686 28.18698 49.664194 28.245669 49.913681 28.304632 50.163147 28.36387 50.412591 28.423319 50.662016 28.483058 50.911419 32.000866 50.519131"}]}]
+
+        assert events_with_footprint[0]["values"] == values + footprint_values
+        assert events_with_footprint[1]["values"] == values + footprint_values
+        assert events_with_footprint[2]["values"] == footprint_values
+
+    def test_associate_footprints_backends(self):
+
+        events_per_imaging_mode = {
+            "IW": [{"start": "2021-03-17T04:12:10.501000",
+                    "stop": "2021-03-17T04:12:35.499000",
+                    }],
+            "EW": [{"start": "2021-03-16T18:10:52.302000",
+                    "stop": "2021-03-16T18:12:01.502000",
+                    }]
+        }
+
+        events_with_footprint_by_subprocess = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_backend = "subprocess")
+
+        events_with_footprint_by_batch = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_backend = "batch")
+
+        assert len(events_with_footprint_by_batch) == 2
+
+        assert events_with_footprint_by_batch == events_with_footprint_by_subprocess
+
+    def test_footprint_process_finished(self):
+
+        footprint_process = s1boa_functions.FootprintProcess()
+
+        # The shell finishes with the requested command
+        test_success = False
+        try:
+            footprint_process.request("exit 3")
+        except subprocess.CalledProcessError as error:
+            test_success = error.returncode == 3
+        # end try
+
+        assert test_success
+        assert not footprint_process.is_alive()
+
+        # The requests to the finished shell fail with its exit status
+        test_success = False
+        try:
+            footprint_process.request("echo 1")
+        except subprocess.CalledProcessError as error:
+            test_success = error.returncode == 3
+        # end try
+
+        assert test_success
+
+        footprint_process.close()
+
+        # The commands following the one finishing the shell are executed in a new process
+        footprints = s1boa_functions._execute_in_footprint_process(["exit 3", "echo '1 2 3 4 5 6 1 2 '"])
+
+        assert footprints["exit 3"] == None
+        assert footprints["echo '1 2 3 4 5 6 1 2 '"]["coordinates"] == "1 2 3 4 5 6 1 2"
+
+    def test_associate_footprints_parallel(self):
+
+        events_per_imaging_mode = {
+            "IW": [{"start": "2021-03-17T04:12:10.501000",
+                    "stop": "2021-03-17T04:12:35.499000",
+                    },
+                   {"start": "2021-03-17T04:13:10.501000",
+                    "stop": "2021-03-17T04:13:35.499000",
+                    }],
+            "EW": [{"start": "2021-03-16T18:10:52.302000",
+                    "stop": "2021-03-16T18:12:01.502000",
+                    }]
+        }
+
+        os.environ["S1BOA_FOOTPRINT_CACHE_MAX_ENTRIES"] = "0"
+        try:
+            events_with_footprint = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_backend = "batch")
+
+            os.environ["S1BOA_FOOTPRINT_WORKERS"] = "2"
+            events_with_footprint_by_batch = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_backend = "batch")
+            events_with_footprint_by_subprocess = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_backend = "subprocess")
+        finally:
+            del os.environ["S1BOA_FOOTPRINT_CACHE_MAX_ENTRIES"]
+            if "S1BOA_FOOTPRINT_WORKERS" in os.environ:
+                del os.environ["S1BOA_FOOTPRINT_WORKERS"]
+            # end if
+        # end try
+
+        assert len(events_with_footprint) == 3
+
+        # The order of the events and the footprints do not depend on the number of workers
+        assert events_with_footprint_by_batch == events_with_footprint
+        assert events_with_footprint_by_subprocess == events_with_footprint
+
+    def test_associate_footprints_native(self):
+
+        events_per_imaging_mode = {
+            "IW": [{"start": "2021-03-17T04:12:10.501000",
+                    "stop": "2021-03-17T04:12:35.499000",
+                    }]
+        }
+
+        events_with_footprint = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_backend = "native")
+
+        assert len(events_with_footprint) == 1
+
+        # The footprint is the one obtained by the get_footprint tool of the EOCFI within a tolerance of 0.05 degrees
+        footprint_by_eocfi = [float(coordinate) for coordinate in "32.000866 50.519131 31.922603 50.270001 31.844881 50.020833 31.767632 49.771631 31.690902 49.522393 31.614684 49.273118 31.538968 49.023807 28.128559 49.414686 28.18698 49.664194 28.245669 49.913681 28.304632 50.163147 28.36387 50.412591 28.423319 50.662016 28.483058 50.911419 32.000866 50.519131".split(" ")]
+
+        assert len(events_with_footprint[0]["values"]) == 1
+        assert events_with_footprint[0]["values"][0]["name"] == "footprint_details_0"
+        footprint = [float(coordinate) for coordinate in events_with_footprint[0]["values"][0]["values"][0]["value"].split(" ")]
+
+        assert len(footprint) == len(footprint_by_eocfi)
+        assert max([abs(coordinate - coordinate_by_eocfi) for (coordinate, coordinate_by_eocfi) in zip(footprint, footprint_by_eocfi)]) < 0.05
+
+    def test_associate_footprints_native_windows(self):
+
+        # Windows of several swaths, durations and latitudes of the NPPF used by the tests
+        events_per_imaging_mode = {
+            "IW": [{"start": "2021-03-17T04:10:33.066685",
+                    "stop": "2021-03-17T04:17:48.873819",
+                    }],
+            "EW": [{"start": "2021-03-16T18:10:59.878756",
+                    "stop": "2021-03-16T18:16:12.831484",
+                    }],
+            "WV": [{"start": "2021-03-16T18:19:42.153551",
+                    "stop": "2021-03-16T18:35:48.853967",
+                    }],
+            "S1_WO_CAL": [{"start": "2021-03-17T12:31:23.026189",
+                           "stop": "2021-03-17T12:31:48.030734",
+                           }],
+            "S3_WO_CAL": [{"start": "2021-03-17T10:58:50.209749",
+                           "stop": "2021-03-17T10:59:05.210061",
+                           }],
+            "S6_WO_CAL": [{"start": "2021-03-19T05:52:44.433795",
+                           "stop": "2021-03-19T05:53:14.425137",
+                           }]
+        }
+
+        os.environ["S1BOA_FOOTPRINT_CACHE_MAX_ENTRIES"] = "0"
+        try:
+            events_with_footprint = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_backend = "native")
+            events_with_footprint_by_eocfi = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_backend = "batch")
+        finally:
+            del os.environ["S1BOA_FOOTPRINT_CACHE_MAX_ENTRIES"]
+        # end try
+
+        assert len(events_with_footprint) == 6
+
+        def get_coordinates(event):
+            # Longitude and latitude pairs of all the polygons, excluding the points added on the antimeridian
+            coordinates = []
+            for footprint_details in event["values"]:
+                values = [float(value) for value in footprint_details["values"][0]["value"].split(" ")]
+                coordinates += [(longitude, latitude) for (longitude, latitude) in zip(values[0::2], values[1::2]) if abs(longitude) != 180]
+            # end for
+            return coordinates
+        # end def
+
+        # The native model does not include the short period
+        # perturbations of the orbit nor the roll steering of the
+        # attitude, so each vertex of the EOCFI footprint is within 17
+        # km of the native footprint (the differences go from 7 km for
+        # the stripmap 1 to 16 km for the stripmap 6)
+        for (event, event_by_eocfi) in zip(events_with_footprint, events_with_footprint_by_eocfi):
+            coordinates = get_coordinates(event)
+            for (longitude_by_eocfi, latitude_by_eocfi) in get_coordinates(event_by_eocfi):
+                distance = min([math.hypot(((longitude - longitude_by_eocfi + 180) % 360 - 180) * math.cos(math.radians(latitude_by_eocfi)), latitude - latitude_by_eocfi) * 111.2 for (longitude, latitude) in coordinates])
+                assert distance < 17
+            # end for
+        # end for
+
+    def test_associate_footprints_from_samples(self):
+
+        events_per_imaging_mode = {
+            "EW": [{"start": "2021-03-16T18:10:52.302000",
+                    "stop": "2021-03-16T18:12:01.502000",
+                    }]
+        }
+
+        footprint_samples = {}
+        s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_samples = footprint_samples)
+
+        assert list(footprint_samples.keys()) == [("S1A", "SDF_SARWEW.S1")]
+
+        # Completeness window of the imaging event
+        completeness_events_per_imaging_mode = {
+            "EW": [{"start": "2021-03-16T18:11:02.302000",
+                    "stop": "2021-03-16T18:11:41.502000",
+                    }]
+        }
+
+        footprint_requests = {}
+        events_with_footprint_from_samples = s1boa_functions.associate_footprints(completeness_events_per_imaging_mode, "S1A", footprint_requests = footprint_requests, footprint_samples = footprint_samples)
+
+        # The footprint has been clipped from the samples
+        assert footprint_requests[("S1A", "SDF_SARWEW.S1", "2021-03-16T18:11:02.302000", "2021-03-16T18:11:41.502000")]["command"] == None
+
+        events_with_footprint = s1boa_functions.associate_footprints(completeness_events_per_imaging_mode, "S1A")
+
+        # The clipped footprint is the one obtained by the get_footprint tool of the EOCFI within a tolerance of 0.01 degrees
+        footprint_from_samples = [float(coordinate) for coordinate in events_with_footprint_from_samples[0]["values"][0]["values"][0]["value"].split(" ")]
+        footprint = [float(coordinate) for coordinate in events_with_footprint[0]["values"][0]["values"][0]["value"].split(" ")]
+
+        assert len(footprint_from_samples) == len(footprint)
+        assert max([abs(coordinate_from_samples - coordinate) for (coordinate_from_samples, coordinate) in zip(footprint_from_samples, footprint)]) < 0.01
+
+    def test_associate_footprints_wrong_backend(self):
+
+        events_per_imaging_mode = {
+            "IW": [{"start": "2021-03-17T04:12:10.501000",
+                    "stop": "2021-03-17T04:12:35.499000",
+                    }]
+        }
+
+        test_success = False
+        try:
+            s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", footprint_backend = "not_a_backend")
+        except FootprintBackendNotAvailable:
+            traceback.print_exc(file=sys.stdout)
+            test_success = True
+        # end try
+
+        assert test_success
+
+    def test_split_completeness_operation(self):
+
+        completeness_operation = {
+            "mode": "insert",
+            "dim_signature": {
+                "name": "COMPLETENESS_NPPF_S1A",
+                "exec": "ingestion_nppf.py",
+                "version": "1.0"
+            },
+            "source": {
+                "name": "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001.EOF",
+                "validity_start": "2021-03-16T18:07:38.057000",
+                "validity_stop": "2021-04-05T18:00:00",
+                "priority": 10
+            },
+            "events": [{"gauge": {"name": "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_" + level, "system": "S1A"},
+                        "start": "2021-03-17T04:12:10.501000",
+                        "stop": "2021-03-17T04:12:35.499000"} for level in ["L0", "L1_SLC", "L1_GRD", "L2_OCN", "L0"]]
+        }
+
+        # By default the operation is not split
+        assert s1boa_functions.split_completeness_operation(completeness_operation) == [completeness_operation]
+
+        os.environ["S1BOA_COMPLETENESS_OPERATIONS"] = "per_level"
+        try:
+            completeness_operations = s1boa_functions.split_completeness_operation(completeness_operation)
+        finally:
+            del os.environ["S1BOA_COMPLETENESS_OPERATIONS"]
+        # end try
+
+        assert [operation["dim_signature"]["name"] for operation in completeness_operations] == ["COMPLETENESS_NPPF_S1A_L0", "COMPLETENESS_NPPF_S1A_L1_GRD", "COMPLETENESS_NPPF_S1A_L1_SLC", "COMPLETENESS_NPPF_S1A_L2_OCN"]
+        assert [len(operation["events"]) for operation in completeness_operations] == [2, 1, 1, 1]
+        assert len([operation for operation in completeness_operations if operation["source"] != completeness_operation["source"]]) == 0
+
+    def test_get_planned_imagings_by_datatake_id(self):
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/../ingestion_nppf/tests/inputs/S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+
+        exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_nppf.ingestion_nppf", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        indexed_planned_imagings = s1boa_functions.get_planned_imagings_by_datatake_id(self.query_eboa, "S1A", "2021-03-16T00:00:00", "2021-04-06T00:00:00")
+
+        planned_imagings = self.query_eboa.get_events(gauge_names = {"filter": "PLANNED_IMAGING", "op": "=="})
+
+        assert len(indexed_planned_imagings) == len(planned_imagings)
+        for planned_imaging in planned_imagings:
+            datatake_id = [value.value for value in planned_imaging.eventTexts if value.name == "datatake_id"][0]
+            imaging_mode = [value.value for value in planned_imaging.eventTexts if value.name == "imaging_mode"][0]
+            assert indexed_planned_imagings[datatake_id] == (planned_imaging.event_uuid, imaging_mode)
+        # end for
+
+        # Window without planned imagings
+        assert s1boa_functions.get_planned_imagings_by_datatake_id(self.query_eboa, "S1A", "2021-04-06T00:00:00", "2021-04-07T00:00:00") == {}
@@ -0,0 +1,135 @@
+"""
+Automated tests for the replication of the values of the overwritten events of the S1BOA submodule
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1boa
+"""
+# Import python utilities
+import unittest
+import datetime
+
+# Import engine of the DDBB
+import eboa.engine.engine as eboa_engine
+from eboa.engine.engine import Engine
+from eboa.engine.query import Query
+
+# Import entities of the datamodel
+from eboa.datamodel.events import EventObject, EventGeometry, EventText
+
+# Import functions
+import s1boa.ingestions.functions as s1boa_functions
+
+# Import replication of values
+import s1boa.ingestions.replicate_event_values as replicate_event_values
+
+class TestReplicateEventValues(unittest.TestCase):
+    def setUp(self):
+        # Create the engine to manage the data
+        self.engine_eboa = Engine()
+        self.query_eboa = Query()
+
+        # Clear all tables before executing the test
+        self.query_eboa.clear_db()
+
+    def tearDown(self):
+        # Close connections to the DDBB
+        self.engine_eboa.close_session()
+        self.query_eboa.close_session()
+
+    def test_replicate_event_values_bulk(self):
+
+        events_per_imaging_mode = {
+            "IW": [{"start": "2021-03-17T04:10:33.066685",
+                    "stop": "2021-03-17T04:17:48.873819",
+                    "values": [{"name": "satellite",
+                                "type": "text",
+                                "value": "S1A"},
+                               {"name": "imaging_mode",
+                                "type": "text",
+                                "value": "IW"}]
+                    }],
+            "EW": [{"start": "2021-03-17T05:50:00",
+                    "stop": "2021-03-17T05:55:00",
+                    "values": [{"name": "satellite",
+                                "type": "text",
+                                "value": "S1A"},
+                               {"name": "imaging_mode",
+                                "type": "text",
+                                "value": "EW"}]
+                    }]
+        }
+
+        events_with_footprint = s1boa_functions.associate_footprints(events_per_imaging_mode, "S1A", return_polygon_format = True)
+
+        data = {"operations": [{
+            "mode": "insert",
+            "dim_signature": {"name": "dim_signature",
+                              "exec": "exec",
+                              "version": "1.0"},
+            "source": {"name": "source.xml",
+                       "reception_time": "2021-03-17T00:00:00",
+                       "generation_time": "2021-03-17T00:00:00",
+                       "validity_start": "2021-03-17T00:00:00",
+                       "validity_stop": "2021-03-18T00:00:00"},
+            "events": [{
+                "gauge": {"name": "GAUGE_NAME",
+                          "system": "GAUGE_SYSTEM",
+                          "insertion_type": "SIMPLE_UPDATE"},
+                "start": event["start"],
+                "stop": event["stop"],
+                "values": event["values"]
+            } for event in events_with_footprint]
+        }]
+        }
+        exit_status = self.engine_eboa.treat_data(data)
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        events = self.query_eboa.get_events(order_by = {"field": "start", "descending": False})
+
+        assert len(events) == 2
+
+        # Keep the first half of every event
+        replications = [(event.event_uuid, "new_" + str(event.event_uuid),
+                         {"start": event.start,
+                          "stop": event.start + (event.stop - event.start) / 2}) for event in events]
+
+        values_replicated_in_bulk = {}
+        replicate_event_values.replicate_event_values_bulk(self.query_eboa, replications, values_replicated_in_bulk)
+
+        # The bulk replication produces the same values than the replication per event
+        values_replicated_per_event = {}
+        for (from_event_uuid, to_event_uuid, to_event) in replications:
+            replicate_event_values.replicate_event_values(self.query_eboa, from_event_uuid, to_event_uuid, to_event, values_replicated_per_event)
+        # end for
+
+        assert values_replicated_in_bulk == values_replicated_per_event
+
+        for (from_event_uuid, to_event_uuid, to_event) in replications:
+            texts = [value for value in values_replicated_in_bulk[EventText] if value["event_uuid"] == to_event_uuid]
+            assert set([(value["name"], value["value"]) for value in texts]) == set([(value.name, value.value) for value in self.query_eboa.get_event_values(event_uuids = [str(from_event_uuid)]) if type(value) == EventText])
+
+            # The footprints are obtained again for the remaining window
+            footprints = [value for value in values_replicated_in_bulk[EventGeometry] if value["event_uuid"] == to_event_uuid]
+            footprint_details = [value for value in values_replicated_in_bulk[EventObject] if value["event_uuid"] == to_event_uuid]
+
+            assert len(footprints) > 0
+            assert len(footprints) == len(footprint_details)
+
+            expected_footprints = s1boa_functions.associate_footprints({
+                "IW" if to_event["start"] < datetime.datetime(2021, 3, 17, 5) else "EW": [{
+                    "start": to_event["start"].isoformat(),
+                    "stop": to_event["stop"].isoformat()
+                }]
+            }, "S1A", return_polygon_format = True)
+
+            assert [footprint["value"] for footprint in footprints] == [footprint_object["values"][0]["value"] for footprint_object in expected_footprints[0]["values"]]
+        # end for
+
+    def test_replicate_event_values_bulk_no_replications(self):
+
+        values_replicated = {}
+        replicate_event_values.replicate_event_values_bulk(self.query_eboa, [], values_replicated)
+
+        assert values_replicated == {}
@@ -1,7 +1,6 @@
 var dhus_availability_data_timeline = []
 var dhus_availability_data_timeliness = {}
 var dhus_availability_data_maps = {}
-var dhus_availability_data_timeliness_for_statistics = {}
 var dhus_availability_data_volumes = {}
 var dhus_availability_data_volumes_for_statistics = {}
 
@@ -146,7 +145,7 @@ var dhus_availability_data_volumes_for_statistics = {}
 {% set imaging_mode = "N/A" %}
 {% endif %}
 
-{% if data["metadata"]["show"]["completeness"] %}
+{% if data["metadata"]["show"]["completeness"] and "timeline" in widgets %}
 dhus_availability_data_timeline.push({
     "id": "{{ completeness.event_uuid }}",
     "group": "{{ satellite }}",
@@ -156,8 +155,10 @@ dhus_availability_data_timeline.push({
     "tooltip": create_dhus_availability_tooltip("{{ level }}", "{{ satellite }}", "{{ orbit_for_tooltip }}", "{{ completeness.start }}", "{{ completeness.stop }}", "{{ (completeness.duration / 60)|round(3) }}", "{{ imaging_mode }}", "{{ status_for_tooltip }}", "{{ dhus_product_for_tooltip }}", "{{ delta_to_dhus_for_tooltip }}", "{{ size_for_tooltip }}", "{{ datatake_id }}", "{{ planned_imaging_start }}", "{{ planned_imaging_stop }}", "{{ planned_imaging_duration }}"),
     "className": "{{ class_name }}"
 })
+{% endif %}
 
 {# Maps #}
+{% if data["metadata"]["show"]["completeness"] and "maps" in widgets %}
 if (!("{{ level }}" in dhus_availability_data_maps)){
     dhus_availability_data_maps["{{ level }}"] = []
 }
@@ -175,7 +176,7 @@ dhus_availability_data_maps["{{ level }}"].push({
 })
 {% endif %}
 
-{% if data["metadata"]["show"]["timeliness"] %}
+{% if data["metadata"]["show"]["timeliness"] and "timeliness" in widgets %}
 {% if status != "MISSING" %}
 if (!("{{ level }}" in dhus_availability_data_timeliness)){
     dhus_availability_data_timeliness["{{ level }}"] = []
@@ -188,14 +189,10 @@ dhus_availability_data_timeliness["{{ level }}"].push({
     "tooltip": create_dhus_availability_tooltip("{{ level }}", "{{ satellite }}", "{{ orbit_for_tooltip }}", "{{ completeness.start }}", "{{ completeness.stop }}", "{{ (completeness.duration / 60)|round(3) }}", "{{ imaging_mode }}", "{{ status_for_tooltip }}", "{{ dhus_product_for_tooltip }}", "{{ delta_to_dhus_for_tooltip }}", "{{ size_for_tooltip }}", "{{ datatake_id }}", "{{ planned_imaging_start }}", "{{ planned_imaging_stop }}", "{{ planned_imaging_duration }}"),
     "className": "{{ class_name }}"
 })
-if (!("{{ level }}" in dhus_availability_data_timeliness_for_statistics)){
-    dhus_availability_data_timeliness_for_statistics["{{ level }}"] = []
-}
-dhus_availability_data_timeliness_for_statistics["{{ level }}"].push({{ delta_to_dhus }})
 {% endif %}
 {% endif %}
 
-{% if data["metadata"]["show"]["volumes"] %}
+{% if data["metadata"]["show"]["volumes"] and "volumes" in widgets %}
 {% if status != "MISSING" %}
 if (!("{{ level }}" in dhus_availability_data_volumes_for_statistics)){
     dhus_availability_data_volumes_for_statistics["{{ level }}"] = []
@@ -102,3 +102,15 @@ def click(element):
             # end if
         # end try
     # end while
+
+def expand_section(driver, wait, id):
+
+    # The section is requested the first time it is expanded
+    click(driver.find_element_by_css_selector("a[href='#" + id + "']"))
+    wait.until(lambda driver: driver.find_element_by_id(id).get_attribute("data-loaded") == "true")
+
+def expand_sections(driver, wait):
+
+    for section in driver.find_elements_by_css_selector("[data-dhus-availability-section]"):
+        expand_section(driver, wait, section.get_attribute("id"))
+    # end for
@@ -0,0 +1,121 @@
+"""
+Benchmark of the pagination of the DHUS availability view
+
+A synthetic dataset of completeness events (four levels per planned
+imaging) is inserted and the same pages are obtained by offset (previous
+pagination) and by cursor (keyset pagination), both ordered by start and
+UUID of the events. The DDBB is cleared, so execute it only against a
+DDBB for testing.
+
+Usage: python3 benchmark_dhus_availability_pagination.py [-n 200000] [-l 20] [-p 1 10 100 1000 5000]
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1vboa
+"""
+# Import python utilities
+import argparse
+import datetime
+import time
+
+# Import engine of the DDBB
+from eboa.engine.engine import Engine
+from eboa.engine.query import Query
+
+# Import datamodel
+from eboa.datamodel.events import Event
+
+# Import view
+from s1vboa.views.dhus_availability import dhus_availability
+
+def build_dataset(number_of_events):
+    """
+    Method to insert the synthetic completeness events
+    :param number_of_events: number of completeness events to insert
+    :type number_of_events: int
+    """
+    validity_start = datetime.datetime(2021, 3, 1)
+    events = []
+    for i in range(number_of_events // len(dhus_availability.dhus_product_completeness_gauge_names)):
+        start = validity_start + datetime.timedelta(seconds = i * 30)
+        for gauge_name in dhus_availability.dhus_product_completeness_gauge_names.values():
+            events.append({
+                "gauge": {"insertion_type": "SIMPLE_UPDATE", "name": gauge_name, "system": "S1A"},
+                "start": start.isoformat(),
+                "stop": (start + datetime.timedelta(seconds = 25)).isoformat(),
+                "values": [{"name": "satellite", "type": "text", "value": "S1A"},
+                           {"name": "status", "type": "text", "value": "MISSING"}]
+            })
+        # end for
+    # end for
+
+    engine = Engine()
+    engine.treat_data({"operations": [{
+        "mode": "insert",
+        "dim_signature": {"name": "COMPLETENESS_NPPF_S1A", "exec": "benchmark_dhus_availability_pagination.py", "version": "1.0"},
+        "source": {"name": "BENCHMARK_DHUS_AVAILABILITY_PAGINATION",
+                   "reception_time": validity_start.isoformat(),
+                   "generation_time": validity_start.isoformat(),
+                   "validity_start": validity_start.isoformat(),
+                   "validity_stop": events[-1]["stop"]},
+        "events": events
+    }]})
+    engine.close_session()
+
+    return (validity_start.isoformat(), events[-1]["stop"])
+
+def main():
+    args_parser = argparse.ArgumentParser(description="Benchmark of the pagination of the DHUS availability view")
+    args_parser.add_argument("-n", "--number_of_events", type=int, default=200000,
+                             help="Number of completeness events of the synthetic dataset")
+    args_parser.add_argument("-l", "--limit", type=int, default=20,
+                             help="Number of events per page")
+    args_parser.add_argument("-p", "--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 5000],
+                             help="Pages to obtain")
+    args = args_parser.parse_args()
+
+    query = Query()
+    query.clear_db()
+    (window_start, window_stop) = build_dataset(args.number_of_events)
+
+    start_filter = {"date": window_stop, "op": "<="}
+    stop_filter = {"date": window_start, "op": ">="}
+    gauge_names = list(dhus_availability.dhus_product_completeness_gauge_names.values())
+
+    print("{:>10} {:>12} {:>12}".format("page", "offset (s)", "keyset (s)"))
+    for page in args.pages:
+        offset = (page - 1) * args.limit
+
+        # Cursor of the page (last event of the previous page)
+        cursor = None
+        if offset > 0:
+            (last_start, last_event_uuid) = dhus_availability.get_dhus_product_completeness_page(query, start_filter, stop_filter, "S1_", gauge_names, offset)[-1]
+            cursor = [last_start.isoformat(), str(last_event_uuid)]
+        # end if
+
+        # Both paginations order by (start, event_uuid) so they obtain the same events
+        start = time.perf_counter()
+        offset_event_uuids = [str(event_uuid) for (_, event_uuid) in dhus_availability.get_dhus_product_completeness_events_query(query, start_filter, stop_filter, "S1_", gauge_names) \
+                              .with_entities(Event.start, Event.event_uuid) \
+                              .order_by(Event.start.desc(), Event.event_uuid.desc()) \
+                              .offset(offset).limit(args.limit).all()]
+        query.get_events(event_uuids = {"filter": offset_event_uuids, "op": "in"},
+                         order_by = {"field": "start", "descending": True})
+        offset_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        event_uuids = [str(event_uuid) for (_, event_uuid) in dhus_availability.get_dhus_product_completeness_page(query, start_filter, stop_filter, "S1_", gauge_names, args.limit, cursor)]
+        query.get_events(event_uuids = {"filter": event_uuids, "op": "in"},
+                         order_by = {"field": "start", "descending": True})
+        keyset_duration = time.perf_counter() - start
+
+        assert event_uuids == offset_event_uuids
+
+        print("{:>10} {:>12.3f} {:>12.3f}".format(page, offset_duration, keyset_duration))
+    # end for
+
+    query.clear_db()
+    query.close_session()
+
+if __name__ == "__main__":
+    main()
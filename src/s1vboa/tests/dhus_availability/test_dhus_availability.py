@@ -30,6 +30,9 @@ import eboa.triggering.eboa_triggering as triggering
 from eboa.engine.engine import Engine
 from eboa.engine.query import Query
 
+# Import view
+import s1vboa.views.dhus_availability.dhus_availability as dhus_availability
+
 class TestDhusAvailabilityView(unittest.TestCase):
     options = Options()
     options.add_argument('--headless')
@@ -72,6 +75,187 @@ class TestDhusAvailabilityView(unittest.TestCase):
 
         assert table_details_no_data
 
+    def test_dhus_availability_sliding_no_data(self):
+
+        wait = WebDriverWait(self.driver,5)
+
+        self.driver.get("http://localhost:5000/views/sliding-dhus-availability")
+
+        table_details_no_data = wait.until(EC.visibility_of_element_located((By.ID,"dhus-availability-no-planned-imaging")))
+
+        assert table_details_no_data
+
+        # The sections and the refresh of the sliding view are set up also without data
+        assert self.driver.execute_script('return typeof dhus_availability_filters;') == "object"
+        assert self.driver.execute_script('return typeof create_dhus_availability_tooltip;') == "function"
+        assert 'vboa.update_view(parameters, repeat_cycle, "/views/sliding-dhus-availability-parameters")' in self.driver.page_source
+
+    def test_dhus_availability_requested_page(self):
+
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_nppf.ingestion_nppf", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        start_filter = {"date": "2021-03-17T23:59:59", "op": "<="}
+        stop_filter = {"date": "2021-03-16T00:00:00", "op": ">="}
+        gauge_names = list(dhus_availability.dhus_product_completeness_gauge_names.values())
+        all_events = dhus_availability.get_dhus_product_completeness_page(dhus_availability.query, start_filter, stop_filter, "S1_", gauge_names, 1000)
+
+        assert len(all_events) > 10
+
+        # The pages obtained posting back the cursor of the next page cover all the events once and in order
+        filters = {"limit": ["10"]}
+        pages = []
+        while True:
+            (page, next_cursor) = dhus_availability.get_requested_page(start_filter, stop_filter, "S1_", gauge_names, filters)
+            pages.append(page)
+            if next_cursor == None:
+                break
+            # end if
+
+            assert next_cursor == [page[-1][0].isoformat(), str(page[-1][1])]
+
+            filters["cursor"] = next_cursor
+        # end while
+
+        assert len(pages) == (len(all_events) + 9) // 10
+        assert [event for page in pages for event in page] == all_events
+
+    def test_dhus_availability_pagination(self):
+
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_nppf.ingestion_nppf", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        wait = WebDriverWait(self.driver,5)
+
+        self.driver.get("http://localhost:5000/views/dhus-availability")
+
+        self.driver.execute_script('document.getElementById("dhus-availability-limit").value = "10";')
+
+        functions.query(self.driver, wait, "S1_", start = "2021-03-16T00:00:00", stop = "2021-03-17T23:59:59")
+
+        # First page
+        page = wait.until(EC.visibility_of_element_located((By.ID,"dhus-availability-pagination-page")))
+
+        assert page.text == "Page 1"
+        assert "disabled" in self.driver.find_element_by_id("dhus-availability-pagination-previous").find_element_by_xpath("..").get_attribute("class")
+        assert "disabled" not in self.driver.find_element_by_id("dhus-availability-pagination-next").find_element_by_xpath("..").get_attribute("class")
+
+        # Next page
+        functions.click(self.driver.find_element_by_id("dhus-availability-pagination-next"))
+        wait.until(EC.text_to_be_present_in_element((By.ID,"dhus-availability-pagination-page"), "Page 2"))
+
+        assert "disabled" not in self.driver.find_element_by_id("dhus-availability-pagination-previous").find_element_by_xpath("..").get_attribute("class")
+
+        # Previous page
+        functions.click(self.driver.find_element_by_id("dhus-availability-pagination-previous"))
+        wait.until(EC.text_to_be_present_in_element((By.ID,"dhus-availability-pagination-page"), "Page 1"))
+
+        assert "disabled" in self.driver.find_element_by_id("dhus-availability-pagination-previous").find_element_by_xpath("..").get_attribute("class")
+
+    def test_dhus_availability_sections(self):
+
+        filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+        file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+        exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_nppf.ingestion_nppf", file_path, "2018-01-01T00:00:00")
+
+        assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+        wait = WebDriverWait(self.driver,5)
+
+        self.driver.get("http://localhost:5000/views/dhus-availability")
+
+        functions.query(self.driver, wait, "S1_", start = "2021-03-16T00:00:00", stop = "2021-03-17T23:59:59")
+
+        # The sections are not loaded until expanded
+        tables_section = self.driver.find_element_by_id("dhus-availability-tables-section")
+
+        assert tables_section.get_attribute("data-loaded") == None
+        assert len(self.driver.find_elements_by_id("dhus-completeness-list-table-MISSING")) == 0
+
+        # Request the sections with the filters of the view
+        request_section = 'var callback = arguments[arguments.length - 1]; fetch("/views/dhus-availability-section/" + arguments[0], {method: "POST", headers: {"Content-Type": "application/json"}, body: JSON.stringify(dhus_availability_filters)}).then(function(response){ response.text().then(function(html){ callback([response.status, html]); }); });'
+
+        (status, html) = self.driver.execute_async_script(request_section, "tables")
+
+        assert status == 200
+        assert "dhus-completeness-list-table-MISSING" in html
+
+        (status, html) = self.driver.execute_async_script(request_section, "not-a-section")
+
+        assert status == 404
+        assert "The section not-a-section does not exist in the DHUS availability view" in html
+
+        # A failed request shows an error and the section is requested again when expanded again
+        self.driver.execute_script('var dhus_availability_fetch = window.fetch; window.fetch = function(){ window.fetch = dhus_availability_fetch; return Promise.reject(new Error("Network error")); };')
+
+        functions.click(self.driver.find_element_by_css_selector("a[href='#dhus-availability-tables-section']"))
+        error = wait.until(EC.visibility_of_element_located((By.CLASS_NAME,"dhus-availability-section-error")))
+
+        assert "Network error" in error.text
+        assert tables_section.get_attribute("data-loaded") == None
+
+        functions.click(self.driver.find_element_by_css_selector("a[href='#dhus-availability-tables-section']"))
+        wait.until(EC.invisibility_of_element_located((By.ID,"dhus-availability-tables-section")))
+
+        functions.expand_section(self.driver, wait, "dhus-availability-tables-section")
+
+        assert len(self.driver.find_elements_by_class_name("dhus-availability-section-error")) == 0
+        assert self.driver.find_element_by_id("dhus-completeness-list-table-MISSING")
+
+    def test_dhus_availability_aggregates_coalesced_completeness(self):
+
+        start_filter = {"date": "2021-03-17T23:59:59", "op": "<="}
+        stop_filter = {"date": "2021-03-16T00:00:00", "op": ">="}
+        gauge_names = list(dhus_availability.dhus_product_completeness_gauge_names.values())
+
+        # The timeliness and volumes take every product of the coalesced completeness events
+        aggregates = []
+        for coalesce in ["false", "true"]:
+            self.query_eboa.clear_db()
+
+            filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
+            file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+            exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_nppf.ingestion_nppf", file_path, "2018-01-01T00:00:00")
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+            filename = "DEC_OPER_OPDHUS_S1A_AUIP_20210419T135405_V20210316T000000_20210319T000000_2161_2150_SHORTENED.xml"
+            file_path = os.path.dirname(os.path.abspath(__file__)) + "/inputs/" + filename
+
+            os.environ["S1BOA_DHUS_COMPLETENESS_COALESCE"] = coalesce
+            try:
+                exit_status = ingestion.command_process_file("s1boa.ingestions.ingestion_dhus_products.ingestion_dhus_products", file_path, "2018-01-01T00:00:00")
+            finally:
+                del os.environ["S1BOA_DHUS_COMPLETENESS_COALESCE"]
+            # end try
+
+            assert len([item for item in exit_status if item["status"] != eboa_engine.exit_codes["OK"]["status"]]) == 0
+
+            aggregates.append(dhus_availability.query_dhus_availability_aggregates(dhus_availability.query, start_filter, stop_filter, "S1_", gauge_names))
+        # end for
+
+        (aggregates_per_product, aggregates_per_segment) = aggregates
+
+        assert len(aggregates_per_product["volumes_per_level"]) > 0
+
+        for aggregate in ["timeliness", "timeliness_per_level", "volumes", "volumes_per_level"]:
+            assert [(entry["level"], entry["number_of_products"]) for entry in aggregates_per_segment[aggregate]] == [(entry["level"], entry["number_of_products"]) for entry in aggregates_per_product[aggregate]]
+        # end for
+
+        for (entry_per_segment, entry_per_product) in zip(aggregates_per_segment["volumes_per_level"], aggregates_per_product["volumes_per_level"]):
+            assert abs(entry_per_segment["size"] - entry_per_product["size"]) < 1e-9
+        # end for
+
     def test_dhus_availability_only_plan(self):
 
         filename = "S1A_OPER_MPL__NPPF__20210316T160000_20210405T180000_0001_SHORTENED.EOF"
@@ -87,6 +271,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
 
         functions.query(self.driver, wait, "S1_", start = "2021-03-16T00:00:00	", stop = "2021-03-17T23:59:59")
 
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
+
         # Summary data pie L0
         data_pie_l0 = [0, 11.529, 0]
 
@@ -548,6 +735,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
 
         functions.query(self.driver, wait, "S1_", start = "2021-03-17T00:00:00", stop = "2021-03-17T23:59:59")
 
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
+
         # Check summary ununexpected duration L0
         summary_unexpected_l0 = wait.until(EC.visibility_of_element_located((By.ID,"summary-dhus-completeness-unexpected-duration-L0")))
 
@@ -1583,6 +1773,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
 
         functions.query(self.driver, wait, "S1_", start = "2021-03-16T00:00:00	", stop = "2021-03-17T23:59:59")
 
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
+
         # Check summary expected duration L0
         summary_expected_l0 = wait.until(EC.visibility_of_element_located((By.ID,"summary-dhus-completeness-available-duration-L0")))
 
@@ -2595,6 +2788,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
         ### Level L0
         functions.query(self.driver, wait, "S1_", "L0", start = "2021-03-16T00:00:00", stop = "2021-03-17T23:59:59")
 
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
+
         # Check summary expected duration L0
         summary_expected_l0 = wait.until(EC.visibility_of_element_located((By.ID,"summary-dhus-completeness-available-duration-L0")))
 
@@ -2903,6 +3099,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
         ### Level L1_SLC
         functions.query(self.driver, wait, "S1_", "L1_SLC", start = "2021-03-16T00:00:00", stop = "2021-03-17T23:59:59")
 
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
+
         # Check summary expected duration L1_SLC
         summary_expected_l1_slc = wait.until(EC.visibility_of_element_located((By.ID,"summary-dhus-completeness-available-duration-L1_SLC")))
 
@@ -3201,6 +3400,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
 
         ### Level L1_GRD
         functions.query(self.driver, wait, "S1_", "L1_GRD", start = "2021-03-16T00:00:00", stop = "2021-03-17T23:59:59")
+
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
         
         # Check summary expected duration L1_GRD
         summary_expected_l1_grd = wait.until(EC.visibility_of_element_located((By.ID,"summary-dhus-completeness-available-duration-L1_GRD")))
@@ -3501,6 +3703,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
         ### Level L2_OCN
         functions.query(self.driver, wait, "S1_", "L2_OCN", start = "2021-03-16T00:00:00", stop = "2021-03-17T23:59:59")
 
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
+
         # Check summary expected duration L2_OCN
         summary_expected_l2_ocn = wait.until(EC.visibility_of_element_located((By.ID,"summary-dhus-completeness-available-duration-L2_OCN")))
 
@@ -3813,6 +4018,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
         ### Level L0
         functions.query(self.driver, wait, "S1_", "L0", start = "2021-03-16T00:00:00", stop = "2021-03-17T23:59:59")
 
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
+
         # Summary data pie L0
         data_pie_l0 = [0, 11.529, 0]
 
@@ -4056,6 +4264,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
         ### Level L1_SLC
         functions.query(self.driver, wait, "S1_", "L1_SLC", start = "2021-03-16T00:00:00", stop = "2021-03-17T23:59:59")
 
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
+
         # Summary data pie L1_SLC
         data_pie_l1_slc = [0, 22.425, 0]
 
@@ -4296,6 +4507,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
 
         ### Level L1_GRD
         functions.query(self.driver, wait, "S1_", "L1_GRD", start = "2021-03-16T00:00:00", stop = "2021-03-17T23:59:59")
+
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
         
         # Summary data pie L1_GRD
         data_pie_l1_grd = [0, 11.529, 0]
@@ -4548,6 +4762,9 @@ class TestDhusAvailabilityView(unittest.TestCase):
         ### Level L2_OCN
         functions.query(self.driver, wait, "S1_", "L2_OCN", start = "2021-03-16T00:00:00", stop = "2021-03-17T23:59:59")
 
+        # Expand the sections requested by the view
+        functions.expand_sections(self.driver, wait)
+
         # Summary data pie L2_OCN
         data_pie_l2_ocn = [0, 27.091, 0]
 
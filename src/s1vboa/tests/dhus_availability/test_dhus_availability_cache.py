@@ -0,0 +1,94 @@
+"""
+Automated tests for the cache of the DHUS availability view
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1vboa
+"""
+import time
+import datetime
+import unittest
+
+from s1vboa.views.dhus_availability.dhus_availability_cache import DhusAvailabilityCache
+import s1vboa.views.dhus_availability.dhus_availability as dhus_availability
+
+class TestDhusAvailabilityCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+
+        cache = DhusAvailabilityCache(60, 2)
+        cache.put("window_1", {"planned_imaging": 1})
+        cache.put("window_2", {"planned_imaging": 2})
+
+        # Access the first window to make the second the least recently used
+        assert cache.get("window_1") == {"planned_imaging": 1}
+
+        cache.put("window_3", {"planned_imaging": 3})
+
+        assert cache.get("window_2") == None
+        assert cache.get("window_1") == {"planned_imaging": 1}
+        assert cache.get("window_3") == {"planned_imaging": 3}
+
+    def test_ttl_expiration(self):
+
+        cache = DhusAvailabilityCache(0.1, 2)
+        cache.put("window_1", {"planned_imaging": 1})
+
+        assert cache.get("window_1") == {"planned_imaging": 1}
+
+        time.sleep(0.2)
+
+        assert cache.get("window_1") == None
+        assert cache.get_statistics()["entries"] == 0
+
+    def test_invalidation_by_ingestion(self):
+
+        cache = DhusAvailabilityCache(60, 2)
+        cache.validate((1, "2021-03-16T00:00:00"))
+        cache.put("window_1", {"planned_imaging": 1})
+
+        # Same ingestions
+        cache.validate((1, "2021-03-16T00:00:00"))
+
+        assert cache.get("window_1") == {"planned_imaging": 1}
+
+        # New ingestion
+        cache.validate((2, "2021-03-17T00:00:00"))
+
+        assert cache.get("window_1") == None
+
+        cache.record(True, 0.001)
+        cache.record(False, 0.5)
+        cache.record(False, 1.5)
+
+        statistics = cache.get_statistics()
+
+        assert statistics["invalidations"] == 1
+        assert statistics["hits"] == 1
+        assert statistics["misses"] == 2
+        assert abs(statistics["hit_ratio"] - 1 / 3) < 1e-9
+        assert statistics["mean_miss_latency"] == 1.0
+
+    def test_window_key_truncated_to_ttl(self):
+
+        # The current time is not truncated
+        before = datetime.datetime.now()
+        now = dhus_availability.get_now()
+
+        assert now >= before
+
+        # The windows relative to now inside the same period of the time to live share the key
+        ttl = dhus_availability.cache.ttl
+        window_start = datetime.datetime.fromtimestamp(now.timestamp() // ttl * ttl)
+        window_key = dhus_availability.get_window_key({"date": window_start.isoformat(), "op": "<="}, None, relative_to_now = True)
+
+        assert window_key == dhus_availability.get_window_key({"date": (window_start + datetime.timedelta(seconds = ttl / 2)).isoformat(), "op": "<="}, None, relative_to_now = True)
+        assert window_key != dhus_availability.get_window_key({"date": (window_start + datetime.timedelta(seconds = ttl)).isoformat(), "op": "<="}, None, relative_to_now = True)
+
+        # The windows with explicit dates are indexed by their exact dates
+        start_filter = {"date": window_start.isoformat(), "op": "<="}
+        stop_filter = {"date": (window_start - datetime.timedelta(days = 1)).isoformat(), "op": ">="}
+        explicit_window_key = dhus_availability.get_window_key(start_filter, stop_filter)
+
+        assert explicit_window_key == ((start_filter["date"], "<="), (stop_filter["date"], ">="))
+        assert explicit_window_key != dhus_availability.get_window_key({"date": (window_start + datetime.timedelta(seconds = ttl / 2)).isoformat(), "op": "<="}, stop_filter)
@@ -8,6 +8,8 @@ module s1vboa
 # Import python utilities
 import sys
 import json
+import copy
+import time
 import datetime
 from dateutil import parser
 
@@ -21,13 +23,148 @@ from eboa.engine.query import Query
 import eboa.engine.engine as eboa_engine
 from eboa.engine.engine import Engine
 from eboa.engine import export as eboa_export
+from eboa.datamodel.sources import Source
+from eboa.datamodel.dim_signatures import DimSignature
+from eboa.datamodel.events import Event
+
+# Import SQLAlchemy utilities
+from sqlalchemy import func, or_, tuple_
 
 # Import views functions
 from svboa.views import functions as svboa_functions
 
+# Import s1boa configuration
+from s1boa.ingestions.functions import get_configuration_value
+
+# Import cache of the queries
+from s1vboa.views.dhus_availability.dhus_availability_cache import DhusAvailabilityCache
+
+# Import aggregates of the view
+from s1vboa.views.dhus_availability.dhus_availability_aggregates import dhus_product_completeness_gauge_names, get_dhus_product_completeness_events_query, query_dhus_availability_aggregates
+
 bp = Blueprint("dhus-availability", __name__, url_prefix="/views")
 query = Query()
 
+# Cache of the results of the queries (DHUS_AVAILABILITY_CACHE_MAX_ENTRIES = 0 disables it)
+cache = DhusAvailabilityCache(float(get_configuration_value("DHUS_AVAILABILITY_CACHE_TTL", 60)),
+                              int(get_configuration_value("DHUS_AVAILABILITY_CACHE_MAX_ENTRIES", 64)))
+
+# DIM signatures of the ingestions feeding the view
+dim_signatures_feeding_view = ["NPPF\\_%", "COMPLETENESS\\_NPPF\\_%", "DHUS\\_PRODUCTS\\_%"]
+
+# Sections of the view requested when expanded
+dhus_availability_sections = ["timeliness", "volumes", "maps", "timeline", "tables"]
+
+def get_dhus_product_completeness_levels(levels):
+    """
+    Method to obtain the levels selected in the view
+    :param levels: level selected (ALL for all the levels)
+    :type levels: str
+
+    :return: selected levels
+    :rtype: list of str
+    """
+    if levels == "ALL":
+        return list(dhus_product_completeness_gauge_names.keys())
+    # end if
+
+    return [level for level in dhus_product_completeness_gauge_names if level == levels]
+
+def is_keyset_pagination(filters):
+    """
+    Method to check if the pages are obtained with a cursor (keyset pagination).
+    The pagination by offset is kept for the requests posting an offset
+    :param filters: filters of the view
+    :type filters: dict
+
+    :return: True if the limit is defined and no offset is requested, False otherwise
+    :rtype: bool
+    """
+    return filters != None and "limit" in filters and filters["limit"][0] != "" and \
+        ("offset" not in filters or filters["offset"][0] == "")
+
+def get_dhus_product_completeness_page(query, start_filter, stop_filter, mission, gauge_names, limit, cursor = None):
+    """
+    Method to obtain a page of completeness events ordered by start and UUID descending.
+    The page starts after the cursor using the index on the start of the events,
+    so the cost of every page is the same as the cost of the first one
+    :param query: Query instance
+    :type query: Query
+    :param start_filter: filter on the start of the events
+    :type start_filter: dict
+    :param stop_filter: filter on the stop of the events
+    :type stop_filter: dict
+    :param mission: pattern of the satellite of the events
+    :type mission: str
+    :param gauge_names: names of the gauges of the completeness events
+    :type gauge_names: list of str
+    :param limit: number of events of the page
+    :type limit: int
+    :param cursor: start and UUID of the last event of the previous page (None for the first page)
+    :type cursor: list
+
+    :return: tuples (start, event_uuid) of the events of the page
+    :rtype: list
+    """
+    page_query = get_dhus_product_completeness_events_query(query, start_filter, stop_filter, mission, gauge_names).with_entities(Event.start, Event.event_uuid)
+    if cursor:
+        page_query = page_query.filter(tuple_(Event.start, Event.event_uuid) < (parser.parse(cursor[0]), cursor[1]))
+    # end if
+
+    return page_query.order_by(Event.start.desc(), Event.event_uuid.desc()).limit(limit).all()
+
+def get_requested_page(start_filter, stop_filter, mission, gauge_names, filters):
+    """
+    Method to obtain the page of completeness events requested by the cursor of the filters
+    :param start_filter: filter on the start of the events
+    :type start_filter: dict
+    :param stop_filter: filter on the stop of the events
+    :type stop_filter: dict
+    :param mission: pattern of the satellite of the events
+    :type mission: str
+    :param gauge_names: names of the gauges of the completeness events
+    :type gauge_names: list of str
+    :param filters: filters of the view with the limit and the cursor
+    :type filters: dict
+
+    :return: tuples (start, event_uuid) of the events of the page and cursor of the next page (None if it is the last one)
+    :rtype: tuple
+    """
+    limit = int(filters["limit"][0])
+    cursor = None
+    if "cursor" in filters and len(filters["cursor"]) == 2:
+        cursor = filters["cursor"]
+    # end if
+    page = get_dhus_product_completeness_page(query, start_filter, stop_filter, mission, gauge_names, limit, cursor)
+
+    next_cursor = None
+    if len(page) == limit:
+        (last_start, last_event_uuid) = page[-1]
+        next_cursor = [last_start.isoformat(), str(last_event_uuid)]
+    # end if
+
+    return (page, next_cursor)
+
+def get_now():
+    """
+    Method to obtain the current time used to build the windows relative to now
+    :return: current time
+    :rtype: datetime
+    """
+    return datetime.datetime.now()
+
+def get_ingestion_marker():
+    """
+    Method to obtain the marker of the ingestions feeding the view.
+    The marker changes when a source of the NPPF, completeness of the NPPF
+    or DHUS products is inserted or finishes its ingestion
+    :return: number of sources and last ingestion time
+    :rtype: tuple
+    """
+    return tuple(query.session.query(func.count(Source.source_uuid), func.max(Source.ingestion_time)) \
+                              .join(DimSignature, Source.dim_signature_uuid == DimSignature.dim_signature_uuid) \
+                              .filter(or_(*[DimSignature.dim_signature.like(dim_signature) for dim_signature in dim_signatures_feeding_view])).one())
+
 @bp.route("/dhus-availability", methods=["GET", "POST"])
 def show_dhus_availability():
     """
@@ -46,11 +183,11 @@ def show_dhus_availability():
 
     # Initialize reporting period (now - 1 days, now)
     start_filter = {
-        "date": (datetime.datetime.now()).isoformat(),
+        "date": (get_now()).isoformat(),
         "op": "<="
     }
     stop_filter = {
-        "date": (datetime.datetime.now() - datetime.timedelta(days=1)).isoformat(),
+        "date": (get_now() - datetime.timedelta(days=1)).isoformat(),
         "op": ">="
     }
     mission = "S1_"
@@ -59,6 +196,9 @@ def show_dhus_availability():
     window_size = 1
     start_filter_calculated, stop_filter_calculated = svboa_functions.get_start_stop_filters(query, current_app, request, window_size, mission, filters)
 
+    # The default reporting period is relative to now
+    relative_to_now = start_filter_calculated == None and stop_filter_calculated == None
+
     if start_filter_calculated != None:
         start_filter = start_filter_calculated
     # end if
@@ -84,7 +224,53 @@ def show_dhus_availability():
     filters["levels"] = levels
     filters["view_content"] = [view_content]
     
-    return query_dhus_availability_and_render(start_filter, stop_filter, mission, levels, filters = filters, view_content = view_content)
+    return query_dhus_availability_and_render(start_filter, stop_filter, mission, levels, filters = filters, view_content = view_content, relative_to_now = relative_to_now)
+
+@bp.route("/dhus-availability-cache-statistics")
+def show_dhus_availability_cache_statistics():
+    """
+    Statistics of the cache of the DHUS availability view (hit ratio, latencies, invalidations and entries).
+    """
+    current_app.logger.debug("DHUS availability cache statistics")
+
+    return jsonify(cache.get_statistics())
+
+@bp.route("/dhus-availability-aggregates", methods=["GET"])
+def show_dhus_availability_aggregates():
+    """
+    Aggregates of the DHUS availability for the Sentinel-1 mission in JSON: durations of the completeness,
+    timeliness and volumes per level and satellite and statistics of the timeliness and volumes per level. Parameters: start, stop, mission and levels (by default
+    the last day, S1_ and ALL).
+    """
+    current_app.logger.debug("DHUS availability aggregates")
+
+    now = get_now()
+    reporting_start = request.args.get("start", (now - datetime.timedelta(days=1)).isoformat())
+    reporting_stop = request.args.get("stop", now.isoformat())
+    mission = request.args.get("mission", "S1_")
+    levels = request.args.get("levels", "ALL")
+
+    start_filter = {
+        "date": reporting_stop,
+        "op": "<="
+    }
+    stop_filter = {
+        "date": reporting_start,
+        "op": ">="
+    }
+
+    # The default reporting period is relative to now
+    relative_to_now = not "start" in request.args and not "stop" in request.args
+
+    aggregates = get_dhus_availability_aggregates(start_filter, stop_filter, mission, levels, relative_to_now = relative_to_now)
+    aggregates["metadata"] = {
+        "reporting_start": reporting_start,
+        "reporting_stop": reporting_stop,
+        "mission": mission,
+        "levels": levels
+    }
+
+    return jsonify(aggregates)
 
 @bp.route("/dhus-availability-by-datatake/<string:planned_imaging_uuid>")
 def show_specific_datatake(planned_imaging_uuid):
@@ -159,11 +345,11 @@ def show_sliding_dhus_availability_parameters():
 
 
     start_filter = {
-        "date": (datetime.datetime.now() - datetime.timedelta(days=window_delay)).isoformat(),
+        "date": (get_now() - datetime.timedelta(days=window_delay)).isoformat(),
         "op": "<="
     }
     stop_filter = {
-        "date": (datetime.datetime.now() - datetime.timedelta(days=(window_delay+window_size))).isoformat(),
+        "date": (get_now() - datetime.timedelta(days=(window_delay+window_size))).isoformat(),
         "op": ">="
     }
 
@@ -176,7 +362,7 @@ def show_sliding_dhus_availability_parameters():
         "view_content": view_content
     }
 
-    return query_dhus_availability_and_render(start_filter, stop_filter, mission, levels, sliding_window, view_content = view_content)
+    return query_dhus_availability_and_render(start_filter, stop_filter, mission, levels, sliding_window, view_content = view_content, relative_to_now = True)
 
 @bp.route("/sliding-dhus-availability", methods=["GET", "POST"])
 def show_sliding_dhus_availability():
@@ -222,11 +408,11 @@ def show_sliding_dhus_availability():
     # end if
 
     start_filter = {
-        "date": (datetime.datetime.now() - datetime.timedelta(days=window_delay)).isoformat(),
+        "date": (get_now() - datetime.timedelta(days=window_delay)).isoformat(),
         "op": "<="
     }
     stop_filter = {
-        "date": (datetime.datetime.now() - datetime.timedelta(days=(window_delay+window_size))).isoformat(),
+        "date": (get_now() - datetime.timedelta(days=(window_delay+window_size))).isoformat(),
         "op": ">="
     }
 
@@ -239,33 +425,23 @@ def show_sliding_dhus_availability():
         "view_content": view_content
     }
 
-    return query_dhus_availability_and_render(start_filter, stop_filter, mission, levels, sliding_window, view_content = view_content)
-
-def query_dhus_availability_and_render(start_filter, stop_filter, mission, levels, sliding_window = None, filters = None, planned_imaging_uuid = None, view_content = None):
+    return query_dhus_availability_and_render(start_filter, stop_filter, mission, levels, sliding_window, view_content = view_content, relative_to_now = True)
 
-    data = query_dhus_availability_structure(start_filter, stop_filter, mission, levels, filters, planned_imaging_uuid, view_content)
-
-    # orbpre_events = svboa_functions.query_orbpre_events(query, current_app, start_filter, stop_filter, mission)
-
-    #####
-    # Metadata
-    #####
-    data["metadata"] = {}
-    metadata = data["metadata"]
+def get_metadata(start_filter, stop_filter, levels, filters, planned_imaging_uuid = None, view_content = None):
+    """
+    Method to obtain the metadata of the view
+    """
+    metadata = {}
     metadata["levels"] = levels
     metadata["reporting_start"] = stop_filter["date"]
     metadata["reporting_stop"] = start_filter["date"]
 
-    # Save data and obtain path to json
-    
-    route = "views/dhus_availability/dhus_availability.html"
     if planned_imaging_uuid != None:
         metadata["view_title"] = "Specific datatake availability in DHUS"
-        metadata["pagination"] = False
     else:
         metadata["view_title"] = "Data Availability in DHUS"
-        metadata["pagination"] = True
     # end if
+    metadata["pagination"] = planned_imaging_uuid == None and is_keyset_pagination(filters)
 
     if view_content == "completeness":
         metadata["show"] = {
@@ -293,10 +469,196 @@ def query_dhus_availability_and_render(start_filter, stop_filter, mission, level
         }        
     # end if
     metadata["view_content"] = view_content
-    
-    return render_template(route, data=data, sliding_window=sliding_window, filters=filters)
+
+    return metadata
+
+def query_dhus_availability_and_render(start_filter, stop_filter, mission, levels, sliding_window = None, filters = None, planned_imaging_uuid = None, view_content = None, relative_to_now = False):
+    """
+    Render the initial page of the view: query form, header, pagination and summary.
+    The rest of the sections are requested by the page when expanded.
+    """
+    # The filters are posted back by the sections and the pagination
+    if filters == None:
+        filters = {
+            "start": [stop_filter["date"]],
+            "stop": [start_filter["date"]],
+            "mission": [mission],
+            "levels": levels
+        }
+    # end if
+    if "view_content" not in filters:
+        filters["view_content"] = [view_content]
+    # end if
+    if "limit" not in filters:
+        filters["limit"] = [""]
+    # end if
+    if "offset" not in filters:
+        filters["offset"] = [""]
+    # end if
+    if planned_imaging_uuid != None:
+        filters["planned_imaging_uuid"] = [planned_imaging_uuid]
+    # end if
+
+    # Summaries of the whole reporting period
+    aggregates = get_dhus_availability_aggregates(start_filter, stop_filter, mission, levels, planned_imaging_uuid, relative_to_now)
+
+    # orbpre_events = svboa_functions.query_orbpre_events(query, current_app, start_filter, stop_filter, mission)
+
+    data = {}
+    eboa_export.export_events(data, [], group = "planned_imaging", include_ers = False)
+    data["metadata"] = get_metadata(start_filter, stop_filter, levels, filters, planned_imaging_uuid, view_content)
+
+    # Cursor of the next page posted back by the pagination
+    filters["next_cursor"] = None
+    if data["metadata"]["pagination"]:
+        gauge_names = [dhus_product_completeness_gauge_names[level] for level in get_dhus_product_completeness_levels(levels)]
+        (_, filters["next_cursor"]) = get_requested_page(start_filter, stop_filter, mission, gauge_names, filters)
+    # end if
+
+    route = "views/dhus_availability/dhus_availability.html"
+
+    return render_template(route, data=data, aggregates=aggregates, sections=dhus_availability_sections, sliding_window=sliding_window, filters=filters)
+
+@bp.route("/dhus-availability-section/<string:section>", methods=["POST"])
+def show_dhus_availability_section(section):
+    """
+    Section of the DHUS availability view for the Sentinel-1 mission (requested by the view when expanded).
+    """
+    current_app.logger.debug("DHUS availability section {}".format(section))
+
+    if section not in dhus_availability_sections:
+        return "The section {} does not exist in the DHUS availability view".format(section), 404
+    # end if
+
+    filters = request.json
+
+    mission = filters["mission"][0]
+    levels = filters["levels"]
+    view_content = filters["view_content"][0]
+    planned_imaging_uuid = None
+    if "planned_imaging_uuid" in filters:
+        planned_imaging_uuid = filters["planned_imaging_uuid"][0]
+    # end if
+
+    # window_size is not used, here only for using the same API
+    window_size = None
+    start_filter, stop_filter = svboa_functions.get_start_stop_filters(query, current_app, request, window_size, mission, filters)
+
+    cursor = None
+    if "cursor" in filters:
+        cursor = tuple(filters["cursor"])
+    # end if
+    key = ("section_" + section, get_window_key(start_filter, stop_filter), mission, levels, view_content, filters["offset"][0], filters["limit"][0], cursor, planned_imaging_uuid)
+
+    return get_cached_result(key, lambda: {"html": render_dhus_availability_section(section, start_filter, stop_filter, mission, levels, filters, planned_imaging_uuid, view_content)})["html"]
+
+def render_dhus_availability_section(section, start_filter, stop_filter, mission, levels, filters, planned_imaging_uuid = None, view_content = None):
+    """
+    Render a section of the view with the events of the requested page.
+    """
+    data = query_dhus_availability_structure(start_filter, stop_filter, mission, levels, filters, planned_imaging_uuid, view_content)
+    data["metadata"] = get_metadata(start_filter, stop_filter, levels, filters, planned_imaging_uuid, view_content)
+
+    aggregates = get_dhus_availability_aggregates(start_filter, stop_filter, mission, levels, planned_imaging_uuid)
+
+    route = "views/dhus_availability/dhus_availability_section.html"
+
+    return render_template(route, data=data, aggregates=aggregates, section=section)
+
+def get_cached_result(key, generate):
+    """
+    Method to obtain a result of the view from the cache or generating it if it is not cached
+    :param key: parameters of the result
+    :type key: tuple
+    :param generate: function generating the result
+    :type generate: function
+
+    :return: result (shallow copy of the cached one, as the callers add information to it)
+    :rtype: dict
+    """
+    if cache.max_entries <= 0:
+        return generate()
+    # end if
+
+    start = time.perf_counter()
+
+    cache.validate(get_ingestion_marker())
+
+    result = cache.get(key)
+    hit = result is not None
+    if not hit:
+        result = generate()
+        cache.put(key, result)
+    # end if
+
+    latency = time.perf_counter() - start
+    cache.record(hit, latency)
+    current_app.logger.debug("Result {} of the DHUS availability view obtained in {} seconds (cache hit: {})".format(key[0], latency, hit))
+
+    return copy.copy(result)
+
+def get_window_key(start_filter, stop_filter, relative_to_now = False):
+    """
+    Method to obtain the window of the reporting period to index the cached results.
+    The dates of the windows relative to now are truncated to the time to live of
+    the cache so that the views refreshing the same window share the results (the
+    queries keep using the dates of the filters). The windows requested with
+    explicit dates are indexed by their exact dates
+    :param start_filter: filter on the start of the events
+    :type start_filter: dict
+    :param stop_filter: filter on the stop of the events
+    :type stop_filter: dict
+    :param relative_to_now: flag to indicate if the window has been built from the current time
+    :type relative_to_now: bool
+
+    :return: dates (truncated for the windows relative to now) and operators of the filters
+    :rtype: tuple
+    """
+    window_key = []
+    for window_filter in [start_filter, stop_filter]:
+        if window_filter:
+            date = window_filter["date"]
+            if relative_to_now and cache.ttl >= 1:
+                date = datetime.datetime.fromtimestamp(parser.parse(date).timestamp() // cache.ttl * cache.ttl).isoformat()
+            # end if
+            window_key.append((date, window_filter["op"]))
+        else:
+            window_key.append(None)
+        # end if
+    # end for
+
+    return tuple(window_key)
 
 def query_dhus_availability_structure(start_filter, stop_filter, mission, levels, filters, planned_imaging_uuid = None, view_content = False):
+    """
+    Query planned acquisition events using the cache of the results.
+    """
+    offset = None
+    limit = None
+    cursor = None
+    if filters and "cursor" in filters:
+        cursor = tuple(filters["cursor"])
+    # end if
+    if filters and "offset" in filters:
+        offset = filters["offset"][0]
+    # end if
+    if filters and "limit" in filters:
+        limit = filters["limit"][0]
+    # end if
+    key = ("structure", get_window_key(start_filter, stop_filter), mission, levels, view_content, offset, limit, cursor, planned_imaging_uuid)
+
+    return get_cached_result(key, lambda: _query_dhus_availability_structure(start_filter, stop_filter, mission, levels, filters, planned_imaging_uuid, view_content))
+
+def get_dhus_availability_aggregates(start_filter, stop_filter, mission, levels, planned_imaging_uuid = None, relative_to_now = False):
+    """
+    Query the aggregates of the completeness, timeliness and volumes per level and satellite using the cache of the results.
+    """
+    key = ("aggregates", get_window_key(start_filter, stop_filter, relative_to_now), mission, levels, planned_imaging_uuid)
+    gauge_names = [dhus_product_completeness_gauge_names[level] for level in get_dhus_product_completeness_levels(levels)]
+
+    return get_cached_result(key, lambda: query_dhus_availability_aggregates(query, start_filter, stop_filter, mission, gauge_names, planned_imaging_uuid))
+
+def _query_dhus_availability_structure(start_filter, stop_filter, mission, levels, filters, planned_imaging_uuid = None, view_content = False):
     """
     Query planned acquisition events.
     """
@@ -304,7 +666,29 @@ def query_dhus_availability_structure(start_filter, stop_filter, mission, levels
 
     kwargs = {}
 
-    if planned_imaging_uuid == None:
+    gauge_names = [dhus_product_completeness_gauge_names[level] for level in get_dhus_product_completeness_levels(levels)]
+
+    # Cursor of the next page (keyset pagination)
+    next_cursor = None
+
+    if planned_imaging_uuid == None and is_keyset_pagination(filters):
+        ####
+        # Query the page of completeness events after the cursor and then their planned imaging events
+        ####
+        (page, next_cursor) = get_requested_page(start_filter, stop_filter, mission, gauge_names, filters)
+
+        dhus_product_completeness_events = []
+        planned_imaging_events = []
+        if len(page) > 0:
+            kwargs["event_uuids"] = {"filter": [str(event_uuid) for (_, event_uuid) in page], "op": "in"}
+            kwargs["order_by"] = {"field": "start", "descending": True}
+            kwargs["link_names"] = {"filter": ["PLANNED_IMAGING"], "op": "in"}
+            dhus_product_completeness_events_with_linked_planned_imaging_events = query.get_linking_events_group_by_link_name(**kwargs)
+            dhus_product_completeness_events = dhus_product_completeness_events_with_linked_planned_imaging_events["prime_events"]
+            planned_imaging_events = dhus_product_completeness_events_with_linked_planned_imaging_events["linking_events"]["PLANNED_IMAGING"]
+        # end if
+
+    elif planned_imaging_uuid == None:
         # Set offset and limit for the query
         if filters and "offset" in filters and filters["offset"][0] != "":
             kwargs["offset"] = filters["offset"][0]
@@ -333,7 +717,8 @@ def query_dhus_availability_structure(start_filter, stop_filter, mission, levels
                                         "value": {"op": "like", "filter": mission}
                                     }]
         # end if
-        kwargs["gauge_names"] = {"filter": "PLANNED\_IMAGING\_DHUS\_PRODUCT\_COMPLETENESS%", "op": "like"}
+        # Only the gauges of the requested levels
+        kwargs["gauge_names"] = {"filter": gauge_names, "op": "in"}
         ####
         # Query completeness and planned imaging events
         ####
@@ -356,6 +741,7 @@ def query_dhus_availability_structure(start_filter, stop_filter, mission, levels
     
     # Build data dictionary
     data = {}
+    data["pagination"] = {"next_cursor": next_cursor}
     
     # Export PLANNED_IMAGING events
     eboa_export.export_events(data, planned_imaging_events, group = "planned_imaging", include_ers = False)
@@ -366,41 +752,17 @@ def query_dhus_availability_structure(start_filter, stop_filter, mission, levels
         include_ers = True
     # end if
 
-    # Organize events
-    dhus_product_completeness_l0 = []
-    dhus_product_completeness_l1_slc = []
-    dhus_product_completeness_l1_grd = []
-    dhus_product_completeness_l2_ocn = []
+    # Organize events by level in one pass
+    dhus_product_completeness_events_by_gauge_name = {gauge_name: [] for gauge_name in gauge_names}
     for event in dhus_product_completeness_events:
-        if levels in ["ALL", "L0"] and event.gauge.name == "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_L0":
-            dhus_product_completeness_l0.append(event)
-        elif levels in ["ALL", "L1_SLC"] and event.gauge.name == "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_L1_SLC":
-            dhus_product_completeness_l1_slc.append(event)
-        elif levels in ["ALL", "L1_GRD"] and event.gauge.name == "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_L1_GRD":
-            dhus_product_completeness_l1_grd.append(event)
-        elif levels in ["ALL", "L2_OCN"] and event.gauge.name == "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_L2_OCN":
-            dhus_product_completeness_l2_ocn.append(event)
+        if event.gauge.name in dhus_product_completeness_events_by_gauge_name:
+            dhus_product_completeness_events_by_gauge_name[event.gauge.name].append(event)
         # end if
     # end for
 
-    # Export DHUS_PRODUCT_COMPLETENESS events for L0
-    if levels in ["ALL", "L0"]:
-        eboa_export.export_events(data, dhus_product_completeness_l0, group = "dhus_product_completeness_L0", include_ers = include_ers)
-    # end if
-    
-    # Export DHUS_PRODUCT_COMPLETENESS events for L1 SLC
-    if levels in ["ALL", "L1_SLC"]:
-        eboa_export.export_events(data, dhus_product_completeness_l1_slc, group = "dhus_product_completeness_L1_SLC", include_ers = include_ers)
-    # end if
-
-    # Export DHUS_PRODUCT_COMPLETENESS events for L1 GRD
-    if levels in ["ALL", "L1_GRD"]:
-        eboa_export.export_events(data, dhus_product_completeness_l1_grd, group = "dhus_product_completeness_L1_GRD", include_ers = include_ers)
-    # end if
-
-    # Export DHUS_PRODUCT_COMPLETENESS events for L2 OCN
-    if levels in ["ALL", "L2_OCN"]:
-        eboa_export.export_events(data, dhus_product_completeness_l2_ocn, group = "dhus_product_completeness_L2_OCN", include_ers = include_ers)
-    # end if
+    # Export DHUS_PRODUCT_COMPLETENESS events per level
+    for level in get_dhus_product_completeness_levels(levels):
+        eboa_export.export_events(data, dhus_product_completeness_events_by_gauge_name[dhus_product_completeness_gauge_names[level]], group = "dhus_product_completeness_" + level, include_ers = include_ers)
+    # end for
 
     return data
@@ -0,0 +1,303 @@
+"""
+Aggregates of the DHUS availability view computed in the DDBB
+
+The durations of the completeness, the timeliness of the publication in
+DHUS and the volumes of the products are obtained with grouped queries
+per level and satellite (and per level for the statistics shown by the
+view), without loading the completeness events. The products of the
+completeness events are the ones in the values dhus_product_N of the
+object dhus_products (completeness coalesced per datatake) or, if not
+present, the explicit reference of the event.
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1vboa
+"""
+# Import python utilities
+import operator
+
+# Import datamodel
+from eboa.datamodel.events import Event, EventText, EventLink
+from eboa.datamodel.gauges import Gauge
+from eboa.datamodel.explicit_refs import ExplicitRef
+from eboa.datamodel.annotations import Annotation, AnnotationCnf, AnnotationTimestamp, AnnotationDouble
+
+# Import SQLAlchemy utilities
+from sqlalchemy import func, and_, case, literal
+from sqlalchemy.orm import aliased
+
+# Operators of the filters on the dates
+comparison_operators = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le
+}
+
+# Gauges of the completeness of the DHUS products per level
+dhus_product_completeness_gauge_names = {
+    "L0": "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_L0",
+    "L1_SLC": "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_L1_SLC",
+    "L1_GRD": "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_L1_GRD",
+    "L2_OCN": "PLANNED_IMAGING_DHUS_PRODUCT_COMPLETENESS_L2_OCN"
+}
+
+# Levels indexed by the gauges of the completeness
+levels_by_gauge_name = {gauge_name: level for (level, gauge_name) in dhus_product_completeness_gauge_names.items()}
+
+# Percentiles of the timeliness
+timeliness_percentiles = [50, 90, 95, 99]
+
+def get_dhus_product_completeness_events_query(query, start_filter, stop_filter, mission, gauge_names, planned_imaging_uuid = None):
+    """
+    Method to build the query of the completeness events of the view.
+    The query selects the UUID, start, stop and explicit reference of the
+    events together with the name of the gauge (gauge_name) and the
+    satellite (satellite)
+    :param query: Query instance
+    :type query: Query
+    :param start_filter: filter on the start of the events
+    :type start_filter: dict
+    :param stop_filter: filter on the stop of the events
+    :type stop_filter: dict
+    :param mission: pattern of the satellite of the events
+    :type mission: str
+    :param gauge_names: names of the gauges of the completeness events
+    :type gauge_names: list of str
+    :param planned_imaging_uuid: UUID of the planned imaging linked to the events (None for all the events)
+    :type planned_imaging_uuid: str
+
+    :return: query of the completeness events
+    :rtype: sqlalchemy.orm.Query
+    """
+    satellite_values = aliased(EventText)
+
+    events_query = query.session.query(Event.event_uuid, Event.start, Event.stop, Event.explicit_ref_uuid,
+                                       Gauge.name.label("gauge_name"), satellite_values.value.label("satellite")) \
+                                .join(Gauge, Event.gauge_uuid == Gauge.gauge_uuid) \
+                                .join(satellite_values, and_(satellite_values.event_uuid == Event.event_uuid, satellite_values.name == "satellite")) \
+                                .filter(Gauge.name.in_(gauge_names))
+    if start_filter:
+        events_query = events_query.filter(comparison_operators[start_filter["op"]](Event.start, start_filter["date"]))
+    # end if
+    if stop_filter:
+        events_query = events_query.filter(comparison_operators[stop_filter["op"]](Event.stop, stop_filter["date"]))
+    # end if
+    if mission:
+        events_query = events_query.filter(satellite_values.value.like(mission))
+    # end if
+    if planned_imaging_uuid:
+        planned_imaging_links = aliased(EventLink)
+        events_query = events_query.join(planned_imaging_links, and_(planned_imaging_links.event_uuid == Event.event_uuid, planned_imaging_links.name == "PLANNED_IMAGING",
+                                                                     planned_imaging_links.event_uuid_link == planned_imaging_uuid))
+    # end if
+
+    return events_query
+
+def _get_completeness_durations(query, events, category, condition = None):
+    """
+    Method to obtain the durations of the completeness per level, satellite and category.
+    The overlapping events are merged (gaps and islands) so every instant is counted once
+    :param query: Query instance
+    :type query: Query
+    :param events: subquery of the completeness events with their status
+    :type events: sqlalchemy.sql.Subquery
+    :param category: expression of the category of the events
+    :type category: sqlalchemy.sql.ColumnElement
+    :param condition: condition to select the events (None for all the events)
+    :type condition: sqlalchemy.sql.ColumnElement
+
+    :return: tuples (gauge_name, satellite, category, duration in seconds)
+    :rtype: list
+    """
+    categorized_events = query.session.query(events.c.gauge_name.label("gauge_name"), events.c.satellite.label("satellite"),
+                                             category.label("category"), events.c.start.label("start"), events.c.stop.label("stop"))
+    if condition is not None:
+        categorized_events = categorized_events.filter(condition)
+    # end if
+    categorized_events = categorized_events.subquery()
+
+    # Latest stop of the previous events of the group
+    partition = [categorized_events.c.gauge_name, categorized_events.c.satellite, categorized_events.c.category]
+    order = [categorized_events.c.start, categorized_events.c.stop]
+    events_with_previous_stop = query.session.query(*partition, *order,
+                                                    func.max(categorized_events.c.stop).over(partition_by = partition, order_by = order, rows = (None, -1)).label("previous_stop")).subquery()
+
+    # An island starts when the event does not overlap the previous ones
+    partition = [events_with_previous_stop.c.gauge_name, events_with_previous_stop.c.satellite, events_with_previous_stop.c.category]
+    order = [events_with_previous_stop.c.start, events_with_previous_stop.c.stop]
+    island_start = case([(events_with_previous_stop.c.previous_stop == None, 1),
+                         (events_with_previous_stop.c.start > events_with_previous_stop.c.previous_stop, 1)], else_ = 0)
+    events_with_island = query.session.query(*partition, *order,
+                                             func.sum(island_start).over(partition_by = partition, order_by = order, rows = (None, 0)).label("island")).subquery()
+
+    # Duration of every island
+    partition = [events_with_island.c.gauge_name, events_with_island.c.satellite, events_with_island.c.category]
+    islands = query.session.query(*partition, (func.max(events_with_island.c.stop) - func.min(events_with_island.c.start)).label("duration")) \
+                           .group_by(*partition, events_with_island.c.island).subquery()
+
+    return query.session.query(islands.c.gauge_name, islands.c.satellite, islands.c.category, func.sum(func.extract("epoch", islands.c.duration))) \
+                        .group_by(islands.c.gauge_name, islands.c.satellite, islands.c.category).all()
+
+def _get_statistics(query, values, columns, percentiles = []):
+    """
+    Method to obtain the statistics of the values per group
+    :param query: Query instance
+    :type query: Query
+    :param values: subquery with the columns of the groups and the values (value)
+    :type values: sqlalchemy.sql.Subquery
+    :param columns: names of the columns of the groups
+    :type columns: list of str
+    :param percentiles: percentiles to obtain
+    :type percentiles: list of int
+
+    :return: tuples (columns of the group, number of values, minimum, mean, maximum, standard deviation, sum, percentiles)
+    :rtype: list
+    """
+    groups = [values.c[column] for column in columns]
+
+    return query.session.query(*groups, func.count(values.c.value), func.min(values.c.value), func.avg(values.c.value), func.max(values.c.value),
+                               func.coalesce(func.stddev_samp(values.c.value), 0), func.sum(values.c.value),
+                               *[func.percentile_cont(percentile / 100).within_group(values.c.value) for percentile in percentiles]) \
+                        .group_by(*groups) \
+                        .order_by(*groups).all()
+
+def query_dhus_availability_aggregates(query, start_filter, stop_filter, mission, gauge_names, planned_imaging_uuid = None):
+    """
+    Method to obtain the aggregates of the completeness, timeliness and volumes per level and satellite
+    :param query: Query instance
+    :type query: Query
+    :param start_filter: filter on the start of the events
+    :type start_filter: dict
+    :param stop_filter: filter on the stop of the events
+    :type stop_filter: dict
+    :param mission: pattern of the satellite of the events
+    :type mission: str
+    :param gauge_names: names of the gauges of the completeness events
+    :type gauge_names: list of str
+    :param planned_imaging_uuid: UUID of the planned imaging linked to the events (None for all the events)
+    :type planned_imaging_uuid: str
+
+    :return: completeness durations (minutes), timeliness statistics (minutes) and volumes (GB) per level and satellite and statistics of the timeliness and volumes per level
+    :rtype: dict
+    """
+    status_values = aliased(EventText)
+    events = get_dhus_product_completeness_events_query(query, start_filter, stop_filter, mission, gauge_names, planned_imaging_uuid) \
+        .add_columns(status_values.value.label("status")) \
+        .join(status_values, and_(status_values.event_uuid == Event.event_uuid, status_values.name == "status")) \
+        .subquery()
+
+    aggregates = {
+        "completeness": [],
+        "timeliness": [],
+        "timeliness_per_level": [],
+        "volumes": [],
+        "volumes_per_level": []
+    }
+
+    ####
+    # Completeness
+    ####
+    durations = {}
+    expected_or_unexpected = case([(events.c.status == "UNEXPECTED", literal("unexpected"))], else_ = literal("expected"))
+    for (gauge_name, satellite, category, duration) in _get_completeness_durations(query, events, expected_or_unexpected) + \
+        _get_completeness_durations(query, events, literal("missing"), events.c.status == "MISSING"):
+        durations.setdefault((gauge_name, satellite), {})[category] = float(duration or 0)
+    # end for
+    for (gauge_name, satellite) in sorted(durations):
+        expected_duration = durations[(gauge_name, satellite)].get("expected", 0) / 60
+        missing_duration = durations[(gauge_name, satellite)].get("missing", 0) / 60
+        aggregates["completeness"].append({
+            "level": levels_by_gauge_name[gauge_name],
+            "satellite": satellite,
+            "expected_duration": expected_duration,
+            "available_duration": expected_duration - missing_duration,
+            "missing_duration": missing_duration,
+            "unexpected_duration": durations[(gauge_name, satellite)].get("unexpected", 0) / 60
+        })
+    # end for
+
+    ####
+    # Products of the completeness events
+    ####
+    product_names = aliased(EventText)
+    product_explicit_refs = aliased(ExplicitRef)
+    products = query.session.query(events.c.event_uuid, events.c.gauge_name, events.c.satellite, events.c.stop,
+                                   func.coalesce(product_explicit_refs.explicit_ref_uuid, events.c.explicit_ref_uuid).label("explicit_ref_uuid")) \
+                            .outerjoin(product_names, and_(product_names.event_uuid == events.c.event_uuid, product_names.name.like("dhus\\_product\\_%"))) \
+                            .outerjoin(product_explicit_refs, product_explicit_refs.explicit_ref == product_names.value) \
+                            .filter(events.c.status != "MISSING") \
+                            .subquery()
+
+    ####
+    # Timeliness (publication in DHUS with respect to the end of the planned imaging)
+    ####
+    planned_imaging_events = aliased(Event)
+    publication_time_values = aliased(AnnotationTimestamp)
+    publication_time_annotations = aliased(Annotation)
+    publication_time_configurations = aliased(AnnotationCnf)
+    delta_to_dhus = func.extract("epoch", publication_time_values.value - func.coalesce(planned_imaging_events.stop, products.c.stop)) / 60
+
+    deltas_to_dhus = query.session.query(products.c.gauge_name, products.c.satellite, delta_to_dhus.label("value")) \
+                                  .outerjoin(EventLink, and_(EventLink.event_uuid == products.c.event_uuid, EventLink.name == "PLANNED_IMAGING")) \
+                                  .outerjoin(planned_imaging_events, planned_imaging_events.event_uuid == EventLink.event_uuid_link) \
+                                  .join(publication_time_annotations, publication_time_annotations.explicit_ref_uuid == products.c.explicit_ref_uuid) \
+                                  .join(publication_time_configurations, and_(publication_time_configurations.annotation_cnf_uuid == publication_time_annotations.annotation_cnf_uuid,
+                                                                              publication_time_configurations.name == "DHUS_PUBLICATION_TIME")) \
+                                  .join(publication_time_values, and_(publication_time_values.annotation_uuid == publication_time_annotations.annotation_uuid,
+                                                                      publication_time_values.name == "dhus_publication_time")) \
+                                  .subquery()
+    for (aggregate, columns) in [("timeliness", ["gauge_name", "satellite"]), ("timeliness_per_level", ["gauge_name"])]:
+        for statistics in _get_statistics(query, deltas_to_dhus, columns, timeliness_percentiles):
+            (number_of_products, minimum, mean, maximum, std, _, *percentiles) = statistics[len(columns):]
+            entry = {
+                "level": levels_by_gauge_name[statistics[0]],
+                "number_of_products": number_of_products,
+                "min": float(minimum),
+                "mean": float(mean),
+                "max": float(maximum),
+                "std": float(std),
+                "percentiles": {str(percentile): float(value) for (percentile, value) in zip(timeliness_percentiles, percentiles)}
+            }
+            if "satellite" in columns:
+                entry["satellite"] = statistics[1]
+            # end if
+            aggregates[aggregate].append(entry)
+        # end for
+    # end for
+
+    ####
+    # Volumes (every product counted once)
+    ####
+    size_values = aliased(AnnotationDouble)
+    metadata_annotations = aliased(Annotation)
+    metadata_configurations = aliased(AnnotationCnf)
+    sizes = query.session.query(products.c.gauge_name, products.c.satellite, products.c.explicit_ref_uuid, (size_values.value / 1000 / 1000 / 1000).label("value")) \
+                         .join(metadata_annotations, metadata_annotations.explicit_ref_uuid == products.c.explicit_ref_uuid) \
+                         .join(metadata_configurations, and_(metadata_configurations.annotation_cnf_uuid == metadata_annotations.annotation_cnf_uuid,
+                                                             metadata_configurations.name == "DHUS_METADATA_INFORMATION")) \
+                         .join(size_values, and_(size_values.annotation_uuid == metadata_annotations.annotation_uuid,
+                                                 size_values.name == "size")) \
+                         .distinct().subquery()
+    for (aggregate, columns) in [("volumes", ["gauge_name", "satellite"]), ("volumes_per_level", ["gauge_name"])]:
+        for statistics in _get_statistics(query, sizes, columns):
+            (number_of_products, minimum, mean, maximum, std, size) = statistics[len(columns):]
+            entry = {
+                "level": levels_by_gauge_name[statistics[0]],
+                "number_of_products": number_of_products,
+                "size": float(size),
+                "min": float(minimum),
+                "mean": float(mean),
+                "max": float(maximum),
+                "std": float(std)
+            }
+            if "satellite" in columns:
+                entry["satellite"] = statistics[1]
+            # end if
+            aggregates[aggregate].append(entry)
+        # end for
+    # end for
+
+    return aggregates
@@ -0,0 +1,132 @@
+"""
+Cache of the results of the queries of the DHUS availability view
+
+The results are kept in memory indexed by the parameters of the query.
+The entries expire after a configured time to live and the least
+recently used ones are removed when the number of stored results exceeds
+the configured maximum. All the entries are invalidated when the marker
+of the ingestions feeding the view changes.
+
+Written by DEIMOS Space S.L. (dibb)
+
+module s1vboa
+"""
+# Import python utilities
+import time
+import threading
+from collections import OrderedDict
+
+class DhusAvailabilityCache():
+    """
+    Results of the queries stored in memory with TTL, LRU eviction and counters of hits, misses and latencies
+    """
+
+    def __init__(self, ttl, max_entries):
+        """
+        :param ttl: time to live of the entries in seconds
+        :type ttl: float
+        :param max_entries: maximum number of results to keep
+        :type max_entries: int
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.marker = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.hits_latency = 0.0
+        self.misses_latency = 0.0
+
+    def validate(self, marker):
+        """
+        Method to remove all the entries if the marker of the ingestions has changed
+        :param marker: marker of the ingestions feeding the cached results
+        :type marker: tuple
+        """
+        with self.lock:
+            if marker != self.marker:
+                if self.marker is not None:
+                    self.invalidations += 1
+                # end if
+                self.entries.clear()
+                self.marker = marker
+            # end if
+        # end with
+
+    def get(self, key):
+        """
+        Method to obtain the result stored for a key
+        :param key: parameters of the query
+        :type key: tuple
+
+        :return: stored result or None if the key is not cached or the entry expired
+        :rtype: dict
+        """
+        with self.lock:
+            if key not in self.entries:
+                return None
+            # end if
+            (insertion_time, result) = self.entries[key]
+            if time.time() - insertion_time > self.ttl:
+                del self.entries[key]
+                return None
+            # end if
+            self.entries.move_to_end(key)
+        # end with
+
+        return result
+
+    def put(self, key, result):
+        """
+        Method to store a result removing the least recently used ones if the maximum is exceeded
+        :param key: parameters of the query
+        :type key: tuple
+        :param result: result of the query
+        :type result: dict
+        """
+        with self.lock:
+            self.entries[key] = (time.time(), result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last = False)
+            # end while
+        # end with
+
+    def record(self, hit, latency):
+        """
+        Method to account a request to the cache
+        :param hit: True if the result was served from the cache
+        :type hit: bool
+        :param latency: seconds needed to serve the result
+        :type latency: float
+        """
+        with self.lock:
+            if hit:
+                self.hits += 1
+                self.hits_latency += latency
+            else:
+                self.misses += 1
+                self.misses_latency += latency
+            # end if
+        # end with
+
+    def get_statistics(self):
+        """
+        Method to obtain the counters of the cache
+        :return: hits, misses, hit ratio, mean latencies in seconds, invalidations and number of stored results
+        :rtype: dict
+        """
+        with self.lock:
+            requests = self.hits + self.misses
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "hit_ratio": self.hits / requests if requests > 0 else None,
+                    "mean_hit_latency": self.hits_latency / self.hits if self.hits > 0 else None,
+                    "mean_miss_latency": self.misses_latency / self.misses if self.misses > 0 else None,
+                    "invalidations": self.invalidations,
+                    "entries": len(self.entries),
+                    "ttl": self.ttl,
+                    "max_entries": self.max_entries}
+        # end with
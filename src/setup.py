@@ -19,6 +19,7 @@ setup(name="s1boa",
           "eboa",
           "vboa",
           "astropy",
+          "numpy",
           "massedit"
       ],
       test_suite='nose.collector')